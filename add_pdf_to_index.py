@@ -10,6 +10,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / "app"))
 
 from main import RAGSystem
+from index_manifest import file_sha256
 
 def add_pdf_to_index(pdf_path: str):
     """PDF를 벡터 인덱스에 추가"""
@@ -25,37 +26,25 @@ def add_pdf_to_index(pdf_path: str):
     except Exception as e:
         print(f"기존 인덱스 로드 실패 (새로 생성됨): {e}")
 
-    # PDF 처리
-    print("PDF 청킹 중...")
-    chunks = rag.pdf_processor.process_pdf(pdf_path)
-    print(f"추출된 청크 수: {len(chunks)}")
-
-    if not chunks:
-        print("❌ PDF에서 추출된 내용이 없습니다.")
+    # 이미 같은 내용으로 인덱스에 들어있는지 manifest로 확인
+    vector_store = rag.vector_store
+    content_hash = file_sha256(pdf_path)
+    if vector_store.vectorstore is not None and vector_store.manifest.is_current(pdf_path, content_hash):
+        print("이미 같은 내용의 PDF가 인덱스에 있습니다. 건너뜁니다.")
         return
 
-    # 벡터스토어에 추가
-    print("벡터 임베딩 생성 및 인덱스 추가 중...")
-    if rag.vector_store.vectorstore is None:
-        rag.vector_store.create_vectorstore(chunks)
-    else:
-        # 기존 벡터스토어에 새 문서 추가
-        from langchain_community.vectorstores import FAISS
-
-        # 배치 처리
-        batch_size = 100
-        total_docs = len(chunks)
-
-        for i in range(0, total_docs, batch_size):
-            batch = chunks[i:i+batch_size]
-            print(f"배치 처리 중: {i+1} ~ {min(i+batch_size, total_docs)} / {total_docs}")
-            batch_vectorstore = FAISS.from_documents(batch, rag.vector_store.embeddings)
-            rag.vector_store.vectorstore.merge_from(batch_vectorstore)
-            print(f"{len(batch)}개 문서를 벡터 인덱스에 추가했습니다")
+    # PDF 청킹 → 임베딩 → 인덱스 반영 (내용이 바뀐 파일이면 이전 벡터만 교체)
+    print("PDF 청킹 및 벡터 임베딩 중...")
+    try:
+        chunk_count = rag.upsert_pdf(pdf_path, content_hash=content_hash)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print(f"{chunk_count}개 청크를 벡터 인덱스에 반영했습니다")
 
     # 저장
     print("벡터 인덱스 저장 중...")
-    rag.vector_store.save_vectorstore()
+    rag.save_index()
 
     print("✅ PDF가 벡터 인덱스에 성공적으로 추가되었습니다!")
 
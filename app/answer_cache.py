@@ -0,0 +1,196 @@
+"""
+Answer Cache - exact + semantic (embedding similarity) cache of RAG answers per index version
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from embedding_cache import normalize_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """SQLite store of answers + sources keyed by (scope, index version, normalized question).
+
+    scope holds the settings that change an answer for the same index (LLM
+    model, temperature, top-k, search mode). A lookup first tries the exact
+    question, then the most similar cached question of the same scope and
+    version whose cosine similarity is at least `similarity` (1.0 = exact
+    only). Entries of another index version are deleted on the next put;
+    entries older than ttl_seconds are ignored, and past max_entries the
+    least recently used rows are evicted down to 90% of the limit.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 2000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        similarity: float = 0.97,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, scope TEXT NOT NULL, version TEXT NOT NULL, question TEXT NOT NULL,"
+            " vector BLOB, answer TEXT NOT NULL, sources TEXT NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_scope ON answers(scope, version)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers(last_used)")
+        self._conn.commit()
+
+        # 유사 질문 검색용 (scope, version) 별 정규화 벡터 행렬, 다른 프로세스가 쓰면 다시 읽음
+        self._matrix_for = None
+        self._matrix_keys: List[str] = []
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(scope: str, version: str, question: str) -> str:
+        payload = f"{scope}\0{version}\0{normalize_text(question)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def get(
+        self, scope: str, version: str, question: str, embed: Optional[Callable[[str], List[float]]] = None
+    ) -> Optional[Dict]:
+        """Cached {"answer", "sources", "cache", "cached_question"} or None.
+
+        embed is only called when there is no exact match and semantic
+        matching is enabled.
+        """
+        key = self.make_key(scope, version, question)
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT question, answer, sources FROM answers WHERE key = ? AND created >= ?", (key, cutoff)
+            ).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+                return self._hit(key, row, "exact")
+
+        if self.similarity < 1.0 and embed is not None:
+            vector = self._unit(embed(question))
+            with self._lock:
+                keys, matrix = self._candidates(scope, version, cutoff)
+                if len(keys) and matrix.shape[1] == len(vector):
+                    scores = matrix @ vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        row = self._conn.execute(
+                            "SELECT question, answer, sources FROM answers WHERE key = ?", (keys[best],)
+                        ).fetchone()
+                        if row is not None:
+                            self.semantic_hits += 1
+                            result = self._hit(keys[best], row, "semantic")
+                            result["similarity"] = round(float(scores[best]), 4)
+                            return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _hit(self, key: str, row, kind: str) -> Dict:
+        question, answer, sources = row
+        self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return {"answer": answer, "sources": json.loads(sources), "cache": kind, "cached_question": question}
+
+    def _candidates(self, scope: str, version: str, cutoff: float):
+        # data_version 은 다른 연결(프로세스)이 커밋할 때마다 바뀜
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        state = (scope, version, data_version)
+        if self._matrix_for != state:
+            rows = self._conn.execute(
+                "SELECT key, vector FROM answers WHERE scope = ? AND version = ? AND created >= ? AND vector IS NOT NULL",
+                (scope, version, cutoff),
+            ).fetchall()
+            self._matrix_keys = [key for key, _ in rows]
+            self._matrix = (
+                np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                if rows else np.empty((0, 0), dtype=np.float32)
+            )
+            self._matrix_for = state
+        return self._matrix_keys, self._matrix
+
+    def put(
+        self,
+        scope: str,
+        version: str,
+        question: str,
+        answer: str,
+        sources: List[Dict],
+        vector: Optional[List[float]] = None,
+    ) -> None:
+        now = time.time()
+        blob = self._unit(vector).tobytes() if vector is not None else None
+        with self._lock:
+            # 인덱스가 바뀌면 이전 버전의 답변은 모두 무효
+            self._conn.execute("DELETE FROM answers WHERE version != ?", (version,))
+            self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers"
+                " (key, scope, version, question, vector, answer, sources, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.make_key(scope, version, question), scope, version, question, blob,
+                    answer, json.dumps(sources, ensure_ascii=False, default=str), now, now,
+                ),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > self.max_entries:
+                remove = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY last_used ASC LIMIT ?)",
+                    (remove,),
+                )
+                logger.info(f"Answer cache evicted {remove} least recently used entries")
+            self._conn.commit()
+            # 이 연결의 커밋은 data_version 을 바꾸지 않으므로 직접 무효화
+            self._matrix_for = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._matrix_for = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def stats(self) -> Dict:
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+            "entries": len(self),
+        }
@@ -2,17 +2,41 @@
 PDF → 청크 → 벡터 인덱스 생성 스크립트 (OpenAI + FAISS)
 """
 import os
+import shutil
+import argparse
 import logging
 from dotenv import load_dotenv
 
 from pdf_processor import PDFProcessor
 from vector_store import VectorStoreManager
+from index_manifest import IndexManifest, vector_id_prefix
+from ingest_pipeline import stream_into_index
+from chunk_dedup import ChunkDeduplicator
+from chunk_store import CHUNK_STORE_FILE
+from shard_router import publish_shard, shard_index_name, stage_shard
+from index_snapshots import current_index, new_snapshot, publish_snapshot, snapshots_enabled
+from monograph_index import MONOGRAPH_INDEX_FILE, MonographExtractor, MonographIndex
+from revision_tables import (
+    REVISION_TABLE_FILE,
+    RevisionTableIndex,
+    extract_revision_rows,
+    is_revision_table_pdf,
+)
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
 
-def build_index():
+def build_index(workers: int | None = None, pdf_dir: str | None = None, shard: str | None = None):
+    """Build / update the index from the PDFs in pdf_dir (default PDF_DIR).
+
+    With shard, the PDFs form one collection under shards/<shard>: it is built
+    in a staging copy and swapped in at the end, so running apps keep
+    searching the previous version of that shard (and all other shards).
+    Otherwise (INDEX_SNAPSHOTS=true) the build goes into a new snapshots/<version>
+    folder that CURRENT points to once it is complete; running apps pick it up
+    in the background.
+    """
     # .env 로드
     load_dotenv()
 
@@ -21,7 +45,7 @@ def build_index():
     root_dir = os.path.dirname(app_dir)                       # ...\rag-pdf-system
 
     # 📂 PDF 폴더 경로
-    pdf_dir = os.getenv("PDF_DIR")
+    pdf_dir = pdf_dir or os.getenv("PDF_DIR")
     if not pdf_dir:
         pdf_dir = os.path.join(root_dir, "data", "pdfs")
     logger.info(f"📂 PDF_DIR : {pdf_dir}")
@@ -30,10 +54,10 @@ def build_index():
         logger.error(f"❌ PDF 폴더가 없습니다: {pdf_dir}")
         return
 
-    # 폴더 안 PDF 파일 리스트
+    # 폴더 안 PDF 파일 리스트 (정렬해서 chunk 순서를 항상 동일하게 유지)
     pdf_files = [
         os.path.join(pdf_dir, f)
-        for f in os.listdir(pdf_dir)
+        for f in sorted(os.listdir(pdf_dir))
         if f.lower().endswith(".pdf")
     ]
 
@@ -49,45 +73,218 @@ def build_index():
 
     os.makedirs(vector_path, exist_ok=True)
 
+    # 🧩 샤드 빌드는 복사본(staging)에서, 일반 빌드는 새 스냅샷 폴더에서 진행하고 끝나면 교체
+    store_type = os.getenv("VECTOR_STORE_TYPE", "faiss")
+    snapshots = not shard and snapshots_enabled(store_type)
+    if shard:
+        index_name = shard_index_name(shard)
+    else:
+        index_name = current_index(vector_path) if snapshots else "index"
+    logger.info(f"🧩 INDEX : {index_name}")
+
     # 📑 PDF → 청크
     pdf_processor = PDFProcessor(
         chunk_size=int(os.getenv("CHUNK_SIZE", 1000)),
         chunk_overlap=int(os.getenv("CHUNK_OVERLAP", 100)),
     )
 
-    all_chunks = []
-    for pdf_path in pdf_files:
-        logger.info(f"📄 처리 중: {pdf_path}")
-        # ✅ 여기! process_pdfs(X) → process_pdf(O)
-        chunks = pdf_processor.process_pdf(pdf_path)
-        logger.info(f"   → 청크 {len(chunks)}개 생성")
-        all_chunks.extend(chunks)
-
-    logger.info(f"✅ 전체 청크 수: {len(all_chunks)}")
+    # ⚙️ 병렬 파싱 워커 수 (1이면 순차 처리)
+    if workers is None:
+        workers = int(os.getenv("PDF_WORKERS", 1))
+    logger.info(f"⚙️ PDF_WORKERS : {workers}")
 
-    if not all_chunks:
-        logger.error("❌ 생성된 청크가 0개입니다. PDF 내용/파서 확인 필요.")
-        return
-
-    # 🔢 벡터스토어 생성
+    # 🔢 벡터스토어 준비
     vector_store = VectorStoreManager(
-        store_type=os.getenv("VECTOR_STORE_TYPE", "faiss"),
+        store_type=store_type,
         store_path=vector_path,
         embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
     )
+    vector_store.manifest = IndexManifest.load(vector_store.manifest_path(index_name))
+    params = {
+        "chunk_size": pdf_processor.chunk_size,
+        "chunk_overlap": pdf_processor.chunk_overlap,
+        "embedding_model": vector_store.embedding_model,
+        "faiss_index": vector_store.index_config.index_type,
+    }
+
+    # ♻️ 증분 빌드: manifest의 청킹/임베딩 설정이 같으면 바뀐 PDF만 다시 처리
+    incremental = (
+        os.getenv("INCREMENTAL_BUILD", "true").lower() == "true"
+        and bool(vector_store.manifest.files)
+        and vector_store.manifest.matches(**params)
+    )
+    manifest = vector_store.manifest
+    if not incremental:
+        manifest.reset(**params)
+
+    # 게시된 인덱스의 manifest 로 먼저 비교: 바뀐 PDF가 없으면 복사본도 만들지 않음
+    to_process, deleted = manifest.plan(pdf_files)
+    logger.info(f"♻️ 신규/변경 PDF: {len(to_process)}개, 삭제된 PDF: {len(deleted)}개")
+
+    if not to_process and not deleted:
+        logger.info("✅ 변경된 PDF가 없습니다. 기존 인덱스를 그대로 사용합니다.")
+        return
+
+    # 앱은 게시된 샤드 / CURRENT 스냅샷을 계속 읽음: 증분이면 그 복사본(하드링크), 아니면 빈 폴더에서 빌드
+    if shard:
+        index_name = stage_shard(vector_path, shard)
+    elif snapshots:
+        index_name = new_snapshot(vector_path, copy_from=index_name if incremental else None)
+    try:
+        if incremental:
+            try:
+                vector_store.load_vectorstore(index_name)
+                manifest = vector_store.manifest
+            except Exception as e:
+                logger.warning(f"⚠️ 기존 인덱스 로드 실패 → 전체 재빌드: {e}")
+                incremental = False
+                manifest.reset(**params)
+                to_process, deleted = manifest.plan(pdf_files)
+        if not incremental:
+            vector_store.manifest = manifest
+            # 전체 재빌드: Chroma 는 같은 컬렉션이 그대로 남아 있으므로 비우고 시작
+            vector_store.reset_vectorstore()
+
+        # 🗑️ 삭제되었거나 내용이 바뀐 PDF의 기존 벡터 제거
+        stale_ids = []
+        for source_file in deleted:
+            stale_ids.extend(manifest.remove(source_file))
+        for pdf_path, _ in to_process:
+            stale_ids.extend(manifest.remove(os.path.basename(pdf_path)))
+
+        # 제거되는 벡터에 중복 청크를 합쳐 두었던 다른 PDF도 다시 처리
+        pdf_by_name = {os.path.basename(p): p for p in pdf_files}
+        while True:
+            dependents = [s for s in manifest.dependents(stale_ids) if s in pdf_by_name]
+            if not dependents:
+                break
+            for source_file in dependents:
+                logger.info(f"🔁 중복 청크가 제거 대상 벡터를 참조 → 재처리: {source_file}")
+                stale_ids.extend(manifest.remove(source_file))
+                pdf_path = pdf_by_name[source_file]
+                to_process.append((pdf_path, manifest.content_hash(pdf_path)))
 
-    vector_store.create_vectorstore(all_chunks)
-    vector_store.save_vectorstore("index")
+        if incremental:
+            vector_store.delete_vectors(stale_ids)
+
+        # 🧹 중복 제거: 이미 인덱스에 있는 청크도 기준으로 등록
+        dedup = ChunkDeduplicator(
+            mode=os.getenv("DEDUP_MODE", "exact").lower(),
+            threshold=float(os.getenv("DEDUP_THRESHOLD", 0.9)),
+        )
+        if incremental:
+            # 삭제/재처리되는 파일의 사본은 유지된 청크의 sources 에서 뺌 (재처리 시 다시 추가)
+            dedup.seed(
+                vector_store.iter_documents(),
+                removed_sources=set(deleted) | {os.path.basename(pdf_path) for pdf_path, _ in to_process},
+            )
+
+        content_hashes = dict(to_process)
+        records = []
+        # 📖 각조 품목명 → 청크: 파일마다 청크 순서대로 제목을 찾아 기록
+        monograph_path = os.path.join(vector_store.index_dir(index_name), MONOGRAPH_INDEX_FILE)
+        monographs = MonographIndex.load(monograph_path) if incremental else MonographIndex(monograph_path)
+        for source_file in deleted:
+            monographs.remove_source(source_file)
+
+        def iter_file_chunks():
+            """(pdf_path, chunks) 순서대로: 워커 1개면 페이지 단위로 지연 파싱, 여러 개면 프로세스 풀."""
+            paths = [pdf_path for pdf_path, _ in to_process]
+            if workers <= 1:
+                for pdf_path in paths:
+                    yield pdf_path, pdf_processor.iter_chunks(pdf_path)
+            else:
+                yield from pdf_processor.iter_process_pdfs(paths, workers=workers)
+
+        def iter_items():
+            """(청크, 벡터 id) 스트림 — 파일 하나를 다 읽으면 manifest 기록용 정보를 남김"""
+            # 결과는 파일 순서대로 돌아오므로 chunk_id / 최종 인덱스는 순차 처리와 동일
+            for pdf_path, chunks in iter_file_chunks():
+                content_hash = content_hashes[pdf_path]
+                prefix = vector_id_prefix(os.path.basename(pdf_path), content_hash)
+                ids, shared_ids = [], set()
+                extractor = MonographExtractor(os.path.basename(pdf_path))
+                for chunk in chunks:
+                    vector_id = f"{prefix}-{chunk.metadata['chunk_id']}"
+                    kept_id = dedup.check(chunk, vector_id)
+                    extractor.add(chunk, kept_id or vector_id)
+                    if kept_id is not None:
+                        # 중복 청크: 임베딩하지 않고 기존 벡터의 sources 에만 기록
+                        shared_ids.add(kept_id)
+                        continue
+                    ids.append(vector_id)
+                    yield chunk, vector_id
+                monographs.replace_source(os.path.basename(pdf_path), extractor.monographs)
+                logger.info(f"📄 처리 완료: {pdf_path} → 청크 {len(ids)}개 (중복 {len(shared_ids)}개 벡터와 병합)")
+                records.append((pdf_path, content_hash, ids, shared_ids))
+
+        # 📑 파싱 → 임베딩 배치 → 인덱스 추가를 겹쳐서 진행 (메모리는 in-flight 윈도우만큼만 사용)
+        total = stream_into_index(
+            vector_store,
+            iter_items(),
+            batch_size=int(os.getenv("INGEST_BATCH_SIZE", 256)),
+            max_in_flight=int(os.getenv("INGEST_MAX_IN_FLIGHT", 4)),
+        )
+        logger.info(f"✅ 새로 임베딩한 청크 수: {total}")
+
+        # (전체 재빌드한 Chroma 는 빈 컬렉션이 열려 있으므로 청크 수로도 확인)
+        if vector_store.vectorstore is None or (not incremental and not total):
+            logger.error("❌ 생성된 청크가 0개입니다. PDF 내용/파서 확인 필요.")
+            if shard or snapshots:
+                shutil.rmtree(os.path.join(vector_path, index_name), ignore_errors=True)
+            return
+
+        # 중복 클러스터를 대표하는 벡터에 모든 출처(파일/페이지) 기록
+        vector_store.update_metadata(
+            {vector_id: {"sources": sources} for vector_id, sources in dedup.merged_sources.items()}
+        )
+        stats = dedup.stats()
+        if stats["chunks"]:
+            logger.info(
+                f"🧹 중복 제거: 청크 {stats['chunks']}개 중 {stats['saved_vectors']}개 제외 "
+                f"(완전 일치 {stats['exact_duplicates']}, 유사 {stats['near_duplicates']}) "
+                f"→ 벡터/임베딩 입력 {stats['saved_vectors']}개 절약"
+            )
+
+        for pdf_path, content_hash, ids, shared_ids in records:
+            manifest.record(pdf_path, content_hash, ids, shared_ids)
+
+        # 📋 변경대비표: 현행/개정안 표 행을 품목·항목명으로 바로 찾을 수 있게 따로 저장
+        table_path = os.path.join(vector_store.index_dir(index_name), REVISION_TABLE_FILE)
+        revision_tables = RevisionTableIndex.load(table_path) if incremental else RevisionTableIndex(table_path)
+        for source_file in deleted:
+            revision_tables.remove_source(source_file)
+        for pdf_path, _ in to_process:
+            if is_revision_table_pdf(pdf_path):
+                revision_tables.replace_source(os.path.basename(pdf_path), extract_revision_rows(pdf_path))
+            else:
+                revision_tables.remove_source(os.path.basename(pdf_path))
+
+        vector_store.save_vectorstore(index_name)
+        revision_tables.save()
+        monographs.save()
+    except BaseException:
+        # 게시 전 실패: 아무도 읽지 않는 스냅샷 / staging 폴더를 남기지 않음
+        if shard or snapshots:
+            shutil.rmtree(os.path.join(vector_path, index_name), ignore_errors=True)
+        raise
+
+    if shard:
+        vector_store.vectorstore.docstore.close()
+        publish_shard(vector_path, shard)
+        index_name = shard_index_name(shard)
+    elif snapshots:
+        publish_snapshot(vector_path, index_name)
     logger.info("✅ 벡터 인덱스 생성 & 저장 완료!")
 
     # 🔍 진짜로 index.faiss 파일이 있는지 체크
-    index_dir = os.path.join(vector_path, "index")
+    index_dir = os.path.join(vector_path, index_name)
     faiss_path = os.path.join(index_dir, "index.faiss")
-    pkl_path = os.path.join(index_dir, "index.pkl")
+    chunk_path = os.path.join(index_dir, CHUNK_STORE_FILE)
 
     logger.info(f"📁 인덱스 폴더: {index_dir}")
     logger.info(f"   - 기대하는 FAISS 파일: {faiss_path}")
-    logger.info(f"   - 기대하는 PKL 파일  : {pkl_path}")
+    logger.info(f"   - 기대하는 청크 DB   : {chunk_path}")
 
     if os.path.exists(faiss_path):
         logger.info("✅ index.faiss 파일 존재 확인 완료!")
@@ -95,5 +292,14 @@ def build_index():
         logger.error("❌ index.faiss 파일이 없습니다. 경로 설정 문제입니다.")
 
 
+def main() -> None:
+    parser = argparse.ArgumentParser(description="PDF → 청크 → 벡터 인덱스 생성 (증분)")
+    parser.add_argument("--pdf-dir", help="PDF 폴더 (기본: PDF_DIR 또는 data/pdfs)")
+    parser.add_argument("--shard", help="이 폴더의 PDF 를 shards/<이름> 컬렉션 인덱스로 빌드")
+    parser.add_argument("--workers", type=int, help="PDF 파싱 프로세스 수 (기본: PDF_WORKERS)")
+    args = parser.parse_args()
+    build_index(workers=args.workers, pdf_dir=args.pdf_dir, shard=args.shard)
+
+
 if __name__ == "__main__":
-    build_index()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,169 @@
+"""
+Chunk Deduplication - drop exact / near-duplicate chunks before embedding
+"""
+import zlib
+import hashlib
+import logging
+from collections import defaultdict
+from typing import Collection, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from embedding_cache import normalize_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEDUP_MODES = ("off", "exact", "minhash")
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+class ChunkDeduplicator:
+    """Keeps one chunk per duplicate cluster across all ingested PDFs.
+
+    "exact" matches chunks whose normalized text is identical; "minhash" also
+    catches near-duplicates (Jaccard similarity of character shingles above
+    threshold) through MinHash signatures and LSH banding. merged_sources maps
+    each kept vector id that absorbed duplicates to the source_file/page of
+    every copy, to be written into that vector's metadata["sources"].
+    """
+
+    def __init__(
+        self,
+        mode: str = "exact",
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+    ):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unsupported dedup mode: {mode} (choose from {DEDUP_MODES})")
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.mode = mode
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(1)
+        # a, b < 2^31 이고 shingle 해시(crc32) < 2^32 이므로 a * h + b 는 uint64 범위 안
+        self._perm_a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._perm_b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+        # 정규화 텍스트 해시 / LSH 버킷 → 유지된 청크의 (벡터 id, 출처 목록); 청크 본문은 보관하지 않음
+        self._exact: Dict[str, Tuple[str, List[Dict]]] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        self._signatures: List[np.ndarray] = []
+        self._kept: List[Tuple[str, List[Dict]]] = []
+        self.merged_sources: Dict[str, List[Dict]] = {}
+
+        self.chunks = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    # ------------------------------------------------------------------
+    # MinHash
+    # ------------------------------------------------------------------
+    def _signature(self, text: str) -> np.ndarray:
+        k = self.shingle_size
+        shingles = {text[i:i+k] for i in range(max(1, len(text) - k + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        # (a * h + b) mod p 를 순열 개수만큼 한 번에 계산
+        permuted = (hashes[:, None] * self._perm_a[None, :] + self._perm_b[None, :]) % _MERSENNE_PRIME
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        rows = self.num_perm // self.bands
+        return [(b, signature[b * rows:(b + 1) * rows].tobytes()) for b in range(self.bands)]
+
+    def _find_near(self, signature: np.ndarray) -> Optional[int]:
+        candidates: Set[int] = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+        best, best_score = None, self.threshold
+        for idx in candidates:
+            score = float(np.mean(self._signatures[idx] == signature))
+            if score >= best_score:
+                best, best_score = idx, score
+        return best
+
+    # ------------------------------------------------------------------
+    # public API
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _occurrence(doc: Document) -> Dict:
+        return {"source_file": doc.metadata.get("source_file"), "page": doc.metadata.get("page")}
+
+    def _keep(self, vector_id: str, sources: List[Dict], text_hash: str, signature: Optional[np.ndarray]) -> None:
+        kept = (vector_id, sources)
+        self._exact[text_hash] = kept
+        if signature is not None:
+            idx = len(self._signatures)
+            self._signatures.append(signature)
+            self._kept.append(kept)
+            for key in self._band_keys(signature):
+                self._buckets[key].append(idx)
+
+    def check(self, doc: Document, vector_id: str) -> Optional[str]:
+        """Register a chunk. Returns None if it is new (embed it), else the kept vector id."""
+        if self.mode == "off":
+            return None
+        self.chunks += 1
+        text = normalize_text(doc.page_content)
+        text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+        match = self._exact.get(text_hash)
+        if match is not None:
+            self.exact_duplicates += 1
+        elif self.mode == "minhash" and text:
+            signature = self._signature(text)
+            near = self._find_near(signature)
+            if near is None:
+                self._keep(vector_id, [self._occurrence(doc)], text_hash, signature)
+                return None
+            match = self._kept[near]
+            self.near_duplicates += 1
+        else:
+            self._keep(vector_id, [self._occurrence(doc)], text_hash, None)
+            return None
+
+        kept_id, sources = match
+        sources.append(self._occurrence(doc))
+        self.merged_sources[kept_id] = sources
+        return kept_id
+
+    def seed(self, items: Iterable[Tuple[str, Document]], removed_sources: Collection[str] = ()) -> None:
+        """Register chunks that are already in the index so new files dedup against them.
+
+        removed_sources are files being deleted or re-processed: their copies
+        are dropped from the kept chunks' sources (re-processed files add
+        theirs back when they are checked again).
+        """
+        if self.mode == "off":
+            return
+        removed_sources = set(removed_sources)
+        for vector_id, doc in items:
+            text = normalize_text(doc.page_content)
+            text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if text_hash in self._exact:
+                continue
+            sources = list(doc.metadata.get("sources") or [self._occurrence(doc)])
+            kept = [s for s in sources if s.get("source_file") not in removed_sources]
+            if len(kept) != len(sources):
+                self.merged_sources[vector_id] = kept
+            signature = self._signature(text) if self.mode == "minhash" and text else None
+            self._keep(vector_id, kept, text_hash, signature)
+
+    def stats(self) -> Dict:
+        duplicates = self.exact_duplicates + self.near_duplicates
+        return {
+            "chunks": self.chunks,
+            "kept": self.chunks - duplicates,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "saved_vectors": duplicates,
+        }
@@ -0,0 +1,348 @@
+"""
+Chunk Store - SQLite-backed FAISS docstore addressed by vector id (replaces the pickled index.pkl)
+"""
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_STORE_FILE = "chunks.sqlite"
+
+# 자주 거르는 메타데이터는 인덱스가 걸린 컬럼으로, 나머지는 JSON 에서 꺼내 비교
+_COLUMN_FIELDS = ("source_file", "page")
+# SQLite 변수 개수 제한(999) 이내로 나눠서 조회
+_BATCH = 500
+
+
+def _chunks(items: List, size: int = _BATCH) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _matches(metadata: Dict, filter: Dict[str, Any]) -> bool:
+    for key, value in filter.items():
+        allowed = value if isinstance(value, (list, tuple, set)) else [value]
+        if metadata.get(key) not in allowed:
+            return False
+    return True
+
+
+class ChunkStore(Docstore, AddableMixin):
+    """Chunk text + metadata in SQLite, read one row per hit instead of unpickling everything.
+
+    Two tables: chunks (id -> text, metadata JSON, indexed source_file / page
+    columns) and positions (FAISS position -> id). Writes made through the
+    Docstore interface are kept in memory and written in one transaction by
+    save(), so the file on disk always matches the index.faiss saved with it;
+    readers in other processes see either the old or the new version.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL,"
+            " source_file TEXT, page INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source_file ON chunks(source_file)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_page ON chunks(page)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS positions (position INTEGER PRIMARY KEY, id TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        # 저장 전 변경분: 추가/수정된 문서, 삭제된 id
+        self._pending: Dict[str, Document] = {}
+        self._deleted: Set[str] = set()
+
+    # ── Docstore 인터페이스 ──────────────────────────────────────
+    def search(self, search: str):
+        doc = self.get_many([search])[0]
+        return doc if doc is not None else f"ID {search} not found."
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add or overwrite documents (kept in memory until save)."""
+        for vector_id, doc in texts.items():
+            self._pending[vector_id] = doc
+            self._deleted.discard(vector_id)
+
+    def delete(self, ids: List) -> None:
+        for vector_id in ids:
+            self._pending.pop(vector_id, None)
+            self._deleted.add(vector_id)
+
+    # ── 조회 ────────────────────────────────────────────────────
+    def get_many(self, ids: List[str]) -> List[Optional[Document]]:
+        """Documents for the given ids in the same order (None for unknown ids)."""
+        found: Dict[str, Document] = {}
+        lookup = [i for i in ids if i not in self._pending and i not in self._deleted]
+        with self._lock:
+            for part in _chunks(lookup):
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT id, page_content, metadata FROM chunks WHERE id IN ({placeholders})", part
+                ).fetchall()
+                for vector_id, text, metadata in rows:
+                    found[vector_id] = Document(page_content=text, metadata=json.loads(metadata))
+        found.update((i, self._pending[i]) for i in ids if i in self._pending)
+        return [found.get(i) for i in ids]
+
+    def ids_where(self, filter: Dict[str, Any]) -> Set[str]:
+        """Ids of chunks whose metadata matches every field (a list value means "any of")."""
+        clauses, params = [], []
+        for key, value in filter.items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            if not values:
+                return set()
+            if key in _COLUMN_FIELDS:
+                column = key
+            else:
+                # 키는 SQL 에 넣지 않고 JSON 경로로 바인딩
+                column = "json_extract(metadata, ?)"
+                params.append(f"$.{key}")
+            clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        where = " AND ".join(clauses) or "1"
+        with self._lock:
+            ids = {row[0] for row in self._conn.execute(f"SELECT id FROM chunks WHERE {where}", params)}
+        ids -= self._deleted
+        for vector_id, doc in self._pending.items():
+            if _matches(doc.metadata, filter):
+                ids.add(vector_id)
+            else:
+                ids.discard(vector_id)
+        return ids
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def position_ids(self) -> "ChunkIds":
+        """Lazy FAISS position -> vector id mapping for this store's saved positions."""
+        return ChunkIds(self)
+
+    def _id_at(self, pos: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM positions WHERE position = ?", (int(pos),)).fetchone()
+        return row[0] if row else None
+
+    def _ids_at(self, positions: List[int]) -> Dict[int, str]:
+        found: Dict[int, str] = {}
+        with self._lock:
+            for part in _chunks(positions):
+                rows = self._conn.execute(
+                    f"SELECT position, id FROM positions WHERE position IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def _ordered_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM positions ORDER BY position")]
+
+    def _ordered_metadata(self) -> List[Dict]:
+        # 텍스트는 읽지 않고 메타데이터만 위치 순서대로
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.metadata FROM positions p JOIN chunks c ON c.id = p.id ORDER BY p.position"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_rows(self, batch: int = 2048, with_text: bool = True) -> Iterator[List[tuple]]:
+        """Saved (position, id, metadata, text) rows in position order, one batch at a time.
+
+        Keyset pagination on position, so memory stays at one batch however
+        large the store is (text is None with with_text=False).
+        """
+        text_column = "c.page_content" if with_text else "NULL"
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT p.position, p.id, c.metadata, {text_column} FROM positions p JOIN chunks c ON c.id = p.id"
+                    " WHERE p.position > ? ORDER BY p.position LIMIT ?",
+                    (last, batch),
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [(pos, vector_id, json.loads(metadata), text) for pos, vector_id, metadata, text in rows]
+
+    def source_counts(self) -> List[tuple]:
+        """(source_file, chunks, first page, last page) per source file of the saved positions, largest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT c.source_file, COUNT(*), MIN(c.page), MAX(c.page) FROM positions p JOIN chunks c ON c.id = p.id"
+                " GROUP BY c.source_file ORDER BY COUNT(*) DESC, c.source_file"
+            ).fetchall()
+
+    def positions_of(self, ids: List[str]) -> Dict[str, int]:
+        """Saved FAISS position of each known vector id."""
+        found: Dict[str, int] = {}
+        with self._lock:
+            for part in _chunks(list(ids)):
+                rows = self._conn.execute(
+                    f"SELECT id, position FROM positions WHERE id IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    # ── 저장 ────────────────────────────────────────────────────
+    @staticmethod
+    def _row(vector_id: str, doc: Document) -> tuple:
+        metadata = doc.metadata or {}
+        page = metadata.get("page")
+        return (
+            vector_id,
+            doc.page_content,
+            json.dumps(metadata, ensure_ascii=False, default=str),
+            metadata.get("source_file"),
+            page if isinstance(page, int) else None,
+        )
+
+    def save(self, index_to_docstore_id: Mapping) -> None:
+        """Write pending changes and the position table in one transaction."""
+        incremental = isinstance(index_to_docstore_id, ChunkIds) and index_to_docstore_id.store is self
+        with self._lock, self._conn:
+            if self._deleted:
+                self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in self._deleted])
+            if self._pending:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, page_content, metadata, source_file, page) VALUES (?, ?, ?, ?, ?)",
+                    [self._row(i, doc) for i, doc in self._pending.items()],
+                )
+            if incremental:
+                # 추가만 있었으면 새 위치만 기록
+                rows = index_to_docstore_id.added.items()
+            else:
+                # 삭제 등으로 위치가 바뀌었으면 전체를 다시 기록
+                self._conn.execute("DELETE FROM positions")
+                rows = index_to_docstore_id.items()
+            self._conn.executemany("INSERT OR REPLACE INTO positions (position, id) VALUES (?, ?)", rows)
+        self._pending.clear()
+        self._deleted.clear()
+
+    def replace_all(self, index_to_docstore_id: Mapping, docstore: Docstore) -> None:
+        """Overwrite the store with every document of another docstore (e.g. an unpickled one)."""
+        ids = [index_to_docstore_id[pos] for pos in range(len(index_to_docstore_id))]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM positions")
+            for part in _chunks(ids):
+                docs = fetch_documents(docstore, part)
+                missing = [i for i, doc in zip(part, docs) if doc is None]
+                if missing:
+                    raise ValueError(f"Docstore has no document for ids: {missing[:5]}")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, page_content, metadata, source_file, page) VALUES (?, ?, ?, ?, ?)",
+                    [self._row(i, doc) for i, doc in zip(part, docs)],
+                )
+            self._conn.executemany("INSERT INTO positions (position, id) VALUES (?, ?)", enumerate(ids))
+        self._pending.clear()
+        self._deleted.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ChunkIds(Mapping):
+    """FAISS position -> vector id read from a ChunkStore, plus positions appended since loading.
+
+    LangChain's FAISS only calls update() on it when adding vectors; deletes
+    replace it with a plain dict, which ChunkStore.save() then writes in full.
+    """
+
+    def __init__(self, store: ChunkStore):
+        self.store = store
+        self._saved = len(store)
+        self.added: Dict[int, str] = {}
+
+    def __getitem__(self, pos: int) -> str:
+        if pos in self.added:
+            return self.added[pos]
+        vector_id = self.store._id_at(pos) if 0 <= pos < self._saved else None
+        if vector_id is None:
+            raise KeyError(pos)
+        return vector_id
+
+    def __len__(self) -> int:
+        return self._saved + len(self.added)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self)))
+
+    def get_many(self, positions: Iterable[int]) -> Dict[int, str]:
+        """Vector ids for many positions with one query per 500 positions."""
+        positions = {int(pos) for pos in positions}
+        found = {pos: self.added[pos] for pos in positions if pos in self.added}
+        found.update(self.store._ids_at([pos for pos in positions if pos not in found and pos < self._saved]))
+        return found
+
+    def update(self, other: Dict[int, str]) -> None:
+        self.added.update(other)
+
+    def values(self) -> List[str]:
+        # 위치마다 한 번씩 조회하지 않고 한 번에 읽기
+        return self.store._ordered_ids() + [self.added[pos] for pos in sorted(self.added)]
+
+    def items(self) -> List:
+        return list(enumerate(self.values()))
+
+
+def fetch_documents(docstore: Docstore, ids: List[str]) -> List[Optional[Document]]:
+    """Batch lookup for ChunkStore, one search() per id for other docstores."""
+    if isinstance(docstore, ChunkStore):
+        return docstore.get_many(ids)
+    docs = [docstore.search(i) for i in ids]
+    return [doc if isinstance(doc, Document) else None for doc in docs]
+
+
+def ids_at(index_to_docstore_id: Mapping, positions: Iterable[int]) -> Dict[int, str]:
+    """Position -> vector id for the given FAISS positions."""
+    if isinstance(index_to_docstore_id, ChunkIds):
+        return index_to_docstore_id.get_many(positions)
+    return {int(pos): index_to_docstore_id[int(pos)] for pos in positions}
+
+
+def ordered_ids(index_to_docstore_id: Mapping) -> List[str]:
+    """Vector ids in FAISS position order."""
+    if isinstance(index_to_docstore_id, ChunkIds):
+        return index_to_docstore_id.values()
+    return [index_to_docstore_id[pos] for pos in range(len(index_to_docstore_id))]
+
+
+def ordered_metadata(docstore: Docstore, index_to_docstore_id: Mapping) -> List[Dict]:
+    """Chunk metadata in FAISS position order (one SQL scan for a saved ChunkStore)."""
+    if (
+        isinstance(docstore, ChunkStore)
+        and isinstance(index_to_docstore_id, ChunkIds)
+        and index_to_docstore_id.store is docstore
+        and not index_to_docstore_id.added
+        and not docstore._pending
+        and not docstore._deleted
+    ):
+        return docstore._ordered_metadata()
+    metadatas = []
+    ids = ordered_ids(index_to_docstore_id)
+    for start in range(0, len(ids), _BATCH):
+        metadatas.extend(doc.metadata if doc is not None else {} for doc in fetch_documents(docstore, ids[start:start + _BATCH]))
+    return metadatas
+
+
+def iter_positions(index_to_docstore_id: Mapping) -> Iterable[str]:
+    """Vector ids in position order without reading the whole mapping up front."""
+    for pos in range(len(index_to_docstore_id)):
+        yield index_to_docstore_id[pos]
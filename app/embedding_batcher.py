@@ -0,0 +1,117 @@
+"""
+Embedding Batcher - token-aware, concurrent batching for embedding requests
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def default_token_counter() -> Callable[[str], int]:
+    """tiktoken (cl100k_base) token counter, or a byte-based estimate if unavailable."""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from UTF-8 length: {e}")
+        # 한글은 UTF-8 3바이트 ≈ 1.5토큰으로 넉넉하게 추정
+        return lambda text: max(1, len(text.encode("utf-8")) // 2)
+
+
+class EmbeddingBatcher:
+    """Packs texts into batches by token count and embeds them concurrently.
+
+    Batches are contiguous slices of the input, so results land back in input
+    order. A failed batch is retried on its own with exponential backoff; the
+    other batches are not resent. At most `concurrency` requests are open at
+    once per batcher, even when several threads call embed() at the same time.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_tokens_per_batch: int = 100_000,
+        max_batch_size: int = 1000,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        self.embeddings = embeddings
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.max_batch_size = max_batch_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._token_counter = token_counter
+        # 동시에 embed() 를 부르는 스레드(스트리밍 인덱싱의 in-flight 배치)들이 함께 쓰는 요청 한도
+        self._requests = threading.BoundedSemaphore(self.concurrency)
+
+    @property
+    def token_counter(self) -> Callable[[str], int]:
+        # tiktoken 인코딩 로딩은 첫 사용 시점까지 미룸
+        if self._token_counter is None:
+            self._token_counter = default_token_counter()
+        return self._token_counter
+
+    def pack_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """Split texts into contiguous (start, end) ranges within the token/size limits."""
+        batches = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            n_tokens = self.token_counter(text)
+            full = i - start >= self.max_batch_size or tokens + n_tokens > self.max_tokens_per_batch
+            if i > start and full:
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += n_tokens
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._requests:
+                    return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(
+                    f"Embedding batch of {len(texts)} failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts and return a (len(texts), dim) float32 matrix in input order."""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        batches = self.pack_batches(texts)
+        logger.info(
+            f"Embedding {len(texts)} texts in {len(batches)} token-packed batches "
+            f"(concurrency {self.concurrency})"
+        )
+
+        vectors: Optional[np.ndarray] = None
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [
+                (start, end, executor.submit(self._embed_batch, texts[start:end]))
+                for start, end in batches
+            ]
+            for start, end, future in futures:
+                batch_vectors = future.result()
+                if vectors is None:
+                    vectors = np.empty((len(texts), len(batch_vectors[0])), dtype=np.float32)
+                vectors[start:end] = batch_vectors
+        return vectors
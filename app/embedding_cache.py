@@ -0,0 +1,313 @@
+"""
+Embedding Cache - persistent SQLite cache in front of an embedding model
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# embed_query(text) == embed_documents([text])[0] 인 모델: 여러 질의를 한 번의 요청으로 보낼 수 있음
+_QUERY_SAME_AS_DOCUMENTS = ("OpenAIEmbeddings", "AzureOpenAIEmbeddings", "DeterministicFakeEmbedding")
+
+
+def normalize_text(text: str) -> str:
+    """NFC-normalize and collapse whitespace so trivially different copies share a key."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Query embeddings for several texts, in one request when the model allows it."""
+    if not texts:
+        return []
+    if hasattr(embeddings, "embed_queries"):
+        return embeddings.embed_queries(texts)
+    if type(embeddings).__name__ in _QUERY_SAME_AS_DOCUMENTS:
+        return embeddings.embed_documents(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+class EmbeddingCache:
+    """SQLite-backed store of embedding vectors keyed by model + normalized text hash.
+
+    Vectors are kept as float32 blobs. When the table grows past max_entries the
+    least recently used rows are evicted down to 90% of the limit.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500_000):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        payload = f"{model}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [self.make_key(model, t) for t in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite 변수 개수 제한(999)을 넘지 않도록 나눠서 조회
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        now = time.time()
+        rows = [
+            (self.make_key(model, t), model, np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                self._evict(int(self.max_entries * 0.9))
+            self._conn.commit()
+
+    def _evict(self, keep: int) -> None:
+        remove = self._count - keep
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (remove,),
+        )
+        self._count = keep
+        logger.info(f"Embedding cache evicted {remove} least recently used entries")
+
+    def recent(self, model: str, limit: int) -> List[tuple]:
+        """(key, vector) of the most recently used entries of one model, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, vector FROM embeddings WHERE model = ? ORDER BY last_used DESC LIMIT ?",
+                (model, limit),
+            ).fetchall()
+        return [(key, np.frombuffer(blob, dtype=np.float32).tolist()) for key, blob in rows]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that serves repeated texts from an EmbeddingCache.
+
+    Only cache misses are sent to the wrapped model. Query embeddings use their
+    own key namespace because some models embed queries differently.
+    """
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = model_name
+        # 배처 / 스트리밍 인덱싱의 워커 스레드들이 동시에 갱신하는 카운터
+        self._lock = threading.Lock()
+        self.api_calls = 0
+        self.api_texts = 0
+        self.api_seconds = 0.0
+        self.saved_chars = 0
+
+    def _embed_with_cache(self, namespace: str, texts: List[str], embed_fn) -> List[List[float]]:
+        cached = self.cache.get_many(namespace, texts)
+        miss_idx = [i for i, v in enumerate(cached) if v is None]
+        saved_chars = sum(len(t) for t, v in zip(texts, cached) if v is not None)
+        with self._lock:
+            self.saved_chars += saved_chars
+        if miss_idx:
+            miss_texts = [texts[i] for i in miss_idx]
+            start = time.perf_counter()
+            vectors = embed_fn(miss_texts)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.api_seconds += elapsed
+                self.api_calls += 1
+                self.api_texts += len(miss_texts)
+            self.cache.put_many(namespace, miss_texts, vectors)
+            for i, vector in zip(miss_idx, vectors):
+                cached[i] = list(vector)
+        return cached
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_with_cache(self.model_name, texts, self.underlying.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_with_cache(
+            f"{self.model_name}:query",
+            [text],
+            lambda miss: [self.underlying.embed_query(miss[0])],
+        )[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_with_cache(
+            f"{self.model_name}:query", texts, lambda miss: embed_queries(self.underlying, miss)
+        )
+
+    def stats(self) -> Dict:
+        """Hit/miss counters plus an estimate of the API time and text volume saved."""
+        hits, misses = self.cache.hits, self.cache.misses
+        with self._lock:
+            api_calls, api_texts, api_seconds, saved_chars = (
+                self.api_calls, self.api_texts, self.api_seconds, self.saved_chars
+            )
+        total = hits + misses
+        per_text = api_seconds / api_texts if api_texts else 0.0
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self.cache),
+            "api_calls": api_calls,
+            "api_seconds": round(api_seconds, 2),
+            "est_saved_seconds": round(hits * per_text, 2),
+            "saved_chars": saved_chars,
+        }
+
+
+class QueryEmbeddingLRU(Embeddings):
+    """Bounded in-process LRU of query embeddings in front of another Embeddings.
+
+    Keys are the same model + normalized text hashes as EmbeddingCache, so
+    when the wrapped embeddings are CachedEmbeddings, misses are written
+    through to its SQLite file and warm() can refill the LRU from it after a
+    restart. Document embeddings pass straight through.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, max_entries: int = 1024):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0
+
+    @property
+    def namespace(self) -> str:
+        return f"{self.model_name}:query"
+
+    def warm(self) -> int:
+        """Load the most recently used persisted query embeddings; returns how many were loaded."""
+        if not isinstance(self.underlying, CachedEmbeddings):
+            return 0
+        rows = self.underlying.cache.recent(self.namespace, self.max_entries)
+        with self._lock:
+            for key, vector in reversed(rows):
+                self._entries[key] = vector
+        return len(rows)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.make_key(self.namespace, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+        start = time.perf_counter()
+        vector = list(self.underlying.embed_query(text))
+        with self._lock:
+            self.misses += 1
+            self.miss_seconds += time.perf_counter() - start
+            self._entries[key] = vector
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batch version of embed_query: all LRU misses go to the wrapped model in one call."""
+        keys = [EmbeddingCache.make_key(self.namespace, text) for text in texts]
+        results: List[Optional[List[float]]] = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                results.append(vector)
+        miss_idx = [i for i, v in enumerate(results) if v is None]
+        if miss_idx:
+            start = time.perf_counter()
+            vectors = embed_queries(self.underlying, [texts[i] for i in miss_idx])
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.miss_seconds += elapsed
+                for i, vector in zip(miss_idx, vectors):
+                    results[i] = list(vector)
+                    self._entries[keys[i]] = results[i]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        with self._lock:
+            self.hits += len(texts) - len(miss_idx)
+            self.misses += len(miss_idx)
+        return results
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        per_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "est_saved_seconds": round(self.hits * per_miss, 2),
+        }
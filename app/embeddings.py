@@ -0,0 +1,281 @@
+"""
+Embedding Backends - OpenAI API, local CPU inference (sentence-transformers / ONNX int8) and offline hashing
+"""
+import os
+import re
+import json
+import math
+import zlib
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from lexical_index import tokenize
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# EMBEDDING_MODEL 접두사: local:<모델>, onnx:<모델>, hash[:<차원>], 그 외는 OpenAI 모델 이름
+EMBEDDING_BACKENDS = ("openai", "local", "onnx", "hash")
+
+
+def parse_embedding_model(name: str) -> Tuple[str, str]:
+    """("local", "intfloat/multilingual-e5-small") for "local:intfloat/multilingual-e5-small"."""
+    backend, sep, model = name.partition(":")
+    if sep and backend in EMBEDDING_BACKENDS:
+        return backend, model
+    if name == "hash":
+        return "hash", ""
+    return "openai", name
+
+
+def default_prefixes(model_name: str) -> Tuple[str, str]:
+    """(query prefix, document prefix) the model was trained with (E5 models need them)."""
+    if re.search(r"(^|[/-])e5", model_name.lower()):
+        return "query: ", "passage: "
+    return "", ""
+
+
+def create_embeddings(name: str) -> Embeddings:
+    """Embeddings for an EMBEDDING_MODEL value; local backends read their EMBEDDING_* settings."""
+    backend, model = parse_embedding_model(name)
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(model=model)
+    if backend == "hash":
+        return HashingEmbeddings(dim=int(model or os.getenv("EMBEDDING_DIM", 384)))
+
+    query_prefix, document_prefix = default_prefixes(model)
+    options = dict(
+        batch_size=int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", 32)),
+        threads=int(os.getenv("EMBEDDING_THREADS", 0)),
+        query_prefix=os.getenv("EMBEDDING_QUERY_PREFIX", query_prefix),
+        document_prefix=os.getenv("EMBEDDING_DOCUMENT_PREFIX", document_prefix),
+    )
+    if backend == "local":
+        return SentenceTransformerEmbeddings(model, **options)
+    return OnnxEmbeddings(
+        model,
+        model_dir=os.getenv("EMBEDDING_ONNX_DIR") or None,
+        quantize=os.getenv("EMBEDDING_ONNX_INT8", "true").lower() == "true",
+        max_length=int(os.getenv("EMBEDDING_MAX_LENGTH", 512)),
+        **options,
+    )
+
+
+def runs_locally(embeddings: Embeddings) -> bool:
+    """True for in-process models (concurrent batches would only compete for the same cores)."""
+    return getattr(embeddings, "runs_locally", False)
+
+
+class _LocalEmbeddings(Embeddings):
+    """Shared query / document prefix handling; subclasses implement _encode."""
+
+    runs_locally = True
+
+    def __init__(self, query_prefix: str = "", document_prefix: str = ""):
+        self.query_prefix = query_prefix
+        self.document_prefix = document_prefix
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode([self.document_prefix + t for t in texts]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode([self.query_prefix + t for t in texts]).tolist()
+
+
+class SentenceTransformerEmbeddings(_LocalEmbeddings):
+    """sentence-transformers model on CPU, encoded in batches of batch_size (sorted by length)."""
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 32,
+        threads: int = 0,
+        query_prefix: str = "",
+        document_prefix: str = "",
+        device: str = "cpu",
+    ):
+        super().__init__(query_prefix, document_prefix)
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_MODEL=local:... needs sentence-transformers (pip install sentence-transformers)") from e
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device=device)
+        logger.info(f"Local embedding model {model_name} loaded ({torch.get_num_threads()} threads, batch {batch_size})")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+
+
+class OnnxEmbeddings(_LocalEmbeddings):
+    """Transformer encoder run with onnxruntime on CPU, optionally int8 (dynamic quantization).
+
+    The model is exported to model.onnx (and quantized to model_int8.onnx)
+    once, into model_dir (default EMBEDDING_ONNX_DIR or ./data/models/<name>);
+    a folder that already has model.onnx + tokenizer files is used as is.
+    Outputs are mean-pooled over the attention mask (CLS pooling when the
+    folder's 1_Pooling/config.json says so) and L2-normalized.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_dir: Optional[str] = None,
+        quantize: bool = True,
+        batch_size: int = 32,
+        threads: int = 0,
+        max_length: int = 512,
+        query_prefix: str = "",
+        document_prefix: str = "",
+    ):
+        super().__init__(query_prefix, document_prefix)
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_MODEL=onnx:... needs onnxruntime and transformers") from e
+        if model_dir is None:
+            if os.path.exists(os.path.join(model_name, "model.onnx")):
+                model_dir = model_name
+            else:
+                model_dir = os.path.join("data", "models", re.sub(r"[^\w.-]+", "_", model_name))
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        path = ensure_onnx_model(model_name, model_dir, quantize)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._inputs = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.pooling = _pooling_mode(model_dir)
+        logger.info(f"ONNX embedding model loaded from {path} ({self.pooling} pooling, batch {batch_size})")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # 길이가 비슷한 텍스트끼리 묶어 패딩 낭비를 줄임
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        vectors: Optional[np.ndarray] = None
+        for start in range(0, len(texts), self.batch_size):
+            idx = order[start:start + self.batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in idx], padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+            )
+            mask = encoded["attention_mask"].astype(np.int64)
+            feeds = {
+                name: encoded[name].astype(np.int64) if name in encoded else np.zeros_like(mask)
+                for name in self._inputs
+            }
+            hidden = self.session.run(None, feeds)[0]
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                pooled = (hidden * mask[:, :, None]).sum(axis=1) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            if vectors is None:
+                vectors = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            vectors[idx] = pooled
+        return vectors
+
+
+def ensure_onnx_model(model_name: str, model_dir: str, quantize: bool = True) -> str:
+    """Path of model.onnx / model_int8.onnx in model_dir, exporting / quantizing it first if needed."""
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model_int8.onnx")
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        logger.info(f"Exporting {model_name} to {fp32_path} (one time)")
+        os.makedirs(model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = dict(tokenizer(["샘플 문장 sample"], return_tensors="pt"))
+        axes = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                (sample,),
+                fp32_path,
+                input_names=list(sample),
+                output_names=["last_hidden_state"],
+                dynamic_axes={**{name: axes for name in sample}, "last_hidden_state": axes},
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(model_dir)
+    if not quantize:
+        return fp32_path
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Quantizing {fp32_path} to int8")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def _pooling_mode(model_dir: str) -> str:
+    path = os.path.join(model_dir, "1_Pooling", "config.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if json.load(f).get("pooling_mode_cls_token"):
+                return "cls"
+    return os.getenv("EMBEDDING_POOLING", "mean").lower()
+
+
+class HashingEmbeddings(_LocalEmbeddings):
+    """Deterministic offline embedder: signed feature hashing of the BM25 tokens
+    (Hangul bigrams, alphanumeric terms) with log term frequencies, L2-normalized.
+
+    No model, no network: chunks sharing terms get close vectors, so tests and
+    air-gapped setups still get meaningful (lexical) retrieval.
+    """
+
+    def __init__(self, dim: int = 384):
+        super().__init__()
+        self.dim = dim
+
+    @staticmethod
+    @lru_cache(maxsize=1 << 18)
+    def _slot(token: str, dim: int) -> Tuple[int, float]:
+        h = zlib.crc32(token.encode("utf-8"))
+        return h % dim, 1.0 if (h >> 31) & 1 else -1.0
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                slot, sign = self._slot(token, self.dim)
+                vectors[row, slot] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
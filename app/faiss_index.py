@@ -0,0 +1,405 @@
+"""
+FAISS Index Factory - flat / IVF / HNSW index construction, vector codecs and search parameters
+"""
+import os
+import json
+import math
+import logging
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FAISS_INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+FAISS_CODECS = ("none", "fp16", "sq8", "pq")
+FAISS_CONFIG_FILE = "faiss_config.json"
+RERANK_VECTORS_FILE = "rerank_vectors.npy"
+RERANK_IDS_FILE = "rerank_ids.json"
+FAISS_INDEX_FILE = "index.faiss"
+VECTOR_LOAD_MODES = ("memory", "mmap")
+
+# k-means 학습 시 centroid 당 최소 학습 벡터 수 (FAISS 권장값)
+_MIN_POINTS_PER_CENTROID = 39
+
+
+@dataclass
+class FaissIndexConfig:
+    """Index type plus build / query-time parameters, saved next to index.faiss.
+
+    nlist=0 picks 4 * sqrt(n) inverted lists, capped so every list gets enough
+    training vectors. codec stores vectors as float16, int8 (scalar quantized)
+    or PQ codes instead of float32; rerank > 0 fetches k * rerank candidates
+    and re-orders them by exact distance to float32 copies kept on disk.
+    factory is filled in with the index_factory string actually used.
+    """
+
+    index_type: str = "flat"
+    codec: str = "none"
+    rerank: int = 0
+    nlist: int = 0
+    pq_m: int = 16
+    pq_nbits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    nprobe: int = 16
+    ef_search: int = 64
+    train_size: int = 50_000
+    factory: str = ""
+
+    def __post_init__(self):
+        if self.index_type not in FAISS_INDEX_TYPES:
+            raise ValueError(f"Unsupported FAISS index type: {self.index_type} (choose from {FAISS_INDEX_TYPES})")
+        if self.codec not in FAISS_CODECS:
+            raise ValueError(f"Unsupported FAISS codec: {self.codec} (choose from {FAISS_CODECS})")
+
+    @classmethod
+    def from_env(cls) -> "FaissIndexConfig":
+        return cls(
+            index_type=os.getenv("FAISS_INDEX_TYPE", "flat").lower(),
+            codec=os.getenv("FAISS_CODEC", "none").lower(),
+            rerank=int(os.getenv("FAISS_RERANK", 0)),
+            nlist=int(os.getenv("FAISS_NLIST", 0)),
+            pq_m=int(os.getenv("FAISS_PQ_M", 16)),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", 32)),
+            nprobe=int(os.getenv("FAISS_NPROBE", 16)),
+            ef_search=int(os.getenv("FAISS_EF_SEARCH", 64)),
+            train_size=int(os.getenv("FAISS_TRAIN_SIZE", 50_000)),
+        )
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["FaissIndexConfig"]:
+        path = os.path.join(index_dir, FAISS_CONFIG_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+    def save(self, index_dir: str) -> None:
+        os.makedirs(index_dir, exist_ok=True)
+        path = os.path.join(index_dir, FAISS_CONFIG_FILE)
+        # 스냅샷 / 샤드 복사본은 하드링크를 공유하므로 제자리에서 덮어쓰지 않음
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=1)
+        os.replace(f"{path}.tmp", path)
+
+    def with_search_overrides(self) -> "FaissIndexConfig":
+        """Copy with nprobe / efSearch / rerank taken from the environment when set there."""
+        data = asdict(self)
+        if os.getenv("FAISS_RERANK"):
+            data["rerank"] = int(os.getenv("FAISS_RERANK"))
+        if os.getenv("FAISS_NPROBE"):
+            data["nprobe"] = int(os.getenv("FAISS_NPROBE"))
+        if os.getenv("FAISS_EF_SEARCH"):
+            data["ef_search"] = int(os.getenv("FAISS_EF_SEARCH"))
+        return FaissIndexConfig(**data)
+
+    # ------------------------------------------------------------------
+    # factory strings
+    # ------------------------------------------------------------------
+    def resolve_nlist(self, n: int) -> int:
+        nlist = self.nlist or int(4 * math.sqrt(max(n, 1)))
+        return max(1, min(nlist, n // _MIN_POINTS_PER_CENTROID))
+
+    @property
+    def vector_codec(self) -> str:
+        return "pq" if self.index_type == "ivf_pq" else self.codec
+
+    @property
+    def is_exact(self) -> bool:
+        """Plain float32 flat index (exact search, nothing to train or convert)."""
+        return self.index_type == "flat" and self.vector_codec == "none"
+
+    def min_train_size(self) -> int:
+        """Vectors needed before this index type can be trained (0 = no training)."""
+        sizes = [0]
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            sizes.append(_MIN_POINTS_PER_CENTROID * max(self.nlist, 1))
+        if self.vector_codec == "pq":
+            sizes.append(_MIN_POINTS_PER_CENTROID * (1 << self.pq_nbits))
+        elif self.vector_codec == "sq8":
+            sizes.append(1)
+        return max(sizes)
+
+    def factory_string(self, dim: int, n: int) -> str:
+        codec = self.vector_codec
+        if codec == "pq" and dim % self.pq_m:
+            raise ValueError(f"FAISS_PQ_M={self.pq_m} must divide the embedding dimension {dim}")
+        code = {"none": "Flat", "fp16": "SQfp16", "sq8": "SQ8", "pq": f"PQ{self.pq_m}x{self.pq_nbits}"}[codec]
+        if self.index_type == "flat":
+            return code
+        if self.index_type == "hnsw":
+            return f"HNSW{self.hnsw_m}" if codec == "none" else f"HNSW{self.hnsw_m},{code}"
+        return f"IVF{self.resolve_nlist(n)},{code}"
+
+
+def set_search_params(index, config: FaissIndexConfig) -> None:
+    """Apply nprobe (IVF) / efSearch (HNSW) to an index; no-op for flat indexes."""
+    faiss = dependable_faiss_import()
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = config.nprobe
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = config.ef_search
+
+
+def search_selected(
+    index,
+    config: FaissIndexConfig,
+    queries: np.ndarray,
+    k: int,
+    positions: np.ndarray,
+    bitmap: np.ndarray,
+    scan_limit: int = 2048,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """index.search restricted to the given positions (bitmap = packbits(mask, bitorder="little")).
+
+    The bitmap goes into the FAISS search as an IDSelectorBitmap, so vectors
+    outside the selection are skipped while scanning, not fetched and then
+    dropped. Small selections on non-IVF indexes are instead scored directly
+    (one reconstruct + matrix product): cheaper than walking the whole index,
+    and exact where an HNSW walk would run out of matching neighbours.
+    """
+    faiss = dependable_faiss_import()
+    n = len(queries)
+    if len(positions) == 0:
+        return np.full((n, k), np.inf, dtype=np.float32), np.full((n, k), -1, dtype=np.int64)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None and len(positions) <= scan_limit:
+        return _scan_positions(index, queries, k, positions)
+
+    selector = faiss.IDSelectorBitmap(index.ntotal, faiss.swig_ptr(bitmap))
+    # 검색 파라미터를 넘기면 인덱스에 설정된 nprobe / efSearch 대신 이 값이 쓰임
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=config.nprobe)
+    elif is_hnsw(index):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=config.ef_search)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    try:
+        return index.search(queries, k, params=params)
+    except RuntimeError:
+        # IndexPQ 등 selector 를 지원하지 않는 인덱스
+        return _scan_positions(index, queries, k, positions)
+
+
+def _scan_positions(index, queries: np.ndarray, k: int, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    faiss = dependable_faiss_import()
+    vectors = index.reconstruct_batch(positions)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        distances = -(queries @ vectors.T)
+    else:
+        distances = (queries ** 2).sum(axis=1)[:, None] - 2.0 * (queries @ vectors.T) + (vectors ** 2).sum(axis=1)[None, :]
+    top = min(k, len(positions))
+    order = np.argpartition(distances, top - 1, axis=1)[:, :top]
+    order = np.take_along_axis(order, np.argsort(np.take_along_axis(distances, order, axis=1), axis=1), axis=1)
+    found_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    found_i = np.full((len(queries), k), -1, dtype=np.int64)
+    found_d[:, :top] = np.take_along_axis(distances, order, axis=1)
+    found_i[:, :top] = positions[order]
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        found_d[:, :top] = -found_d[:, :top]
+    return found_d, found_i
+
+
+def set_blas_threshold(threshold: int) -> None:
+    """Search batches of at least this many queries compute flat distances with one BLAS matrix product."""
+    faiss = dependable_faiss_import()
+    faiss.cvar.distance_compute_blas_threshold = threshold
+
+
+def is_hnsw(index) -> bool:
+    faiss = dependable_faiss_import()
+    return getattr(faiss.downcast_index(index), "hnsw", None) is not None
+
+
+def build_faiss_index(config: FaissIndexConfig, vectors: np.ndarray, train: bool = True):
+    """Create, train (on a random sample) and fill an index from an (n, dim) matrix.
+
+    Returns a flat index instead when the configured type needs training and
+    train is False (streaming: the first batch is no sample of the corpus) or
+    there are too few vectors yet; needs_conversion() / convert later.
+    """
+    faiss = dependable_faiss_import()
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    min_train = config.min_train_size()
+    if config.is_exact or (min_train and (not train or n < min_train)):
+        if config.is_exact:
+            config.factory = "Flat"
+        index = faiss.IndexFlatL2(dim)
+        index.add(vectors)
+        return index
+
+    config.factory = config.factory_string(dim, n)
+    index = faiss.index_factory(dim, config.factory, faiss.METRIC_L2)
+    if is_hnsw(index):
+        faiss.downcast_index(index).hnsw.efConstruction = config.ef_construction
+    if not index.is_trained:
+        sample = vectors
+        if n > config.train_size:
+            rng = np.random.default_rng(0)
+            sample = vectors[np.sort(rng.choice(n, size=config.train_size, replace=False))]
+        logger.info(f"Training FAISS {config.factory} on {len(sample)} of {n} vectors")
+        index.train(sample)
+    index.add(vectors)
+    set_search_params(index, config)
+    return index
+
+
+def needs_conversion(index, config: FaissIndexConfig) -> bool:
+    """True for a flat index whose configured type could now be trained and built."""
+    return (
+        not config.is_exact
+        and is_exact_flat(index)
+        and index.ntotal >= config.min_train_size()
+    )
+
+
+def is_exact_flat(index) -> bool:
+    faiss = dependable_faiss_import()
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def reconstruct_all(index) -> np.ndarray:
+    """All stored vectors (exact for flat / HNSW, decoded for compressed indexes)."""
+    faiss = dependable_faiss_import()
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def remove_positions(index, positions: List[int]) -> None:
+    """remove_ids that leaves positions dense (0..ntotal-1, order kept) for every index type.
+
+    Flat indexes compact themselves; IVF lists keep the old ids, so they are
+    renumbered in place (a direct map, which blocks removal, is dropped first).
+    """
+    faiss = dependable_faiss_import()
+    removed = np.unique(np.asarray(positions, dtype=np.int64))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    index.remove_ids(removed)
+    if ivf is not None:
+        invlists = ivf.invlists
+        for list_no in range(ivf.nlist):
+            size = invlists.list_size(list_no)
+            if size:
+                ids = faiss.rev_swig_ptr(invlists.get_ids(list_no), size)
+                ids[:] = ids - np.searchsorted(removed, ids)
+
+
+def read_faiss_index(index_dir: str, mmap: bool = False):
+    """Read index.faiss; with mmap=True the vectors stay on disk (read-only index)."""
+    faiss = dependable_faiss_import()
+    path = os.path.join(index_dir, FAISS_INDEX_FILE)
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC) if mmap else faiss.read_index(path)
+
+
+def write_faiss_index(index, index_dir: str) -> None:
+    """Write index.faiss via a temp file so processes that mmap the old file keep a valid copy."""
+    faiss = dependable_faiss_import()
+    path = os.path.join(index_dir, FAISS_INDEX_FILE)
+    faiss.write_index(index, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+
+
+class RerankVectors:
+    """Exact float32 copies of compressed vectors, keyed by vector id.
+
+    Saved as a .npy matrix (+ id list) next to the index and memory-mapped on
+    load, so only the rows of re-ranked candidates are ever paged into RAM.
+    Vectors added after loading stay in memory until the next save.
+    """
+
+    def __init__(self):
+        self._matrix: Optional[np.ndarray] = None
+        self._rows: Dict[str, int] = {}
+        self._pending: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["RerankVectors"]:
+        matrix_path = os.path.join(index_dir, RERANK_VECTORS_FILE)
+        ids_path = os.path.join(index_dir, RERANK_IDS_FILE)
+        if not (os.path.exists(matrix_path) and os.path.exists(ids_path)):
+            return None
+        store = cls()
+        store._matrix = np.load(matrix_path, mmap_mode="r")
+        with open(ids_path, "r", encoding="utf-8") as f:
+            store._rows = {vector_id: row for row, vector_id in enumerate(json.load(f))}
+        return store
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._pending)
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> None:
+        for vector_id, vector in zip(ids, np.asarray(vectors, dtype=np.float32)):
+            self._rows.pop(vector_id, None)
+            self._pending[vector_id] = vector
+
+    def remove(self, ids: List[str]) -> None:
+        for vector_id in ids:
+            self._rows.pop(vector_id, None)
+            self._pending.pop(vector_id, None)
+
+    def get(self, ids: List[str]) -> np.ndarray:
+        rows = np.array([self._rows.get(vector_id, -1) for vector_id in ids], dtype=np.int64)
+        on_disk = rows >= 0
+        out = np.empty((len(ids), self.dim), dtype=np.float32)
+        if on_disk.any():
+            order = np.argsort(rows[on_disk])  # 디스크 순서대로 읽기
+            picked = np.flatnonzero(on_disk)[order]
+            out[picked] = self._matrix[rows[picked]]
+        for i in np.flatnonzero(~on_disk):
+            out[i] = self._pending[ids[i]]
+        return out
+
+    @property
+    def dim(self) -> int:
+        """Vector dimension, 0 while no vector has been stored (empty index / all deleted)."""
+        if self._matrix is not None:
+            return self._matrix.shape[1]
+        if self._pending:
+            return len(next(iter(self._pending.values())))
+        return 0
+
+    def save(self, index_dir: str, ids: List[str], block: int = 8192) -> None:
+        """Write the vectors of ids (in index order) and re-open the file memory-mapped."""
+        if not ids:
+            # 벡터가 하나도 없으면 (모두 삭제) 이전 파일만 지움
+            self.remove_files(index_dir)
+            self._matrix, self._rows, self._pending = None, {}, {}
+            return
+        matrix_path = os.path.join(index_dir, RERANK_VECTORS_FILE)
+        tmp_path = f"{matrix_path}.tmp.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(len(ids), self.dim))
+        for start in range(0, len(ids), block):
+            out[start:start + block] = self.get(ids[start:start + block])
+        out.flush()
+        del out
+        os.replace(tmp_path, matrix_path)
+
+        ids_path = os.path.join(index_dir, RERANK_IDS_FILE)
+        with open(f"{ids_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(list(ids), f)
+        os.replace(f"{ids_path}.tmp", ids_path)
+
+        self._matrix = np.load(matrix_path, mmap_mode="r")
+        self._rows = {vector_id: row for row, vector_id in enumerate(ids)}
+        self._pending = {}
+
+    @staticmethod
+    def remove_files(index_dir: str) -> None:
+        for name in (RERANK_VECTORS_FILE, RERANK_IDS_FILE):
+            path = os.path.join(index_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,183 @@
+"""
+Index Manifest - per-source bookkeeping for incremental index rebuilds
+"""
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def vector_id_prefix(source_file: str, content_hash: str) -> str:
+    return hashlib.sha1(f"{source_file}:{content_hash}".encode("utf-8")).hexdigest()[:16]
+
+
+def make_vector_ids(source_file: str, content_hash: str, count: int) -> List[str]:
+    """Stable vector ids for the chunks of one source file version (<prefix>-<chunk_id>)."""
+    prefix = vector_id_prefix(source_file, content_hash)
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+def chunk_vector_ids(chunks) -> List[str]:
+    """Stable vector ids from each chunk's source file, chunk_id and text, so
+    ingesting the same chunks again overwrites them instead of adding copies."""
+    ids, seen = [], {}
+    for chunk in chunks:
+        key = f"{chunk.metadata.get('source_file', '')}:{chunk.metadata.get('chunk_id', '')}:{chunk.page_content}"
+        vector_id = hashlib.sha1(key.encode("utf-8")).hexdigest()[:24]
+        # 같은 파일 안의 완전히 같은 청크는 순번으로 구분
+        seen[vector_id] = seen.get(vector_id, -1) + 1
+        ids.append(f"{vector_id}-{seen[vector_id]}" if seen[vector_id] else vector_id)
+    return ids
+
+
+class IndexManifest:
+    """Records which source files (and which vector ids) an index contains.
+
+    Stored as JSON next to the index files. Each entry keeps the file's content
+    hash plus size/mtime, so unchanged files can be skipped without re-reading
+    them, and the vector ids needed to delete the file's chunks again.
+    """
+
+    def __init__(self, path: str, params: Optional[Dict] = None):
+        self.path = path
+        self.params: Dict = dict(params or {})
+        self.files: Dict[str, Dict] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "IndexManifest":
+        manifest = cls(path)
+        if not os.path.exists(path):
+            return manifest
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            manifest.params = data.get("params", {})
+            manifest.files = data.get("files", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+        return manifest
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "params": self.params,
+            "files": self.files,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Manifest saved to {self.path} ({len(self.files)} files)")
+
+    # ------------------------------------------------------------------
+    # params (chunking / embedding settings the vectors were built with)
+    # ------------------------------------------------------------------
+    def matches(self, **params) -> bool:
+        return all(self.params.get(key) == value for key, value in params.items())
+
+    def reset(self, **params) -> None:
+        self.params = dict(params)
+        self.files = {}
+
+    # ------------------------------------------------------------------
+    # per-file entries
+    # ------------------------------------------------------------------
+    def content_hash(self, pdf_path: str) -> str:
+        """Content hash of pdf_path, reusing the recorded one if size/mtime are unchanged."""
+        entry = self.files.get(os.path.basename(pdf_path))
+        stat = os.stat(pdf_path)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return entry["sha256"]
+        return file_sha256(pdf_path)
+
+    def is_current(self, pdf_path: str, content_hash: Optional[str] = None) -> bool:
+        entry = self.files.get(os.path.basename(pdf_path))
+        if entry is None:
+            return False
+        return entry["sha256"] == (content_hash or self.content_hash(pdf_path))
+
+    def vector_ids(self, source_file: str) -> List[str]:
+        entry = self.files.get(source_file)
+        return list(entry["vector_ids"]) if entry else []
+
+    def record(
+        self,
+        pdf_path: str,
+        content_hash: str,
+        vector_ids: List[str],
+        shared_ids: Iterable[str] = (),
+    ) -> None:
+        """Record a processed file.
+
+        vector_ids are the vectors the file owns; shared_ids are vectors owned by
+        other files that this file's duplicate chunks were merged into.
+        """
+        # 파일 없이 청크만 받은 경우(size/mtime 없음)에는 다음 plan 때 해시를 다시 계산
+        stat = os.stat(pdf_path) if os.path.exists(pdf_path) else None
+        self.files[os.path.basename(pdf_path)] = {
+            "sha256": content_hash,
+            "size": stat.st_size if stat else None,
+            "mtime": stat.st_mtime if stat else None,
+            "vector_ids": list(vector_ids),
+            "shared_ids": sorted(set(shared_ids)),
+        }
+
+    def dependents(self, removed_ids: Iterable[str]) -> List[str]:
+        """Source files whose merged duplicates point at any of removed_ids."""
+        removed = set(removed_ids)
+        return [
+            source_file
+            for source_file, entry in self.files.items()
+            if removed.intersection(entry.get("shared_ids", ()))
+        ]
+
+    def fingerprint(self) -> str:
+        """Short hash of the build params and every file's content hash; changes whenever the indexed content does."""
+        payload = json.dumps(
+            {"params": self.params, "files": {name: entry["sha256"] for name, entry in self.files.items()}},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def remove(self, source_file: str) -> List[str]:
+        """Drop a source file's entry and return the vector ids it owned."""
+        entry = self.files.pop(source_file, None)
+        return list(entry["vector_ids"]) if entry else []
+
+    def plan(self, pdf_paths: Iterable[str]) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """Compare pdf_paths with the manifest.
+
+        Returns (to_process, deleted): to_process holds (pdf_path, content_hash)
+        for new or changed files, deleted holds source file names that are in
+        the manifest but no longer on disk.
+        """
+        to_process = []
+        seen = set()
+        for pdf_path in pdf_paths:
+            source_file = os.path.basename(pdf_path)
+            seen.add(source_file)
+            content_hash = self.content_hash(pdf_path)
+            if not self.is_current(pdf_path, content_hash):
+                to_process.append((pdf_path, content_hash))
+        deleted = [source_file for source_file in self.files if source_file not in seen]
+        return to_process, deleted
@@ -0,0 +1,122 @@
+"""
+Index Snapshots - versioned index folders (snapshots/<version>) behind an atomically replaced CURRENT pointer
+"""
+import os
+import time
+import shutil
+import logging
+from typing import List, Optional
+
+from chunk_store import CHUNK_STORE_FILE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+# CURRENT 가 없을 때 (이전 버전 레이아웃) 읽는 인덱스 폴더
+LEGACY_INDEX = "index"
+
+
+def snapshots_enabled(store_type: str = "faiss") -> bool:
+    """INDEX_SNAPSHOTS (default on); Chroma keeps its own persist directory and is never snapshotted."""
+    return store_type == "faiss" and os.getenv("INDEX_SNAPSHOTS", "true").lower() == "true"
+
+
+def current_index(store_path: str) -> str:
+    """Index name (relative to store_path) readers should load: CURRENT's snapshot, else "index"."""
+    try:
+        with open(os.path.join(store_path, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return LEGACY_INDEX
+    return name or LEGACY_INDEX
+
+
+def list_snapshots(store_path: str) -> List[str]:
+    """Snapshot index names, oldest first (the folder names sort by creation time)."""
+    root = os.path.join(store_path, SNAPSHOT_DIR)
+    if not os.path.isdir(root):
+        return []
+    return [f"{SNAPSHOT_DIR}/{name}" for name in sorted(os.listdir(root)) if not name.startswith(".")]
+
+
+def _link_or_copy(source: str, target: str) -> str:
+    # SQLite 청크 스토어는 제자리에서 수정되므로 링크하면 게시된 인덱스까지 바뀜: 복사
+    if os.path.basename(source).startswith(CHUNK_STORE_FILE):
+        return shutil.copy2(source, target)
+    try:
+        os.link(source, target)
+    except OSError:
+        # 하드링크를 지원하지 않는 파일시스템
+        shutil.copy2(source, target)
+    return target
+
+
+def copy_index(source: str, target: str) -> None:
+    """Copy an index folder for a build, hard-linking every file but the chunk store.
+
+    Index files are only ever replaced whole (temp file + os.replace), so a
+    build that rewrites one breaks the link and never changes the source.
+    """
+    shutil.copytree(source, target, copy_function=_link_or_copy)
+
+
+def new_snapshot(store_path: str, copy_from: Optional[str] = None) -> str:
+    """Create an unpublished snapshot folder (a copy of copy_from, else empty) and return its index name.
+
+    Readers never look at it until publish_snapshot() points CURRENT there,
+    so a build can write into it for as long as it takes.
+    """
+    now = time.time()
+    name = f"{SNAPSHOT_DIR}/{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1e6) % 1_000_000:06d}"
+    path = os.path.join(store_path, name)
+    source = os.path.join(store_path, copy_from) if copy_from else None
+    if source and os.path.isdir(source):
+        copy_index(source, path)
+    else:
+        os.makedirs(path)
+    logger.info(f"Snapshot {name} created" + (f" from {copy_from}" if source else ""))
+    return name
+
+
+def _fsync_tree(path: str) -> None:
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            with open(os.path.join(root, file_name), "rb") as f:
+                os.fsync(f.fileno())
+
+
+def publish_snapshot(store_path: str, name: str, keep: Optional[int] = None) -> None:
+    """Point CURRENT at a finished snapshot (write + rename, so readers see the old or the new name)."""
+    # 파일을 먼저 디스크에 내려야 중단/전원 장애 후에도 CURRENT 가 반쯤 쓰인 스냅샷을 가리키지 않음
+    _fsync_tree(os.path.join(store_path, name))
+    tmp_path = os.path.join(store_path, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(store_path, CURRENT_FILE))
+    logger.info(f"Snapshot {name} published")
+    gc_snapshots(store_path, keep)
+
+
+def gc_snapshots(store_path: str, keep: Optional[int] = None) -> List[str]:
+    """Delete snapshots older than the newest `keep` published ones (SNAPSHOT_KEEP, default 3).
+
+    Snapshots newer than CURRENT may be builds in progress and are left alone.
+    A process still serving a deleted snapshot keeps reading its open files
+    until it swaps in the new version. Returns the removed names.
+    """
+    keep = max(1, keep if keep is not None else int(os.getenv("SNAPSHOT_KEEP", 3)))
+    current = current_index(store_path)
+    snapshots = list_snapshots(store_path)
+    if current not in snapshots:
+        return []
+    published = snapshots[:snapshots.index(current) + 1]
+    removed = published[:-keep]
+    for name in removed:
+        shutil.rmtree(os.path.join(store_path, name), ignore_errors=True)
+    if removed:
+        logger.info(f"Removed {len(removed)} old snapshots")
+    return removed
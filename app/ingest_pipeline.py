@@ -0,0 +1,65 @@
+"""
+Streaming Ingestion Pipeline - chunks → embedding batches → index appends
+"""
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Tuple
+
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _batched(items: Iterable[Tuple[Document, str]], batch_size: int) -> Iterator[List[Tuple[Document, str]]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_into_index(
+    vector_store,
+    items: Iterable[Tuple[Document, str]],
+    batch_size: int = 256,
+    max_in_flight: int = 4,
+) -> int:
+    """Embed (chunk, vector_id) pairs batch by batch and append them to vector_store.
+
+    The items iterator (usually lazy PDF parsing) keeps running in the calling
+    thread while up to max_in_flight batches are being embedded in the
+    background, so parsing overlaps with the embedding calls. At most
+    max_in_flight * batch_size chunks are buffered at any time, and batches are
+    appended in input order. The in-flight batches share the vector store's
+    embedding batcher, so open requests stay within EMBEDDING_CONCURRENCY.
+    Returns the number of chunks indexed.
+    """
+    total = 0
+    pending = deque()
+
+    def append_oldest() -> None:
+        nonlocal total
+        batch, future = pending.popleft()
+        vectors = future.result()
+        vector_store.append_embeddings(
+            [doc for doc, _ in batch], vectors, ids=[vector_id for _, vector_id in batch]
+        )
+        total += len(batch)
+        logger.info(f"Indexed {total} chunks so far")
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for batch in _batched(items, batch_size):
+            if len(pending) >= max_in_flight:
+                append_oldest()
+            future = executor.submit(vector_store.embed_documents, [doc for doc, _ in batch])
+            pending.append((batch, future))
+        while pending:
+            append_oldest()
+
+    vector_store.log_cache_stats()
+    return total
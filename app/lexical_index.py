@@ -0,0 +1,266 @@
+"""
+Lexical Index - BM25 over Hangul bigrams / alphanumeric tokens with compact numpy postings
+"""
+import os
+import re
+import math
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_FILE = "lexical_index.npz"
+SEARCH_MODES = ("vector", "hybrid")
+
+# CAS 번호(50-00-0)는 통째로, 한글은 연속 구간, 영문/숫자는 단어 단위
+_TOKEN = re.compile(r"\d+(?:-\d+)+|[가-힣]+|[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+# 검색 시 이 개수보다 많은 문서가 아직 postings 에 합쳐지지 않았으면 먼저 합침
+_COMPACT_THRESHOLD = 512
+
+
+def tokenize(text: str) -> List[str]:
+    """Hangul runs become character bigrams (no morphological analyzer needed:
+    "용출시험법을" still shares 용출/출시/시험/험법 with "용출시험법"); drug names,
+    CAS numbers and other alphanumeric terms are kept whole."""
+    tokens: List[str] = []
+    for match in _TOKEN.finditer(unicodedata.normalize("NFC", text).lower()):
+        token = match.group()
+        if "가" <= token[0] <= "힣":
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists by sum of 1 / (k + rank); ids found by several lists rise to the top."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def _encode_strings(values: Iterable[str]) -> np.ndarray:
+    return np.frombuffer("\n".join(values).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_strings(array: np.ndarray, count: int) -> List[str]:
+    return array.tobytes().decode("utf-8").split("\n") if count else []
+
+
+class LexicalIndex:
+    """Inverted index keyed by vector id, scored with BM25.
+
+    Postings are CSR arrays (term -> int32 doc positions, uint16 term
+    frequencies), 6 bytes per (term, chunk) pair on disk. The BM25 term
+    weight of every posting is precomputed when the arrays are (re)built, so
+    a query term costs one gather + add over its postings. Added chunks are
+    kept as per-chunk counters and removed chunks are masked out until
+    compact() (called by save and by search once enough chunks are waiting)
+    merges them into the arrays.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._terms: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.empty(0, dtype=np.int32)
+        self._tfs = np.empty(0, dtype=np.uint16)
+        self._impacts = np.empty(0, dtype=np.float32)
+        self._doc_ids: List[str] = []
+        self._doc_len = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._dead = 0
+        self._positions: Dict[str, int] = {}
+        self._pending: Dict[str, Counter] = {}
+        self._total_len = 0.0
+
+    def __len__(self) -> int:
+        return int(self._alive.sum()) + len(self._pending)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index (or re-index) chunks by vector id."""
+        with self._lock:
+            self._remove(ids)
+            for vector_id, text in zip(ids, texts):
+                counts = Counter(tokenize(text))
+                self._pending[vector_id] = counts
+                self._total_len += sum(counts.values())
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids: Iterable[str]) -> None:
+        for vector_id in ids:
+            counts = self._pending.pop(vector_id, None)
+            if counts is not None:
+                self._total_len -= sum(counts.values())
+            pos = self._positions.get(vector_id)
+            if pos is not None and self._alive[pos]:
+                self._alive[pos] = False
+                self._dead += 1
+                self._total_len -= float(self._doc_len[pos])
+
+    def search(
+        self, query: str, k: int = 10, allowed: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Top-k (vector_id, BM25 score) for the query; chunks sharing no term are left out.
+
+        allowed restricts the results to those vector ids (a metadata filter).
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if len(self._pending) > _COMPACT_THRESHOLD:
+                self._compact()
+            n = len(self)
+            if not terms or n == 0:
+                return []
+            avgdl = max(self._total_len / n, 1.0)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            pending_scores: Dict[str, float] = {}
+            for term in terms:
+                tid = self._terms.get(term)
+                start, end = (self._offsets[tid], self._offsets[tid + 1]) if tid is not None else (0, 0)
+                pending_tf = [(vid, counts[term]) for vid, counts in self._pending.items() if term in counts]
+                # 삭제 표시만 된 문서도 df 에 포함 (compact 전까지의 근사값)
+                df = (end - start) + len(pending_tf)
+                if df == 0:
+                    continue
+                idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+                if end > start:
+                    scores[self._docs[start:end]] += idf * self._impacts[start:end]
+                for vector_id, tf in pending_tf:
+                    length = sum(self._pending[vector_id].values())
+                    norm = self.k1 * (1.0 - self.b + self.b * length / avgdl)
+                    pending_scores[vector_id] = pending_scores.get(vector_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+            if self._dead:
+                scores[~self._alive] = 0.0
+            if allowed is not None:
+                keep = np.zeros(len(scores), dtype=bool)
+                keep[[self._positions[i] for i in allowed if i in self._positions]] = True
+                scores[~keep] = 0.0
+                pending_scores = {i: score for i, score in pending_scores.items() if i in allowed}
+            top = np.flatnonzero(scores)
+            if len(top) > k:
+                top = top[np.argpartition(-scores[top], k - 1)[:k]]
+            hits = [(self._doc_ids[i], float(scores[i])) for i in top]
+        hits.extend(pending_scores.items())
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:k]
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rebuild the postings arrays without removed chunks and with the pending ones merged in."""
+        if not self._pending and not self._dead:
+            return
+        live = np.flatnonzero(self._alive)
+        remap = np.full(len(self._doc_ids), -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+
+        term_of = np.repeat(np.arange(len(self._terms), dtype=np.int64), np.diff(self._offsets))
+        keep = remap[self._docs] >= 0 if len(self._docs) else np.empty(0, dtype=bool)
+        term_parts = [term_of[keep]]
+        doc_parts = [remap[self._docs[keep]]]
+        tf_parts = [self._tfs[keep]]
+
+        doc_ids = [self._doc_ids[i] for i in live]
+        doc_len = [self._doc_len[live]]
+        for vector_id, counts in self._pending.items():
+            doc = len(doc_ids)
+            doc_ids.append(vector_id)
+            tids = [self._terms.setdefault(term, len(self._terms)) for term in counts]
+            term_parts.append(np.array(tids, dtype=np.int64))
+            doc_parts.append(np.full(len(tids), doc, dtype=np.int64))
+            tf_parts.append(np.minimum(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), 65535).astype(np.uint16))
+            doc_len.append(np.array([sum(counts.values())], dtype=np.float32))
+
+        terms = np.concatenate(term_parts)
+        docs = np.concatenate(doc_parts)
+        tfs = np.concatenate(tf_parts)
+        order = np.lexsort((docs, terms))
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+
+        # 더 이상 어떤 청크에도 없는 단어는 사전에서 제거
+        vocab = sorted(self._terms, key=self._terms.get)
+        counts_per_term = np.bincount(terms, minlength=len(vocab))
+        used = np.flatnonzero(counts_per_term)
+        self._terms = {vocab[t]: i for i, t in enumerate(used)}
+        self._offsets = np.zeros(len(used) + 1, dtype=np.int64)
+        self._offsets[1:] = np.cumsum(counts_per_term[used])
+        self._docs = docs.astype(np.int32)
+        self._tfs = tfs
+        self._doc_ids = doc_ids
+        self._doc_len = np.concatenate(doc_len).astype(np.float32)
+        self._alive = np.ones(len(doc_ids), dtype=bool)
+        self._dead = 0
+        self._positions = {vector_id: i for i, vector_id in enumerate(doc_ids)}
+        self._pending = {}
+        self._total_len = float(self._doc_len.sum())
+        self._update_impacts()
+
+    def _update_impacts(self) -> None:
+        # BM25 의 tf / 문서 길이 부분 (idf 만 쿼리 시점에 곱함). avgdl 은 이 시점 기준
+        avgdl = max(float(self._doc_len.mean()), 1.0) if len(self._doc_len) else 1.0
+        norm = self.k1 * (1.0 - self.b + self.b * self._doc_len / avgdl)
+        tf = self._tfs.astype(np.float32)
+        self._impacts = tf * (self.k1 + 1.0) / (tf + norm[self._docs])
+
+    def save(self, index_dir: str) -> None:
+        path = os.path.join(index_dir, LEXICAL_INDEX_FILE)
+        with self._lock:
+            self._compact()
+            vocab = sorted(self._terms, key=self._terms.get)
+            with open(f"{path}.tmp", "wb") as f:
+                np.savez(
+                    f,
+                    terms=_encode_strings(vocab),
+                    term_count=np.array(len(vocab)),
+                    doc_ids=_encode_strings(self._doc_ids),
+                    doc_count=np.array(len(self._doc_ids)),
+                    offsets=self._offsets,
+                    docs=self._docs,
+                    tfs=self._tfs,
+                    doc_len=self._doc_len,
+                    params=np.array([self.k1, self.b]),
+                )
+            os.replace(f"{path}.tmp", path)
+        logger.info(f"Lexical index saved to {path} ({len(self._doc_ids)} chunks, {len(vocab)} terms)")
+
+    @classmethod
+    def load(cls, index_dir: str) -> Optional["LexicalIndex"]:
+        path = os.path.join(index_dir, LEXICAL_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            k1, b = data["params"].tolist()
+            index = cls(k1=k1, b=b)
+            vocab = _decode_strings(data["terms"], int(data["term_count"]))
+            index._terms = {term: i for i, term in enumerate(vocab)}
+            index._doc_ids = _decode_strings(data["doc_ids"], int(data["doc_count"]))
+            index._offsets = data["offsets"]
+            index._docs = data["docs"]
+            index._tfs = data["tfs"]
+            index._doc_len = data["doc_len"]
+        index._alive = np.ones(len(index._doc_ids), dtype=bool)
+        index._positions = {vector_id: i for i, vector_id in enumerate(index._doc_ids)}
+        index._total_len = float(index._doc_len.sum())
+        index._update_impacts()
+        return index
@@ -2,12 +2,33 @@
 Main Application - RAG PDF System (OpenAI QA + OpenAI Embeddings)
 """
 import os
+import re
+import json
 import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
 from dotenv import load_dotenv
+from langchain_core.documents import Document
 
 from pdf_processor import PDFProcessor
 from vector_store import VectorStoreManager
+from shard_router import ShardRouter
 from qa_chain import QAChain  # OpenAI Chat 버전
+from answer_cache import AnswerCache
+from metadata_filter import filter_key, normalize_filter
+from lexical_index import reciprocal_rank_fusion
+from embedding_cache import embed_queries
+from index_manifest import file_sha256, make_vector_ids
+from index_snapshots import current_index, new_snapshot, publish_snapshot, snapshots_enabled
+from monograph_index import MONOGRAPH_INDEX_FILE, MonographIndex, extract_monographs
+from revision_tables import (
+    REVISION_TABLE_FILE,
+    RevisionTableIndex,
+    extract_revision_rows,
+    is_revision_table_pdf,
+    revision_row_text,
+)
 
 # Load environment variables
 load_dotenv()
@@ -25,14 +46,76 @@ class RAGSystem:
         )
 
         # Vector store (default: FAISS)
-        self.vector_store = VectorStoreManager(
+        self.vector_store = self._new_vector_store()
+
+        # 인덱스 스냅샷: CURRENT 가 가리키는 snapshots/<버전> 을 읽고, 새 버전은 백그라운드에서 교체
+        self.snapshots = snapshots_enabled(self.vector_store.store_type)
+        self.index_name = current_index(self.vector_store.store_path) if self.snapshots else "index"
+        self.watch_seconds = float(os.getenv("INDEX_WATCH_SECONDS", 10))
+        self._swap_lock = threading.RLock()
+        # 저장하지 않은 upsert/delete 가 있으면 교체하지 않음 (앱에서 올린 PDF 가 사라지지 않도록)
+        self._dirty = False
+        self._watcher: threading.Thread | None = None
+        self._stop_watching = threading.Event()
+
+        # 변경대비표 표 인덱스 (현행/개정안 행 직접 조회)
+        self.revision_tables = RevisionTableIndex.load(self._revision_table_path())
+
+        # 각조 품목명(한글/영문/라틴명 + 별칭) → 청크 직접 조회: 이름 질문은 임베딩/벡터 검색 없이
+        self.monograph_synonyms: Dict[str, str] = {}
+        synonyms_path = os.getenv("MONOGRAPH_SYNONYMS")
+        if synonyms_path and os.path.exists(synonyms_path):
+            with open(synonyms_path, "r", encoding="utf-8") as f:
+                self.monograph_synonyms = json.load(f)
+        self.monographs = self._load_monographs()
+
+        # 컬렉션별 샤드 (VECTOR_SHARDS=all 또는 샤드 이름 목록): 설정하면 검색은 샤드들에서
+        # (변경대비표 / 품목명 인덱스도 샤드별로 읽어 합침)
+        self.shard_router: ShardRouter | None = None
+        self.shard_names = [s.strip() for s in os.getenv("VECTOR_SHARDS", "").split(",") if s.strip()]
+        if self.shard_names:
+            self.shard_router = ShardRouter(
+                self.vector_store.store_path,
+                embedding_model=self.vector_store.embedding_model,
+                embeddings=self.vector_store.base_embeddings,
+                monograph_synonyms=self.monograph_synonyms,
+            )
+
+        self.qa_chain: QAChain | None = None
+
+        # 답변 캐시: 같은/비슷한 질문은 검색 + LLM 생성 없이 저장된 답변과 출처를 반환
+        self.answer_cache: AnswerCache | None = None
+        if os.getenv("ANSWER_CACHE", "true").lower() == "true":
+            self.answer_cache = AnswerCache(
+                os.getenv("ANSWER_CACHE_PATH", os.path.join(self.vector_store.store_path, "answer_cache.sqlite")),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 2000)),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_HOURS", 168)) * 3600,
+                similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.97)),
+            )
+
+    def _new_vector_store(self, embeddings=None) -> VectorStoreManager:
+        return VectorStoreManager(
             store_type=os.getenv("VECTOR_STORE_TYPE", "faiss"),
             store_path=os.getenv("VECTOR_STORE_PATH", "./data/vectors"),
             # OpenAI 임베딩 기본값으로 교체
             embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+            embeddings=embeddings,
         )
 
-        self.qa_chain: QAChain | None = None
+    def _revision_table_path(self, index_name: Optional[str] = None) -> str:
+        return os.path.join(self.vector_store.index_dir(index_name or self.index_name), REVISION_TABLE_FILE)
+
+    def _monograph_path(self, index_name: Optional[str] = None) -> str:
+        return os.path.join(self.vector_store.index_dir(index_name or self.index_name), MONOGRAPH_INDEX_FILE)
+
+    def _load_monographs(self, index_name: Optional[str] = None) -> MonographIndex:
+        return MonographIndex.load(self._monograph_path(index_name), synonyms=self.monograph_synonyms)
+
+    def _side_indexes(self) -> Tuple[RevisionTableIndex, MonographIndex]:
+        """Revision table and monograph indexes of the loaded index (merged over the loaded shards)."""
+        if self.shard_router is not None:
+            return self.shard_router.side_indexes()
+        return self.revision_tables, self.monographs
 
     def _ensure_qa_chain(self):
         if self.qa_chain is None:
@@ -53,30 +136,251 @@ class RAGSystem:
         if not chunks:
             raise ValueError("No text chunks extracted from the PDF.")
 
-        # 2) Build vector store
-        self.vector_store.create_vectorstore(chunks)
-        self.vector_store.save_vectorstore()
+        # 2) Build vector store (manifest에 파일 해시 / 벡터 id 기록)
+        content_hash = file_sha256(pdf_path)
+        ids = make_vector_ids(os.path.basename(pdf_path), content_hash, len(chunks))
+        with self._swap_lock:
+            self._dirty = True
+            self.vector_store.create_vectorstore(chunks, ids=ids)
+            self.vector_store.manifest.reset(
+                chunk_size=self.pdf_processor.chunk_size,
+                chunk_overlap=self.pdf_processor.chunk_overlap,
+                embedding_model=self.vector_store.embedding_model,
+                faiss_index=self.vector_store.index_config.index_type,
+            )
+            self.vector_store.manifest.record(pdf_path, content_hash, ids)
+
+            # 3) 변경대비표면 표 행도 인덱싱 (인덱스를 새로 만들었으므로 표 인덱스도 이 파일 기준)
+            self.revision_tables = RevisionTableIndex(self._revision_table_path())
+            self.index_revision_tables(pdf_path)
+            self.monographs = MonographIndex(self._monograph_path(), synonyms=self.monograph_synonyms)
+            self.index_monographs(os.path.basename(pdf_path), chunks, ids)
+            self.save_index()
 
         logger.info("PDF ingestion completed.")
 
     def load_existing_index(self) -> None:
-        """Load an existing vector store."""
+        """Load an existing vector store (or the configured shards)."""
+        if self.shard_router is not None:
+            names = None if self.shard_names == ["all"] else self.shard_names
+            loaded = self.shard_router.load(names)
+            if not loaded:
+                raise RuntimeError(f"No shards found under {self.shard_router.store_path}")
+            logger.info(f"Shards loaded: {loaded}")
+            self.start_index_watcher()
+            return
         logger.info("Loading existing vector store...")
-        self.vector_store.load_vectorstore()
-        if not self.vector_store.vectorstore:
-            raise RuntimeError("Vector store failed to load or is empty.")
-        logger.info("Vector store loaded.")
+        with self._swap_lock:
+            if self.snapshots:
+                self.index_name = current_index(self.vector_store.store_path)
+            self.vector_store.load_vectorstore(self.index_name)
+            if not self.vector_store.vectorstore:
+                raise RuntimeError("Vector store failed to load or is empty.")
+            self.revision_tables = RevisionTableIndex.load(self._revision_table_path())
+            self.monographs = self._load_monographs()
+            self._dirty = False
+        logger.info(f"Vector store loaded ({self.index_name}).")
+        self.start_index_watcher()
+
+    def start_index_watcher(self, interval: Optional[float] = None) -> None:
+        """Poll for a newly published index (INDEX_WATCH_SECONDS) in a daemon thread and swap it in."""
+        interval = self.watch_seconds if interval is None else interval
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+
+        def watch() -> None:
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.refresh_index()
+                except Exception as e:
+                    logger.warning(f"Index watcher: could not load the new index version: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_index_watcher(self) -> None:
+        self._stop_watching.set()
+
+    def refresh_index(self) -> bool:
+        """Load a newly published snapshot (or replaced shards) and swap it in; True if something changed.
+
+        The new version is loaded into a separate VectorStoreManager first;
+        queries keep running on the old one and the swap itself is a single
+        assignment, so a query in flight finishes on the snapshot it started on.
+        """
+        if self.shard_router is not None:
+            return bool(self.shard_router.refresh())
+        if not self.snapshots or self.vector_store.vectorstore is None:
+            return False
+        name = current_index(self.vector_store.store_path)
+        if name == self.index_name or self._dirty:
+            return False
+
+        vector_store = self._new_vector_store(self.vector_store.base_embeddings)
+        # 같은 임베딩 캐시 / 질의 LRU 를 계속 사용
+        vector_store.embeddings = self.vector_store.embeddings
+        vector_store.batcher = self.vector_store.batcher
+        vector_store.load_vectorstore(name)
+        revision_tables = RevisionTableIndex.load(self._revision_table_path(name))
+        monographs = self._load_monographs(name)
+        with self._swap_lock:
+            if self._dirty:
+                return False
+            self.vector_store, self.index_name = vector_store, name
+            self.revision_tables, self.monographs = revision_tables, monographs
+        logger.info(f"Index snapshot {name} swapped in ({vector_store.count()} vectors)")
+        return True
 
-    def query(self, question: str) -> dict:
-        """Run a QA query using retrieval + LLM."""
+    def upsert_pdf(self, pdf_path: str, content_hash: str | None = None) -> int:
+        """Add or replace one PDF in the current index (not saved); returns its chunk count."""
+        if not pdf_path or not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF not found: {pdf_path}")
+
+        chunks = self.pdf_processor.process_pdf(pdf_path)
+        if not chunks:
+            raise ValueError(f"No text chunks extracted from the PDF: {pdf_path}")
+
+        params = dict(
+            chunk_size=self.pdf_processor.chunk_size,
+            chunk_overlap=self.pdf_processor.chunk_overlap,
+            embedding_model=self.vector_store.embedding_model,
+            faiss_index=self.vector_store.index_config.index_type,
+        )
+        with self._swap_lock:
+            self._dirty = True
+            manifest = self.vector_store.manifest
+            if self.vector_store.vectorstore is None:
+                # 새 인덱스를 만드는 경우: 디스크의 이전 표 인덱스도 이어받지 않음
+                manifest.params = params
+                self.revision_tables = RevisionTableIndex(self._revision_table_path())
+                self.monographs = MonographIndex(self._monograph_path(), synonyms=self.monograph_synonyms)
+            elif not manifest.params:
+                manifest.params = params
+            elif not manifest.matches(**params):
+                logger.warning(f"Index was built with {manifest.params}, adding {pdf_path} with {params}")
+
+            ids = self.vector_store.upsert_documents(
+                os.path.basename(pdf_path), chunks, content_hash=content_hash or file_sha256(pdf_path)
+            )
+            self.index_revision_tables(pdf_path)
+            self.index_monographs(os.path.basename(pdf_path), chunks, ids)
+        return len(chunks)
+
+    def delete_pdf(self, source_file: str) -> int:
+        """Remove one PDF (by file name) from the current index (not saved)."""
+        with self._swap_lock:
+            self._dirty = True
+            self.revision_tables.remove_source(source_file)
+            self.monographs.remove_source(source_file)
+            return self.vector_store.delete_source(source_file)
+
+    def save_index(self) -> None:
+        """Save the in-memory index; with snapshots as a new version that CURRENT then points to."""
+        with self._swap_lock:
+            if self.vector_store.vectorstore is None:
+                raise ValueError("Vector store not initialized")
+            name = new_snapshot(self.vector_store.store_path) if self.snapshots else "index"
+            self.vector_store.save_vectorstore(name)
+            self.revision_tables.path = self._revision_table_path(name)
+            self.revision_tables.save()
+            self.monographs.path = self._monograph_path(name)
+            self.monographs.save()
+            if self.snapshots:
+                publish_snapshot(self.vector_store.store_path, name)
+            self.index_name = name
+            self._dirty = False
+
+    def index_revision_tables(self, pdf_path: str) -> int:
+        """Extract the revision tables of pdf_path into the table index (not saved)."""
+        source_file = os.path.basename(pdf_path)
+        if not is_revision_table_pdf(pdf_path):
+            self.revision_tables.remove_source(source_file)
+            return 0
+        rows = extract_revision_rows(pdf_path)
+        self.revision_tables.replace_source(source_file, rows)
+        return len(rows)
+
+    def index_monographs(self, source_file: str, chunks: List[Document], ids: List[str]) -> int:
+        """Record the monographs found in one file's chunks (not saved); returns how many."""
+        monographs = extract_monographs(source_file, zip(chunks, ids))
+        self.monographs.replace_source(source_file, monographs)
+        return len(monographs)
+
+    def index_version(self, vector_store: Optional[VectorStoreManager] = None) -> str:
+        """Identifies the indexed content; changes on every upsert / delete / rebuild / snapshot swap."""
+        if self.shard_router is not None:
+            return self.shard_router.version()
+        vector_store = vector_store or self.vector_store
+        return f"{vector_store.manifest.fingerprint()}-{vector_store.count()}"
+
+    def _answer_scope(self, k: int, filter: Optional[Dict] = None, shards: Optional[List[str]] = None) -> str:
+        # 같은 인덱스라도 답변을 바꾸는 설정
+        filter = normalize_filter(filter)
+        return "|".join([
+            os.getenv("LLM_MODEL", "qwen2"),
+            os.getenv("LLM_TEMPERATURE", "0.2"),
+            f"k={k}",
+            self.vector_store.search_mode,
+            self.vector_store.embedding_model,
+            filter_key(filter) if filter else "",
+            ",".join(sorted(shards)) if shards else "",
+        ])
+
+    def query(self, question: str, filter: Optional[Dict] = None, shards: Optional[List[str]] = None) -> dict:
+        """Run a QA query using retrieval + LLM (or return a cached answer).
+
+        filter restricts retrieval to matching chunks, e.g. {"source_file": [...]}
+        (see VectorStoreManager.search); shards limits a sharded layout to
+        those collections.
+        """
         if not question or not question.strip():
             raise ValueError("Question is empty.")
-        if self.vector_store.vectorstore is None:
+        # 질의 하나는 처음 잡은 스냅샷에서 끝까지 처리 (도중에 새 버전으로 교체되어도)
+        # 벡터 스토어와 품목명 인덱스는 한 번에 읽어 서로 다른 버전이 섞이지 않게 함
+        with self._swap_lock:
+            vector_store, (_, monographs) = self.vector_store, self._side_indexes()
+        if self.shard_router is not None:
+            if not self.shard_router.loaded():
+                raise RuntimeError("No shards loaded. Load index or build a shard first.")
+        elif vector_store.vectorstore is None:
             raise RuntimeError("Vector store not ready. Load index or ingest PDF first.")
 
-        # 1) Retrieve
         k = int(os.getenv("TOP_K", 5))
-        docs = self.vector_store.search(question.strip(), k=k)
+        # 0) 질문에 나온 각조 품목명은 임베딩 없이 이름 인덱스에서 바로 찾음
+        direct_docs, name_only = self._monograph_docs(vector_store, monographs, question.strip(), k, filter, shards)
+
+        # 질의 임베딩은 한 번만: 답변 캐시 조회와 검색이 같은 벡터를 사용 (필요할 때 계산)
+        query_vectors: List[List[float]] = []
+
+        def embed_question(text: str) -> List[float]:
+            if not query_vectors:
+                query_vectors.extend(embed_queries(vector_store.embeddings, [text]))
+            return query_vectors[0]
+
+        if self.answer_cache is not None:
+            scope, version = self._answer_scope(k, filter, shards), self.index_version(vector_store)
+            cached = self.answer_cache.get(
+                scope, version, question.strip(), embed=None if name_only else embed_question
+            )
+            if cached is not None:
+                logger.info(f"Answer cache {cached['cache']} hit for: {question.strip()[:50]}")
+                return cached
+
+        # 1) Retrieve (품목명만 물은 경우 벡터 검색 생략, 아니면 품목 청크를 앞에 두고 나머지를 채움)
+        if name_only:
+            docs = direct_docs
+        elif self.shard_router is not None:
+            docs = self.shard_router.search(
+                question.strip(), k=k, shards=shards, filter=filter, query_vector=embed_question(question.strip())
+            )
+        else:
+            docs = vector_store.search(
+                question.strip(), k=k, filter=filter, query_vector=embed_question(question.strip())
+            )
+        if direct_docs and not name_only:
+            seen = {d.page_content for d in direct_docs}
+            docs = (direct_docs + [d for d in docs if d.page_content not in seen])[:k]
 
         # 2) Generate (OpenAI)
         self._ensure_qa_chain()
@@ -94,8 +398,112 @@ class RAGSystem:
                 }
             })
 
+        if self.answer_cache is not None and answer:
+            self.answer_cache.put(
+                scope, version, question.strip(), answer, sources,
+                vector=None if name_only else embed_question(question.strip()),
+            )
         return {"answer": answer, "sources": sources}
 
+    def _monograph_docs(
+        self, vector_store: VectorStoreManager, monographs: MonographIndex, question: str, k: int,
+        filter: Optional[Dict] = None, shards: Optional[List[str]] = None,
+    ) -> Tuple[List[Document], bool]:
+        """Chunks of the monographs named in the question, and whether the
+        question is nothing but those names (then no vector search is needed).
+
+        In sharded mode the chunks come from each monograph's shard. Chroma and
+        filters on fields other than source_file fall back to the vector search alone.
+        """
+        filter = normalize_filter(filter)
+        if (
+            vector_store.store_type != "faiss" or not len(monographs)
+            or (filter and set(filter) - {"source_file"})
+        ):
+            return [], False
+        found, name_only = monographs.match(question)
+        if filter:
+            allowed = filter["source_file"]
+            allowed = set(allowed) if isinstance(allowed, list) else {allowed}
+            found = [m for m in found if m["source_file"] in allowed]
+        if shards is not None:
+            found = [m for m in found if m.get("shard") in shards]
+        if not found:
+            return [], False
+
+        # 샤드 이름("" = 단일 인덱스) → 품목 청크 id
+        candidates: Dict[str, List[str]] = {}
+        for m in found:
+            candidates.setdefault(m.get("shard", ""), []).extend(m["chunk_ids"])
+        stores = {
+            shard: self.shard_router.manager(shard) if shard else vector_store
+            for shard in candidates
+        }
+        candidates = {
+            shard: list(dict.fromkeys(ids)) for shard, ids in candidates.items() if stores[shard] is not None
+        }
+        if name_only:
+            # 이름만 물으면 각조 앞부분(이름, 분자식, 성상 ...)부터 k 개
+            keys = [(shard, vector_id) for shard, ids in candidates.items() for vector_id in ids][:k]
+        else:
+            n = min(k, int(os.getenv("MONOGRAPH_TOP_CHUNKS", 2)))
+            # 품목 청크 중 품목명 외의 질문 용어(융점, 확인시험 ...)와 가장 많이 겹치는 것
+            # (렉시컬 인덱스가 없거나 겹치는 용어가 없으면 각조 앞부분)
+            rest = question
+            names = {m[key] for m in found for key in ("name_ko", "name_en", "name_latin") if m[key]}
+            for name in sorted(names, key=len, reverse=True):
+                rest = re.sub(re.escape(name), " ", rest, flags=re.IGNORECASE)
+            rankings = []
+            for shard, ids in candidates.items():
+                lexical_index = stores[shard].lexical_index
+                if lexical_index is not None:
+                    ranked = lexical_index.search(rest, n, allowed=set(ids))
+                    rankings.append([(shard, vector_id) for vector_id, _ in ranked])
+            keys = reciprocal_rank_fusion(rankings)[:n] or [
+                (shard, vector_id) for shard, ids in candidates.items() for vector_id in ids
+            ][:n]
+
+        by_store: Dict[str, List[str]] = {}
+        for shard, vector_id in keys:
+            by_store.setdefault(shard, []).append(vector_id)
+        fetched = {}
+        for shard, ids in by_store.items():
+            fetched.update(((shard, vector_id), doc) for vector_id, doc in zip(ids, stores[shard].get_documents(ids)))
+        docs = [fetched[key] for key in keys if fetched[key] is not None]
+        logger.info(f"Monograph hit: {', '.join(m['name_ko'] for m in found)} ({len(docs)} chunks)")
+        return docs, name_only and bool(docs)
+
+    def compare_revision(self, item_name: str) -> dict:
+        """Before/after revision table rows for an item or section name.
+
+        Rows come straight from the table index; the LLM is only used to
+        summarize them. Returns rows=[] (and no answer) when nothing matches.
+        """
+        if not item_name or not item_name.strip():
+            raise ValueError("Item name is empty.")
+
+        revision_tables, _ = self._side_indexes()
+        rows = revision_tables.lookup(
+            item_name.strip(), limit=int(os.getenv("REVISION_TABLE_TOP_K", 30))
+        )
+        if not rows:
+            return {"answer": None, "rows": [], "source_documents": []}
+
+        docs = [
+            Document(
+                page_content=revision_row_text(row),
+                metadata={"source": row["source"], "source_file": row["source_file"], "page": row["page"]},
+            )
+            for row in rows
+        ]
+        self._ensure_qa_chain()
+        answer = self.qa_chain.answer(
+            f"다음은 변경대비표에서 '{item_name.strip()}'에 해당하는 행입니다. "
+            "품목/항목별로 개정 전 내용, 개정 후 내용, 주요 변경사항을 요약해줘.",
+            contexts=docs,
+        )
+        return {"answer": answer, "rows": rows, "source_documents": docs}
+
 
 if __name__ == "__main__":
     print("RAG System initialized. Ready to use!")
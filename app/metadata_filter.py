@@ -0,0 +1,241 @@
+"""
+Metadata Filter - per-field position index over chunk metadata for filtered FAISS search
+"""
+import json
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 항상 색인하는 필드. FILTER_FIELDS 로 태그(edition 등) 필드를 추가
+BASE_FILTER_FIELDS = ("source_file", "page")
+_RANGE_OPS = ("gte", "gt", "lte", "lt")
+# 같은 필터의 선택 결과(bitmap)는 인덱스가 바뀔 때까지 재사용
+_SELECTION_CACHE_SIZE = 32
+# Chroma 메타데이터는 스칼라만 허용: sources 의 파일마다 "source_file:<파일>": True 키를 둬서 필터로 찾음
+CHROMA_SOURCE_PREFIX = "source_file:"
+
+
+@dataclass
+class Selection:
+    """FAISS positions matching a filter, as a sorted array and a little-endian bitmap."""
+
+    positions: np.ndarray
+    bitmap: np.ndarray
+    # hybrid 검색용 vector id 집합 (필요할 때 한 번 채움)
+    ids: Optional[Set[str]] = field(default=None, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+def normalize_filter(filter: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Validated copy of a filter; None / {} mean "no filter".
+
+    A field maps to a value (equality), a list of values ("any of") or, for
+    page, a range dict with gte / gt / lte / lt. Fields are ANDed.
+    """
+    if not filter:
+        return None
+    normalized = {}
+    for key, value in filter.items():
+        if isinstance(value, dict):
+            unknown = set(value) - set(_RANGE_OPS)
+            if unknown or not value:
+                raise ValueError(f"Unsupported range operators for {key}: {sorted(unknown)} (use {_RANGE_OPS})")
+            normalized[key] = {op: value[op] for op in _RANGE_OPS if op in value}
+        elif isinstance(value, (list, tuple, set)):
+            normalized[key] = sorted(value, key=str)
+        else:
+            normalized[key] = value
+    return normalized
+
+
+def filter_key(filter: Dict[str, Any]) -> str:
+    return json.dumps(filter, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _field_values(metadata: Dict, name: str) -> List:
+    """Hashable values a chunk has for a field (tag lists give several)."""
+    value = metadata.get(name)
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    if name == "source_file":
+        # 중복 제거된 청크는 다른 PDF 의 사본도 sources 에 기록되어 있음
+        values = list(values) + [s.get("source_file") for s in metadata.get("sources") or [] if isinstance(s, dict)]
+    return [v for v in values if v is not None and isinstance(v, (str, int, float, bool))]
+
+
+def chroma_where(filter: Dict[str, Any]) -> Dict[str, Any]:
+    """The same filter as a Chroma `where` clause.
+
+    source_file also matches chunks that list the file in their dedup
+    "sources", like the FAISS filter index.
+    """
+    clauses = []
+    for key, wanted in filter.items():
+        if key == "source_file" and wanted != []:
+            files = wanted if isinstance(wanted, list) else [wanted]
+            clauses.append({"$or": [{key: {"$in": files}}] + [{f"{CHROMA_SOURCE_PREFIX}{f}": True} for f in files]})
+        elif isinstance(wanted, dict):
+            clauses.extend({key: {f"${op}": value}} for op, value in wanted.items())
+        elif isinstance(wanted, list):
+            clauses.append({key: {"$in": wanted}})
+        else:
+            clauses.append({key: wanted})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def chroma_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata Chroma accepts: scalar values only, lists / dicts as JSON strings, None dropped.
+
+    Each file in the dedup "sources" also gets a "source_file:<file>": True
+    flag that chroma_where() can match.
+    """
+    clean = {}
+    for key, value in metadata.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, dict)):
+            value = json.dumps(value, ensure_ascii=False)
+        elif not isinstance(value, (str, int, float, bool)):
+            value = str(value)
+        clean[key] = value
+    for source in metadata.get("sources") or []:
+        if isinstance(source, dict) and source.get("source_file"):
+            clean[f"{CHROMA_SOURCE_PREFIX}{source['source_file']}"] = True
+    return clean
+
+
+def from_chroma_metadata(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Inverse of chroma_metadata(): JSON-encoded lists / dicts (e.g. dedup "sources") are decoded."""
+    decoded = {}
+    for key, value in (metadata or {}).items():
+        if key.startswith(CHROMA_SOURCE_PREFIX):
+            continue
+        if isinstance(value, str) and value[:1] in ("[", "{"):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        decoded[key] = value
+    return decoded
+
+
+class MetadataFilterIndex:
+    """Inverted lists (value -> sorted FAISS positions) per categorical field
+    plus a dense int32 array for page, aligned with the FAISS positions.
+
+    select() turns a filter into the bitmap an IDSelectorBitmap reads, so the
+    FAISS search itself skips every other vector. Appends go to the end like
+    FAISS add(); remove_positions() renumbers the way FAISS remove_ids() /
+    LangChain's delete() compact the remaining vectors.
+    """
+
+    def __init__(self, fields: Sequence[str] = ()):
+        self.fields = tuple(dict.fromkeys([*BASE_FILTER_FIELDS, *fields]))
+        self._lock = threading.Lock()
+        self._size = 0
+        self._pages = np.empty(0, dtype=np.int32)
+        self._lists: Dict[str, Dict[Any, np.ndarray]] = {name: {} for name in self.fields if name != "page"}
+        # 추가된 위치는 모아 두었다가 select 시점에 배열로 합침
+        self._pending: Dict[str, Dict[Any, List[int]]] = {name: defaultdict(list) for name in self._lists}
+        self._pending_pages: List[int] = []
+        self._selections: "OrderedDict[str, Selection]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, metadatas: Iterable[Dict]) -> None:
+        """Index chunks appended at the next positions, in order."""
+        with self._lock:
+            for metadata in metadatas:
+                metadata = metadata or {}
+                pos = self._size
+                page = metadata.get("page")
+                self._pending_pages.append(page if isinstance(page, int) and not isinstance(page, bool) else -1)
+                for name, pending in self._pending.items():
+                    for value in set(_field_values(metadata, name)):
+                        pending[value].append(pos)
+                self._size += 1
+            self._selections.clear()
+
+    def remove_positions(self, positions: Iterable[int]) -> None:
+        """Drop chunks and shift the later positions down, as FAISS does on delete."""
+        removed = np.unique(np.asarray(list(positions), dtype=np.int64))
+        if not len(removed):
+            return
+        with self._lock:
+            self._merge()
+            keep = np.ones(self._size, dtype=bool)
+            keep[removed] = False
+            self._pages = self._pages[keep]
+            for name, lists in self._lists.items():
+                for value in list(lists):
+                    kept = lists[value][keep[lists[value]]]
+                    if len(kept):
+                        lists[value] = kept - np.searchsorted(removed, kept)
+                    else:
+                        del lists[value]
+            self._size = int(keep.sum())
+            self._selections.clear()
+
+    def _merge(self) -> None:
+        if self._pending_pages:
+            self._pages = np.concatenate([self._pages, np.asarray(self._pending_pages, dtype=np.int32)])
+            self._pending_pages = []
+        for name, pending in self._pending.items():
+            lists = self._lists[name]
+            for value, positions in pending.items():
+                added = np.asarray(positions, dtype=np.int64)
+                lists[value] = np.concatenate([lists[value], added]) if value in lists else added
+            pending.clear()
+
+    def select(self, filter: Dict[str, Any]) -> Selection:
+        """Positions matching a normalized filter; unknown fields raise ValueError."""
+        unknown = [name for name in filter if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Cannot filter on {unknown}: indexed fields are {list(self.fields)} (see FILTER_FIELDS)")
+        key = filter_key(filter)
+        with self._lock:
+            cached = self._selections.get(key)
+            if cached is not None:
+                self._selections.move_to_end(key)
+                return cached
+            self._merge()
+            mask = np.ones(self._size, dtype=bool)
+            for name, wanted in filter.items():
+                mask &= self._field_mask(name, wanted)
+            selection = Selection(
+                positions=np.flatnonzero(mask),
+                bitmap=np.packbits(mask, bitorder="little"),
+            )
+            self._selections[key] = selection
+            if len(self._selections) > _SELECTION_CACHE_SIZE:
+                self._selections.popitem(last=False)
+        return selection
+
+    def _field_mask(self, name: str, wanted) -> np.ndarray:
+        if name == "page":
+            pages = self._pages
+            if isinstance(wanted, dict):
+                mask = pages >= 0
+                for op, value in wanted.items():
+                    mask &= {"gte": pages >= value, "gt": pages > value, "lte": pages <= value, "lt": pages < value}[op]
+                return mask
+            allowed = wanted if isinstance(wanted, list) else [wanted]
+            return np.isin(pages, [v for v in allowed if isinstance(v, int)])
+        if isinstance(wanted, dict):
+            raise ValueError(f"Range filters are only supported on page, not {name}")
+        mask = np.zeros(self._size, dtype=bool)
+        lists = self._lists[name]
+        for value in wanted if isinstance(wanted, list) else [wanted]:
+            positions = lists.get(value)
+            if positions is not None:
+                mask[positions] = True
+        return mask
@@ -0,0 +1,63 @@
+"""
+index.pkl → chunks.sqlite 변환 스크립트 (이전 버전이 저장한 FAISS 인덱스용, 1회 실행)
+
+사용 예:
+    python app/migrate_docstore.py                      # VECTOR_STORE_PATH/index
+    python app/migrate_docstore.py ./data/vectors/index --remove-pkl
+"""
+import os
+import pickle
+import logging
+import argparse
+
+from dotenv import load_dotenv
+
+from chunk_store import CHUNK_STORE_FILE, ChunkStore
+from faiss_index import read_faiss_index
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def migrate_docstore(index_dir: str, remove_pkl: bool = False) -> int:
+    """Copy the pickled docstore of one index folder into chunks.sqlite; returns the chunk count."""
+    pkl_path = os.path.join(index_dir, "index.pkl")
+    if not os.path.exists(pkl_path):
+        raise FileNotFoundError(f"No index.pkl in {index_dir}")
+
+    # 신뢰할 수 있는 (직접 만든) 인덱스에 대해서만 실행할 것: pickle 로드는 임의 코드를 실행할 수 있음
+    with open(pkl_path, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    # 헤더만 읽으면 되므로 mmap 으로 열어 벡터 수만 확인
+    ntotal = read_faiss_index(index_dir, mmap=True).ntotal
+    if len(index_to_docstore_id) != ntotal:
+        raise ValueError(f"index.pkl has {len(index_to_docstore_id)} ids but index.faiss has {ntotal} vectors")
+
+    store = ChunkStore(os.path.join(index_dir, CHUNK_STORE_FILE))
+    store.replace_all(index_to_docstore_id, docstore)
+    store.close()
+    logger.info(f"✅ {index_dir}: {ntotal} chunks → {CHUNK_STORE_FILE}")
+
+    if remove_pkl:
+        os.remove(pkl_path)
+        logger.info(f"🗑️ Removed {pkl_path}")
+    return ntotal
+
+
+def main() -> None:
+    load_dotenv()
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    vector_path = os.getenv("VECTOR_STORE_PATH") or os.path.join(os.path.dirname(app_dir), "data", "vectors")
+
+    parser = argparse.ArgumentParser(description="Convert pickled FAISS docstores (index.pkl) to chunks.sqlite")
+    parser.add_argument("index_dirs", nargs="*", default=[os.path.join(vector_path, "index")])
+    parser.add_argument("--remove-pkl", action="store_true", help="변환 후 index.pkl 삭제")
+    args = parser.parse_args()
+
+    for index_dir in args.index_dirs:
+        migrate_docstore(index_dir, remove_pkl=args.remove_pkl)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Monograph Index - monograph names (Korean / English / Latin) → page range and chunk ids for direct lookups
+"""
+import os
+import re
+import json
+import logging
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONOGRAPH_INDEX_FILE = "monographs.json"
+
+_HANGUL = re.compile(r"[가-힣]")
+_ENGLISH_NAME = re.compile(r"^[A-Z][A-Za-z0-9 ,.\-()'/]*[A-Za-z]{3}$")
+_LATIN_NAME = re.compile(r"^[A-Z][a-z]+(?: [A-Za-z]+)*$")
+_LATIN_ENDINGS = ("um", "ae", "i", "us", "is", "a", "es")
+# 품목명 다음 몇 줄 안에 오는 각조 머리 부분: 분자식, CAS 번호, "이 약은 ... 함유한다"
+_HEADING_CUES = (
+    re.compile(r"^C\d+H\d+"),
+    re.compile(r"\[\d{2,7}-\d{2}-\d\]"),
+    re.compile(r"^이\s?약[은을]"),
+)
+# 이 길이보다 긴 이름은 질문에서 찾지 않음 (스캔 비용 상한)
+_MAX_KEY_LENGTH = 60
+
+
+def name_key(text: str) -> str:
+    """Lookup key of a name: NFC, lower case, letters / digits / Hangul only."""
+    return "".join(c for c in unicodedata.normalize("NFC", text or "").lower() if c.isalnum())
+
+
+def _key_with_boundaries(text: str) -> Tuple[str, Set[int]]:
+    """name_key(text) plus the key offsets that sit on a word boundary of the original text."""
+    chars: List[str] = []
+    boundaries = {0}
+    gap = False
+    for c in unicodedata.normalize("NFC", text or "").lower():
+        if not c.isalnum():
+            gap = True
+            continue
+        if chars and (gap or c.isascii() != chars[-1].isascii()):
+            boundaries.add(len(chars))
+        chars.append(c)
+        gap = False
+    boundaries.add(len(chars))
+    return "".join(chars), boundaries
+
+
+def _is_korean_name(line: str) -> bool:
+    return (
+        bool(_HANGUL.search(line))
+        and len(line) <= 40
+        and not line.startswith(("(", "[", "<"))
+        and not line[0].isdigit()
+        and not any(c in line for c in ":=.")
+        and not line.endswith("다")
+    )
+
+
+def _is_latin_name(line: str) -> bool:
+    return bool(_LATIN_NAME.match(line)) and line.split()[-1].lower().endswith(_LATIN_ENDINGS)
+
+
+def monograph_heading(lines: List[str], i: int) -> Optional[Tuple[str, str, str]]:
+    """(Korean, English, Latin) names if lines[i] starts a monograph.
+
+    KP monographs open with the Korean name, the English name and usually the
+    Latin name on separate lines, followed by the molecular formula / CAS
+    number or, for preparations, "이 약은 ...".
+    """
+    if i + 1 >= len(lines) or not _is_korean_name(lines[i]) or not _ENGLISH_NAME.match(lines[i + 1]):
+        return None
+    latin = lines[i + 2] if i + 2 < len(lines) and _is_latin_name(lines[i + 2]) else ""
+    following = lines[i + 2:i + 6]
+    if not latin and not any(cue.search(line) for line in following for cue in _HEADING_CUES):
+        return None
+    return lines[i], lines[i + 1], latin
+
+
+class MonographExtractor:
+    """Finds monograph headings in one source file's chunks (fed in chunk order)
+    and assigns every chunk to the monograph it belongs to."""
+
+    def __init__(self, source_file: str):
+        self.source_file = source_file
+        self.monographs: List[Dict] = []
+
+    def add(self, chunk: Document, vector_id: str) -> None:
+        page = chunk.metadata.get("page")
+        lines = [line.strip() for line in chunk.page_content.split("\n") if line.strip()]
+        for i in range(len(lines)):
+            names = monograph_heading(lines, i)
+            # chunk_overlap 때문에 같은 제목이 다음 청크 앞부분에 다시 나올 수 있음
+            if names is None or (self.monographs and self.monographs[-1]["name_ko"] == names[0]):
+                continue
+            if self.monographs and i > 0:
+                # 제목 앞부분은 이전 품목의 끝
+                self._assign(self.monographs[-1], vector_id, page)
+            self.monographs.append({
+                "name_ko": names[0],
+                "name_en": names[1],
+                "name_latin": names[2],
+                "source_file": self.source_file,
+                "page_start": page,
+                "page_end": page,
+                "chunk_ids": [],
+            })
+        if self.monographs:
+            self._assign(self.monographs[-1], vector_id, page)
+
+    @staticmethod
+    def _assign(monograph: Dict, vector_id: str, page: Optional[int]) -> None:
+        if vector_id not in monograph["chunk_ids"]:
+            monograph["chunk_ids"].append(vector_id)
+        if page is not None:
+            monograph["page_end"] = max(monograph["page_end"] or 0, page)
+
+
+def extract_monographs(source_file: str, items: Iterable[Tuple[Document, str]]) -> List[Dict]:
+    """Monographs of one file from its (chunk, vector id) pairs in chunk order."""
+    extractor = MonographExtractor(source_file)
+    for chunk, vector_id in items:
+        extractor.add(chunk, vector_id)
+    return extractor.monographs
+
+
+class MonographIndex:
+    """Monograph names and synonyms → monographs, saved as JSON next to the index.
+
+    Keys are name_key() strings in a dict, so an exact lookup is one hash
+    probe and match() finds the names inside a question with a longest-match
+    scan — no embedding call either way.
+    """
+
+    def __init__(self, path: str, synonyms: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.monographs: List[Dict] = []
+        # 별칭 → 품목명 (예: {"ASA": "아스피린"})
+        self.synonyms = dict(synonyms or {})
+        self._keys: Dict[str, List[int]] = {}
+        self._max_length = 0
+
+    @classmethod
+    def load(cls, path: str, synonyms: Optional[Dict[str, str]] = None) -> "MonographIndex":
+        index = cls(path, synonyms)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                index.monographs = json.load(f).get("monographs", [])
+            logger.info(f"Monograph index loaded: {len(index.monographs)} monographs")
+        index._reindex()
+        return index
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"monographs": self.monographs}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Monograph index saved to {self.path} ({len(self.monographs)} monographs)")
+
+    def __len__(self) -> int:
+        return len(self.monographs)
+
+    def _reindex(self) -> None:
+        self._keys = {}
+        for i, monograph in enumerate(self.monographs):
+            for name in (monograph["name_ko"], monograph["name_en"], monograph["name_latin"]):
+                self._add_key(name_key(name), i)
+        for alias, name in self.synonyms.items():
+            for i in self._keys.get(name_key(name), []):
+                self._add_key(name_key(alias), i)
+        self._max_length = min(max((len(key) for key in self._keys), default=0), _MAX_KEY_LENGTH)
+
+    def _add_key(self, key: str, i: int) -> None:
+        if len(key) >= 2 and i not in self._keys.get(key, ()):
+            self._keys.setdefault(key, []).append(i)
+
+    def remove_source(self, source_file: str) -> None:
+        self.monographs = [m for m in self.monographs if m["source_file"] != source_file]
+        self._reindex()
+
+    def replace_source(self, source_file: str, monographs: List[Dict]) -> None:
+        self.monographs = [m for m in self.monographs if m["source_file"] != source_file] + monographs
+        self._reindex()
+
+    def extend(self, monographs: List[Dict]) -> None:
+        """Append monographs from another index (e.g. another shard's)."""
+        self.monographs = self.monographs + monographs
+        self._reindex()
+
+    def lookup(self, name: str) -> List[Dict]:
+        """Monographs whose Korean / English / Latin name or synonym is exactly name."""
+        return [self.monographs[i] for i in self._keys.get(name_key(name), [])]
+
+    def match(self, text: str) -> Tuple[List[Dict], bool]:
+        """Monographs named anywhere in text (longest names first, in order of appearance),
+        and whether text consists of nothing but those names.
+
+        Hangul names also match with a particle attached ("아스피린의"); names
+        in Latin script must start and end on a word boundary.
+        """
+        key, boundaries = _key_with_boundaries(text)
+        found: List[int] = []
+        covered = 0
+        i = 0
+        while i < len(key):
+            for end in range(min(len(key), i + self._max_length), i + 1, -1):
+                indices = self._keys.get(key[i:end])
+                if indices and (not key[i].isascii() or (i in boundaries and end in boundaries)):
+                    found.extend(j for j in indices if j not in found)
+                    covered += end - i
+                    i = end
+                    break
+            else:
+                i += 1
+        return [self.monographs[j] for j in found], bool(key) and covered == len(key)
@@ -2,7 +2,9 @@
 PDF Processing Module
 """
 import os
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
 from langchain_community.document_loaders import PyPDFLoader  # type: ignore
 from langchain_text_splitters import RecursiveCharacterTextSplitter # type: ignore
 from langchain_core.documents import Document  # type: ignore
@@ -12,10 +14,64 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# 텍스트 추출 백엔드 (모두 페이지당 Document 1개, metadata: source / page / total_pages)
+PDF_BACKENDS = ("pypdf", "pdfplumber", "pypdf2")
+
+
+def _process_pdf_job(
+    pdf_path: str, chunk_size: int, chunk_overlap: int, backend: str
+) -> List[Document]:
+    """Worker entry point for the process pool (module-level so it can be pickled)."""
+    processor = PDFProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap, backend=backend)
+    return processor.process_pdf(pdf_path)
+
+
+def _page_document(pdf_path: str, page: int, total_pages: int, text: str) -> Document:
+    # 백엔드별 추가 메타데이터(producer, page_label ...)는 버리고 같은 키만 남김
+    return Document(
+        page_content=text,
+        metadata={"source": pdf_path, "page": page, "total_pages": total_pages},
+    )
+
+
+def _iter_pages_pypdf(pdf_path: str) -> Iterator[Document]:
+    for page in PyPDFLoader(pdf_path).lazy_load():
+        yield _page_document(pdf_path, page.metadata["page"], page.metadata["total_pages"], page.page_content)
+
+
+def _iter_pages_pdfplumber(pdf_path: str) -> Iterator[Document]:
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        total_pages = len(pdf.pages)
+        for i, page in enumerate(pdf.pages):
+            text = page.extract_text() or ""
+            # 페이지별 파싱 캐시를 비워서 큰 PDF에서도 메모리가 쌓이지 않게 함
+            page.close()
+            yield _page_document(pdf_path, i, total_pages, text)
+
+
+def _iter_pages_pypdf2(pdf_path: str) -> Iterator[Document]:
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(pdf_path)
+    total_pages = len(reader.pages)
+    for i, page in enumerate(reader.pages):
+        yield _page_document(pdf_path, i, total_pages, page.extract_text() or "")
+
+
 class PDFProcessor:
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 100):
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 100,
+        backend: Optional[str] = None,
+    ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.backend = (backend or os.getenv("PDF_BACKEND", "pypdf")).lower()
+        if self.backend not in PDF_BACKENDS:
+            raise ValueError(f"Unsupported PDF backend: {self.backend} (choose from {PDF_BACKENDS})")
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -26,8 +82,7 @@ class PDFProcessor:
         """Load a PDF file and return its pages as LangChain Documents."""
         try:
             logger.info(f"Loading PDF: {pdf_path}")
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
+            documents = list(self.iter_pages(pdf_path))
             logger.info(f"Loaded {len(documents)} pages")
             return documents
         except Exception as e:
@@ -44,13 +99,67 @@ class PDFProcessor:
             logger.error(f"Error splitting documents: {e}")
             raise
 
+    def iter_pages(self, pdf_path: str) -> Iterator[Document]:
+        """Yield the pages of a PDF one at a time using the configured backend."""
+        logger.info(f"Streaming PDF ({self.backend}): {pdf_path}")
+        if self.backend == "pdfplumber":
+            return _iter_pages_pdfplumber(pdf_path)
+        if self.backend == "pypdf2":
+            return _iter_pages_pypdf2(pdf_path)
+        return _iter_pages_pypdf(pdf_path)
+
+    def iter_chunks(self, pdf_path: str) -> Iterator[Document]:
+        """Streaming pipeline: page → split → add metadata, one page in memory at a time."""
+        chunk_id = 0
+        source_file = os.path.basename(pdf_path)
+        for page in self.iter_pages(pdf_path):
+            # 페이지 단위로 분할하므로 결과는 split_documents(전체 페이지)와 동일
+            for chunk in self.text_splitter.split_documents([page]):
+                chunk.metadata["chunk_id"] = chunk_id
+                chunk.metadata["source_file"] = source_file
+                chunk_id += 1
+                yield chunk
+
     def process_pdf(self, pdf_path: str) -> List[Document]:
         """Full pipeline: load → split → add metadata."""
-        documents = self.load_pdf(pdf_path)
-        chunks = self.split_documents(documents)
+        chunks = list(self.iter_chunks(pdf_path))
+        logger.info(f"Split into {len(chunks)} chunks")
+        return chunks
 
-        for i, chunk in enumerate(chunks):
-            chunk.metadata["chunk_id"] = i
-            chunk.metadata["source_file"] = os.path.basename(pdf_path)
+    def iter_process_pdfs(
+        self, pdf_paths: Iterable[str], workers: int = 1
+    ) -> Iterator[Tuple[str, List[Document]]]:
+        """Process several PDFs, yielding (pdf_path, chunks) in input order.
 
-        return chunks
+        With workers > 1 parsing and splitting fan out across processes. At most
+        2 * workers files are in flight, so results stream back in order without
+        piling up in memory while the consumer is busy.
+        """
+        if workers <= 1:
+            for pdf_path in pdf_paths:
+                yield pdf_path, self.process_pdf(pdf_path)
+            return
+
+        paths = iter(pdf_paths)
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            pending = deque()
+
+            def submit_next() -> None:
+                pdf_path = next(paths, None)
+                if pdf_path is not None:
+                    future = executor.submit(
+                        _process_pdf_job, pdf_path, self.chunk_size, self.chunk_overlap, self.backend
+                    )
+                    pending.append((pdf_path, future))
+
+            for _ in range(workers * 2):
+                submit_next()
+
+            while pending:
+                pdf_path, future = pending.popleft()
+                chunks = future.result()
+                submit_next()
+                yield pdf_path, chunks
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
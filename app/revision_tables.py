@@ -0,0 +1,228 @@
+"""
+Revision Tables - structured index of 변경대비표 (현행 / 개정안) table rows
+"""
+import os
+import re
+import json
+import logging
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REVISION_TABLE_FILE = "revision_tables.json"
+
+_BEFORE_HEADERS = ("현행", "개정전", "종전")
+_AFTER_HEADERS = ("개정안", "개정후")
+_NOTE_HEADERS = ("비고", "개정사유", "사유")
+
+# 각조/일반시험법에서 자주 쓰이는 항목명 (공백 제거 기준)
+SECTION_NAMES = (
+    "통칙", "일반시험법", "성상", "확인시험", "순도시험", "유연물질", "잔류용매", "중금속", "비소",
+    "건조감량", "수분", "강열잔분", "회분", "정량법", "함량", "용출시험", "붕해시험",
+    "제제균일성시험", "질량편차시험", "무균시험", "엔도톡신시험", "발열성물질시험",
+    "불용성이물시험", "불용성미립자시험", "미생물한도시험", "저장법", "기원", "제법",
+    "비선광도", "융점", "시스템적합성", "조작조건", "표준품", "시약·시액",
+)
+
+_HANGUL = re.compile(r"[가-힣]")
+_ENGLISH_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9 ,.\-()'/]*[A-Za-z]{3}")
+_NUMBERING = re.compile(r"^\(?\d+\)?[.)]?\s*")
+_NUMBERED_TITLE = re.compile(r"^\d+\.\s*(\S.*[가-힣].*)$")
+_PART_HEADING = re.compile(r"^\s*\[별표\s*\d+\]\s*(.+)$", re.MULTILINE)
+_NEW_MARK = ("<신설>", "(신설)", "<삭제>", "(삭제)")
+
+
+def normalize_key(text: str) -> str:
+    return re.sub(r"\s+", "", text or "").lower()
+
+
+def _header_columns(header: List[Optional[str]]) -> Optional[Dict[str, int]]:
+    cols: Dict[str, int] = {}
+    for i, cell in enumerate(header):
+        key = normalize_key(cell)
+        if any(h in key for h in _AFTER_HEADERS):
+            cols.setdefault("after", i)
+        elif any(h in key for h in _BEFORE_HEADERS):
+            cols.setdefault("before", i)
+        elif any(h in key for h in _NOTE_HEADERS):
+            cols.setdefault("note", i)
+    return cols if "before" in cols and "after" in cols else None
+
+
+def _cell(row: List[Optional[str]], index: Optional[int]) -> str:
+    if index is None or index >= len(row):
+        return ""
+    return (row[index] or "").strip()
+
+
+def _item_header(cell: str, other: str = "") -> Optional[Tuple[str, str]]:
+    """Item named at the top of a cell.
+
+    Monographs start with a Korean + English name line ('니모디핀', 'Nimodipine');
+    newly added general information / test method entries start with a
+    numbered title ('16. 알킬설폰산에스테르류 분석법') next to a <신 설> cell.
+    """
+    lines = [line.strip() for line in cell.split("\n") if line.strip()]
+    if not lines:
+        return None
+    name_ko = lines[0]
+    if len(lines) >= 2 and (
+        _HANGUL.search(name_ko)
+        and len(name_ko) <= 40
+        and not name_ko.startswith(("(", "[", "<"))
+        and not name_ko[0].isdigit()
+        and ":" not in name_ko
+        and "=" not in name_ko
+        and _ENGLISH_NAME.match(lines[1])
+    ):
+        return name_ko, lines[1]
+    numbered = _NUMBERED_TITLE.match(name_ko)
+    if numbered and (not other or normalize_key(other) in _NEW_MARK):
+        return numbered.group(1).strip(), ""
+    return None
+
+
+def _sections(*texts: str) -> List[str]:
+    found: List[str] = []
+    for text in texts:
+        for line in text.split("\n"):
+            key = normalize_key(_NUMBERING.sub("", line.strip()))
+            for name in SECTION_NAMES:
+                if key.startswith(name) and name not in found:
+                    found.append(name)
+    return found
+
+
+def is_revision_table_pdf(pdf_path: str, pattern: Optional[str] = None) -> bool:
+    """Whether to extract revision tables from pdf_path (file name contains pattern; "" = all)."""
+    if pattern is None:
+        pattern = os.getenv("REVISION_TABLE_PATTERN", "변경대비표")
+    # macOS 파일명은 NFD 로 들어올 수 있음
+    name = unicodedata.normalize("NFC", os.path.basename(pdf_path))
+    return unicodedata.normalize("NFC", pattern) in name
+
+
+def revision_row_text(row: Dict) -> str:
+    """Context text of one row for the LLM summary."""
+    title = " / ".join(filter(None, [row["item"], row["item_en"], ", ".join(row["sections"])]))
+    parts = [f"[{title or row['part']}] ({row['source_file']} p.{row['page'] + 1})",
+             f"현행:\n{row['before'] or '(없음)'}", f"개정안:\n{row['after'] or '(없음)'}"]
+    if row["note"]:
+        parts.append(f"비고:\n{row['note']}")
+    return "\n".join(parts)
+
+
+def extract_revision_rows(pdf_path: str) -> List[Dict]:
+    """Extract (현행, 개정안) rows from every revision comparison table in a PDF."""
+    import pdfplumber
+
+    source_file = os.path.basename(pdf_path)
+    rows: List[Dict] = []
+    part = ""
+    item: Tuple[str, str] = ("", "")
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_no, page in enumerate(pdf.pages):
+            # [별표 N] 제목 이 바뀌면 (통칙 → 각조 → 일반정보 ...) 이전 품목을 이어받지 않음
+            heading = _PART_HEADING.search(page.extract_text() or "")
+            if heading and heading.group(1).strip() != part:
+                part = heading.group(1).strip()
+                item = ("", "")
+            for table in page.extract_tables():
+                cols = _header_columns(table[0]) if table else None
+                if cols is None:
+                    continue
+                for raw in table[1:]:
+                    before = _cell(raw, cols["before"])
+                    after = _cell(raw, cols["after"])
+                    if not before and not after:
+                        continue
+                    # 품목명이 없는 행은 앞 행(이전 페이지 포함)의 품목이 이어지는 것
+                    item = _item_header(before, after) or _item_header(after, before) or item
+                    rows.append({
+                        "part": part,
+                        "item": item[0],
+                        "item_en": item[1],
+                        "sections": _sections(before, after),
+                        "before": before,
+                        "after": after,
+                        "note": _cell(raw, cols.get("note")),
+                        "source_file": source_file,
+                        "source": pdf_path,
+                        "page": page_no,
+                    })
+            page.close()
+    logger.info(f"Extracted {len(rows)} revision table rows from {source_file}")
+    return rows
+
+
+class RevisionTableIndex:
+    """On-disk index of revision table rows, looked up by item or section name."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows: List[Dict] = []
+        self._keys: Dict[str, List[int]] = {}
+        self._texts: List[str] = []
+
+    @classmethod
+    def load(cls, path: str) -> "RevisionTableIndex":
+        index = cls(path)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                index.rows = json.load(f).get("rows", [])
+            index._reindex()
+            logger.info(f"Revision table index loaded: {len(index.rows)} rows")
+        return index
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"rows": self.rows}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Revision table index saved to {self.path} ({len(self.rows)} rows)")
+
+    def _reindex(self) -> None:
+        self._keys = {}
+        self._texts = []
+        for i, row in enumerate(self.rows):
+            for key in {row["part"], row["item"], row["item_en"], *row["sections"]}:
+                if key:
+                    self._keys.setdefault(normalize_key(key), []).append(i)
+            self._texts.append(normalize_key(f"{row['before']}\n{row['after']}\n{row['note']}"))
+
+    def remove_source(self, source_file: str) -> None:
+        self.rows = [row for row in self.rows if row["source_file"] != source_file]
+        self._reindex()
+
+    def replace_source(self, source_file: str, rows: List[Dict]) -> None:
+        self.rows = [row for row in self.rows if row["source_file"] != source_file] + rows
+        self._reindex()
+
+    def extend(self, rows: List[Dict]) -> None:
+        """Append rows from another index (e.g. another shard's)."""
+        self.rows = self.rows + rows
+        self._reindex()
+
+    def lookup(self, query: str, limit: int = 30) -> List[Dict]:
+        """Rows for an item / section name: exact key > partial name > text match."""
+        q = normalize_key(query)
+        if not q:
+            return []
+
+        scores: Dict[int, float] = {}
+        for i in self._keys.get(q, ()):
+            scores[i] = 3.0
+        if len(q) >= 2:
+            for key, indices in self._keys.items():
+                if key != q and (q in key or (len(key) >= 2 and key in q)):
+                    for i in indices:
+                        scores[i] = max(scores.get(i, 0.0), 2.0)
+            for i, text in enumerate(self._texts):
+                if i not in scores and q in text:
+                    scores[i] = 1.0
+
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))
+        return [self.rows[i] for i in ranked[:limit]]
@@ -0,0 +1,307 @@
+"""
+Shard Router - one FAISS index per collection under shards/, searched in parallel and merged by score
+"""
+import os
+import heapq
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import embed_queries
+from embeddings import create_embeddings
+from faiss_index import FAISS_INDEX_FILE
+from index_snapshots import copy_index
+from lexical_index import reciprocal_rank_fusion
+from monograph_index import MONOGRAPH_INDEX_FILE, MonographIndex
+from revision_tables import REVISION_TABLE_FILE, RevisionTableIndex
+from vector_store import VectorStoreManager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHARD_DIR = "shards"
+
+
+def shard_index_name(name: str) -> str:
+    """Index name (relative to the store path) of a shard, e.g. "shards/kp12"."""
+    if not name or name.startswith(".") or os.sep in name or "/" in name:
+        raise ValueError(f"Invalid shard name: {name!r}")
+    return f"{SHARD_DIR}/{name}"
+
+
+def stage_shard(store_path: str, name: str) -> str:
+    """Copy a shard (if it exists) to a staging folder and return the staging index name.
+
+    Building there leaves the published shard untouched for readers until
+    publish_shard() swaps the finished copy in.
+    """
+    final = os.path.join(store_path, shard_index_name(name))
+    staging_name = f"{SHARD_DIR}/.{name}.staging"
+    staging = os.path.join(store_path, staging_name)
+    shutil.rmtree(staging, ignore_errors=True)
+    if os.path.isdir(final):
+        copy_index(final, staging)
+    else:
+        os.makedirs(staging)
+    return staging_name
+
+
+def publish_shard(store_path: str, name: str) -> None:
+    """Replace a shard with its staged copy (two renames; the old files are removed afterwards)."""
+    root = os.path.join(store_path, SHARD_DIR)
+    final = os.path.join(root, name)
+    staging = os.path.join(root, f".{name}.staging")
+    old = os.path.join(root, f".{name}.old")
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.isdir(final):
+        os.rename(final, old)
+    os.rename(staging, final)
+    # 이전 파일을 mmap / 열어 둔 프로세스는 다시 로드할 때까지 그대로 사용 가능
+    shutil.rmtree(old, ignore_errors=True)
+    logger.info(f"Shard {name} published to {final}")
+
+
+def merge_lexical_hits(per_shard: Sequence[Tuple[str, List[Tuple[str, float]]]], n: int) -> List[Tuple[str, str]]:
+    """Top-n (shard, vector id) from each shard's (vector id, BM25 score) hits.
+
+    BM25 scores depend on each shard's own document frequencies and lengths,
+    so they are not compared across shards; the per-shard rankings are fused
+    by reciprocal rank instead.
+    """
+    return reciprocal_rank_fusion([[(name, vid) for vid, _ in hits] for name, hits in per_shard])[:n]
+
+
+class ShardRouter:
+    """Loads each collection's index as an independent VectorStoreManager and
+    fans a query out to the selected shards in a thread pool.
+
+    The query is embedded once and every shard returns its own top-k
+    (vector id, distance); the router keeps the global top-k by distance
+    (hybrid mode also fuses the shards' BM25 rankings, then the two rankings).
+    Shards are built in a staging copy and swapped in, so rebuilding one
+    collection never blocks or changes searches on the others. Each shard's
+    revision tables and monographs are loaded with it and merged in
+    side_indexes().
+    """
+
+    def __init__(
+        self,
+        store_path: str,
+        embedding_model: str = "text-embedding-3-small",
+        embeddings: Optional[Embeddings] = None,
+        max_workers: Optional[int] = None,
+        monograph_synonyms: Optional[Dict[str, str]] = None,
+    ):
+        self.store_path = store_path
+        self.embedding_model = embedding_model
+        # 모든 샤드가 같은 임베딩 모델 인스턴스를 공유 (로컬 모델을 샤드마다 올리지 않음)
+        self.embeddings = embeddings or create_embeddings(embedding_model)
+        self._lock = threading.Lock()
+        self._shards: Dict[str, VectorStoreManager] = {}
+        # 로드한 폴더의 inode: 다른 프로세스가 샤드를 교체하면 바뀜
+        self._loaded_from: Dict[str, int] = {}
+        # 샤드별 변경대비표 / 각조 품목명 인덱스 (샤드와 함께 로드·교체)
+        self.monograph_synonyms = dict(monograph_synonyms or {})
+        self._side: Dict[str, Tuple[RevisionTableIndex, MonographIndex]] = {}
+        self._merged: Optional[Tuple[RevisionTableIndex, MonographIndex]] = None
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("SHARD_WORKERS", 8)), thread_name_prefix="shard"
+        )
+
+    def shard_dir(self, name: str) -> str:
+        return os.path.join(self.store_path, shard_index_name(name))
+
+    def available(self) -> List[str]:
+        """Shards on disk (published ones only)."""
+        root = os.path.join(self.store_path, SHARD_DIR)
+        if not os.path.isdir(root):
+            return []
+        return sorted(
+            name for name in os.listdir(root)
+            if not name.startswith(".") and os.path.exists(os.path.join(root, name, FAISS_INDEX_FILE))
+        )
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return sorted(self._shards)
+
+    def _new_manager(self) -> VectorStoreManager:
+        return VectorStoreManager(
+            store_type="faiss",
+            store_path=self.store_path,
+            embedding_model=self.embedding_model,
+            embeddings=self.embeddings,
+        )
+
+    def load(self, names: Optional[Sequence[str]] = None) -> List[str]:
+        """Load the given shards (default: every shard on disk); returns the names loaded."""
+        names = list(names) if names is not None else self.available()
+        for name in names:
+            self.load_shard(name)
+        return names
+
+    def load_shard(self, name: str) -> VectorStoreManager:
+        """(Re)load one shard; searches keep using the previous copy until it is swapped in."""
+        path = self.shard_dir(name)
+        inode = os.stat(path).st_ino
+        manager = self._new_manager()
+        manager.load_vectorstore(shard_index_name(name))
+        revision_tables = RevisionTableIndex.load(os.path.join(path, REVISION_TABLE_FILE))
+        monographs = MonographIndex.load(os.path.join(path, MONOGRAPH_INDEX_FILE), synonyms=self.monograph_synonyms)
+        with self._lock:
+            self._shards[name] = manager
+            self._loaded_from[name] = inode
+            self._side[name] = (revision_tables, monographs)
+            self._merged = None
+        logger.info(f"Shard {name} loaded ({manager.count()} vectors)")
+        return manager
+
+    def _publishing(self, name: str) -> bool:
+        """True while a build of the shard is staged or between publish_shard()'s two renames."""
+        root = os.path.join(self.store_path, SHARD_DIR)
+        return any(os.path.exists(os.path.join(root, f".{name}.{suffix}")) for suffix in ("staging", "old"))
+
+    def refresh(self) -> List[str]:
+        """Reload shards that were replaced on disk, load newly published ones and
+        drop deleted ones; returns the (re)loaded names."""
+        reloaded = []
+        loaded = self.loaded()
+        for name in loaded:
+            path = self.shard_dir(name)
+            if not os.path.isdir(path):
+                # 교체 중(두 번의 rename 사이)이면 다음 refresh 때 다시 확인
+                if not self._publishing(name):
+                    self.drop_shard(name)
+                continue
+            if os.stat(path).st_ino != self._loaded_from.get(name):
+                self.load_shard(name)
+                reloaded.append(name)
+        for name in self.available():
+            if name not in loaded:
+                self.load_shard(name)
+                reloaded.append(name)
+        return reloaded
+
+    def build_shard(self, name: str, chunks: List[Document]) -> int:
+        """Upsert chunks (grouped by source file) into a shard, creating it if needed, and publish it."""
+        staging_name = stage_shard(self.store_path, name)
+        manager = self._new_manager()
+        if os.path.exists(os.path.join(self.store_path, staging_name, FAISS_INDEX_FILE)):
+            manager.load_vectorstore(staging_name)
+        count = manager.ingest_documents(chunks)
+        manager.save_vectorstore(staging_name)
+        manager.vectorstore.docstore.close()
+        publish_shard(self.store_path, name)
+        self.load_shard(name)
+        return count
+
+    def drop_shard(self, name: str, delete_files: bool = False) -> None:
+        with self._lock:
+            self._shards.pop(name, None)
+            self._loaded_from.pop(name, None)
+            self._side.pop(name, None)
+            self._merged = None
+        if delete_files:
+            shutil.rmtree(self.shard_dir(name), ignore_errors=True)
+
+    def manager(self, name: str) -> Optional[VectorStoreManager]:
+        with self._lock:
+            return self._shards.get(name)
+
+    def side_indexes(self) -> Tuple[RevisionTableIndex, MonographIndex]:
+        """Revision tables and monographs of all loaded shards, merged in memory.
+
+        Each monograph records its shard under "shard". The merged copies are
+        rebuilt after a shard is loaded, replaced or dropped.
+        """
+        with self._lock:
+            if self._merged is None:
+                revision_tables = RevisionTableIndex("")
+                monographs = MonographIndex("", synonyms=self.monograph_synonyms)
+                for name, (tables, names) in sorted(self._side.items()):
+                    revision_tables.extend(tables.rows)
+                    monographs.extend([dict(m, shard=name) for m in names.monographs])
+                self._merged = (revision_tables, monographs)
+            return self._merged
+
+    def version(self) -> str:
+        """Changes whenever any loaded shard's content changes (answer cache key)."""
+        with self._lock:
+            shards = sorted(self._shards.items())
+        return "|".join(f"{name}:{m.manifest.fingerprint()}-{m.count()}" for name, m in shards)
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        shards: Optional[Sequence[str]] = None,
+        filter: Optional[Dict] = None,
+        query_vector: Optional[List[float]] = None,
+    ) -> List[Document]:
+        query_vectors = None if query_vector is None else [query_vector]
+        return self.search_batch([query], k=k, shards=shards, filter=filter, query_vectors=query_vectors)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        shards: Optional[Sequence[str]] = None,
+        filter: Optional[Dict] = None,
+        query_vectors: Optional[List[List[float]]] = None,
+    ) -> List[List[Document]]:
+        """Top-k chunks per query over the selected shards (default: all loaded ones).
+
+        query_vectors (one per query) skips the embedding request."""
+        if not queries:
+            return []
+        with self._lock:
+            targets = [(name, m) for name, m in sorted(self._shards.items()) if shards is None or name in shards]
+        if not targets:
+            raise ValueError(f"No loaded shard matches {list(shards) if shards is not None else 'any'}")
+
+        first = targets[0][1]
+        if query_vectors is None:
+            query_vectors = embed_queries(first.embeddings, queries)
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        hybrid = first.search_mode == "hybrid"
+        n = k * first.hybrid_candidates if hybrid else k
+
+        def run(target: Tuple[str, VectorStoreManager]):
+            name, manager = target
+            vector_hits = manager.vector_hits(query_vectors, n, filter=filter)
+            lexical_hits = [manager.lexical_hits(query, n, filter=filter) for query in queries] if hybrid else None
+            return name, vector_hits, lexical_hits
+
+        per_shard = list(self._pool.map(run, targets))
+
+        key_lists = []
+        for i in range(len(queries)):
+            nearest = heapq.nsmallest(
+                n, ((d, name, vid) for name, hits, _ in per_shard for vid, d in hits[i]), key=lambda h: h[0]
+            )
+            keys = [(name, vid) for _, name, vid in nearest]
+            if hybrid:
+                lexical = merge_lexical_hits([(name, lexical[i]) for name, _, lexical in per_shard], n)
+                keys = reciprocal_rank_fusion([keys, lexical])
+            key_lists.append(keys[:k])
+
+        # 샤드별로 한 번에 청크 조회
+        managers = dict(targets)
+        by_shard: Dict[str, List[str]] = {}
+        for keys in key_lists:
+            for name, vid in keys:
+                by_shard.setdefault(name, []).append(vid)
+        docs = {}
+        for name, ids in by_shard.items():
+            ids = list(dict.fromkeys(ids))
+            docs.update(((name, vid), doc) for vid, doc in zip(ids, managers[name].get_documents(ids)))
+        return [[docs[key] for key in keys if docs[key] is not None] for keys in key_lists]
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
@@ -211,6 +211,13 @@ if st.sidebar.button("🔄 저장된 벡터 인덱스 로드", use_container_wid
     except Exception as e:
         st.sidebar.error(f"인덱스 로드 실패: {e}")
 
+query_cache_stats = rag.vector_store.query_cache_stats()
+if query_cache_stats and query_cache_stats["hits"] + query_cache_stats["misses"]:
+    st.sidebar.caption(
+        f"질의 임베딩 캐시: hit {query_cache_stats['hits']} / miss {query_cache_stats['misses']} "
+        f"(적중률 {query_cache_stats['hit_rate']:.0%})"
+    )
+
 # 0-2. PDF 업로드
 with st.sidebar.expander("📂 PDF 업로드", expanded=False):
     uploaded_files = st.file_uploader(
@@ -228,25 +235,39 @@ with st.sidebar.expander("📂 PDF 업로드", expanded=False):
                 upload_dir = os.path.join("data", "uploaded_pdfs")
                 os.makedirs(upload_dir, exist_ok=True)
 
-                all_chunks = []
+                # 디스크 인덱스가 있으면 먼저 로드해서 그 위에 반영 (새 인덱스로 덮어쓰지 않도록)
+                if rag.vector_store.vectorstore is None:
+                    try:
+                        rag.load_existing_index()
+                    except Exception:
+                        pass
+
+                total_chunks = 0
                 for file in uploaded_files:
                     save_path = os.path.join(upload_dir, file.name)
                     with open(save_path, "wb") as f:
                         f.write(file.getbuffer())
 
-                    docs = rag.pdf_processor.process_pdf(save_path)
-                    all_chunks.extend(docs)
+                    # 파일 단위 upsert: 같은 이름의 이전 버전 벡터만 교체
+                    try:
+                        total_chunks += rag.upsert_pdf(save_path)
+                    except ValueError as e:
+                        st.warning(f"{file.name}: {e}")
 
-                if not all_chunks:
+                if not total_chunks:
                     st.error("업로드한 PDF에서 추출된 내용이 없습니다.")
                 else:
-                    if rag.vector_store.vectorstore is None:
-                        rag.vector_store.create_vectorstore(all_chunks)
-                    else:
-                        rag.vector_store.ingest_documents(all_chunks)
+                    rag.save_index()
 
                     st.session_state["index_loaded"] = True
                     st.success(f"✅ PDF {len(uploaded_files)}개를 인덱스에 반영했습니다.")
+
+                    cache_stats = rag.vector_store.cache_stats()
+                    if cache_stats:
+                        st.caption(
+                            f"임베딩 캐시: hit {cache_stats['hits']} / miss {cache_stats['misses']} "
+                            f"(적중률 {cache_stats['hit_rate']:.0%}, 절약 약 {cache_stats['est_saved_seconds']}초)"
+                        )
             except Exception as e:
                 st.error(f"PDF 업로드/임베딩 중 오류: {e}")
 
@@ -272,9 +293,6 @@ if (not st.session_state["index_loaded"]) and (rag.vector_store.vectorstore is N
     )
     st.stop()
 
-# 여기까지 왔으면 벡터스토어는 로드된 상태
-db = rag.vector_store.vectorstore
-
 # -----------------------------
 # 상단: 전체 정보 요약 (약전 검색 메뉴에서만 표시)
 # -----------------------------
@@ -283,13 +301,15 @@ if menu_option == "약전 검색":
 
     with col1:
         try:
-            total_chunks = len(db.index_to_docstore_id)
+            total_chunks = rag.vector_store.count()
             st.metric("총 벡터(청크) 수", total_chunks)
         except Exception:
             st.write("총 벡터 수를 가져올 수 없습니다 (FAISS 구조 변경?).")
 
     with col2:
         st.write("인덱스 저장 경로:", rag.vector_store.store_path)
+        # 새 스냅샷이 게시되면 백그라운드에서 교체됨 (INDEX_WATCH_SECONDS)
+        st.caption(f"인덱스 버전: {rag.index_name}")
 
     st.markdown("---")
 
@@ -310,6 +330,22 @@ if menu_option == "약전 검색":
         key="question_input",
     )
 
+    # 특정 PDF 안에서만 검색 (선택하지 않으면 전체)
+    selected_pdfs = st.multiselect(
+        "검색할 PDF (선택하지 않으면 전체)",
+        sorted(rag.vector_store.manifest.files),
+        key="question_pdfs",
+    )
+    search_filter = {"source_file": selected_pdfs} if selected_pdfs else None
+    # 샤드 구성(VECTOR_SHARDS)이면 컬렉션 선택
+    selected_shards = None
+    if rag.shard_router is not None:
+        selected_shards = st.multiselect(
+            "검색할 컬렉션 (선택하지 않으면 전체)",
+            rag.shard_router.loaded(),
+            key="question_shards",
+        ) or None
+
     if st.button("질문 실행", type="secondary", key="run_search"):
         if not question.strip():
             st.warning("질문을 입력해주세요.")
@@ -317,7 +353,7 @@ if menu_option == "약전 검색":
             with st.spinner("생각 중..."):
                 try:
                     # 1) 원본 RAG 답변
-                    result = rag.query(question)
+                    result = rag.query(question, filter=search_filter, shards=selected_shards)
 
                     if isinstance(result, dict):
                         answer = result.get("answer") or result.get("result") or str(result)
@@ -392,6 +428,10 @@ if menu_option == "약전 검색":
                             "</div>",
                             unsafe_allow_html=True,
                         )
+                        if isinstance(result, dict) and result.get("cache") == "semantic":
+                            st.caption(f"💾 저장된 답변 (비슷한 이전 질문: {result['cached_question']})")
+                        elif isinstance(result, dict) and result.get("cache"):
+                            st.caption("💾 저장된 답변")
 
                         st.markdown(
                             "<div class='answer-section'>"
@@ -467,7 +507,7 @@ if menu_option == "약전 검색":
 
             if st.button("🔍 검색 실행", type="secondary", key="preview_search"):
                 try:
-                    docs = rag.vector_store.search(query, k=k)
+                    docs = rag.vector_store.search(query, k=k, filter=search_filter)
 
                     if not docs:
                         st.warning("검색 결과가 없습니다.")
@@ -486,8 +526,8 @@ if menu_option == "약전 검색":
 
             if st.button("📄 청크 목록 보기", type="secondary", key="preview_first_n"):
                 try:
-                    store = db.docstore._dict
-                    items = list(store.items())[:n]
+                    # 도큐스토어 전체를 복사하지 않고 앞의 n개만 읽음 (mmap 로드 시에도 동작)
+                    items = rag.vector_store.peek(n)
 
                     if not items:
                         st.warning("docstore 안에 데이터가 없습니다.")
@@ -642,24 +682,32 @@ elif menu_option == "요약 및 비교":
             else:
                 with st.spinner("변경대비표에서 검색 중..."):
                     try:
-                        # 변경대비표 PDF에서 검색
-                        prompt = (
-                            f"대한민국약전 일부개정고시 변경대비표에서 '{item_name}'에 대한 변경사항을 찾아서 다음을 설명해줘:\n\n"
-                            "1. 개정 전 내용\n"
-                            "2. 개정 후 내용\n"
-                            "3. 주요 변경사항 요약\n"
-                            "4. 변경 사유 (있는 경우)\n\n"
-                            "변경대비표 형식으로 정리해서 보여줘."
-                        )
+                        # 1) 변경대비표 표 인덱스에서 현행/개정안 행을 바로 조회 (LLM은 요약만)
+                        revision = rag.compare_revision(item_name)
+                        revision_rows = revision["rows"]
 
-                        result = rag.query(prompt)
-
-                        if isinstance(result, dict):
-                            answer = result.get("answer") or result.get("result") or str(result)
-                            source_docs = result.get("source_documents") or result.get("sources")
+                        if revision_rows:
+                            answer = revision["answer"]
+                            source_docs = revision["source_documents"]
                         else:
-                            answer = str(result)
-                            source_docs = None
+                            # 2) 표 인덱스에 없으면 기존처럼 변경대비표 PDF 청크에서 검색
+                            prompt = (
+                                f"대한민국약전 일부개정고시 변경대비표에서 '{item_name}'에 대한 변경사항을 찾아서 다음을 설명해줘:\n\n"
+                                "1. 개정 전 내용\n"
+                                "2. 개정 후 내용\n"
+                                "3. 주요 변경사항 요약\n"
+                                "4. 변경 사유 (있는 경우)\n\n"
+                                "변경대비표 형식으로 정리해서 보여줘."
+                            )
+
+                            result = rag.query(prompt)
+
+                            if isinstance(result, dict):
+                                answer = result.get("answer") or result.get("result") or str(result)
+                                source_docs = result.get("source_documents") or result.get("sources")
+                            else:
+                                answer = str(result)
+                                source_docs = None
 
                         st.markdown("### 📊 개정 변경사항")
 
@@ -675,6 +723,24 @@ elif menu_option == "요약 및 비교":
                                 unsafe_allow_html=True,
                             )
 
+                            if revision_rows:
+                                import pandas as pd
+                                st.markdown("#### 📋 변경대비표 행")
+                                st.dataframe(
+                                    pd.DataFrame([
+                                        {
+                                            "품목": row["item"] or row["part"],
+                                            "항목": ", ".join(row["sections"]),
+                                            "현행": row["before"],
+                                            "개정안": row["after"],
+                                            "페이지": row["page"] + 1,
+                                        }
+                                        for row in revision_rows
+                                    ]),
+                                    use_container_width=True,
+                                    hide_index=True,
+                                )
+
                         with col_source:
                             st.markdown("### 📄 출처")
                             if source_docs:
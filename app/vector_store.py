@@ -2,12 +2,58 @@
 Vector Store Management - OpenAI Version
 """
 import os
-from typing import List
+import uuid
+import hashlib
+import itertools
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
 import logging
 
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS, Chroma
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from index_manifest import IndexManifest, MANIFEST_FILE, chunk_vector_ids, file_sha256, make_vector_ids
+from embedding_cache import CachedEmbeddings, EmbeddingCache, QueryEmbeddingLRU, embed_queries
+from embedding_batcher import EmbeddingBatcher
+from embeddings import create_embeddings, runs_locally
+from lexical_index import SEARCH_MODES, LexicalIndex, reciprocal_rank_fusion
+from chunk_store import (
+    CHUNK_STORE_FILE,
+    ChunkStore,
+    fetch_documents,
+    ids_at,
+    iter_positions,
+    ordered_ids,
+    ordered_metadata,
+)
+from metadata_filter import (
+    MetadataFilterIndex,
+    Selection,
+    CHROMA_SOURCE_PREFIX,
+    chroma_metadata,
+    chroma_where,
+    from_chroma_metadata,
+    normalize_filter,
+)
+from faiss_index import (
+    VECTOR_LOAD_MODES,
+    FaissIndexConfig,
+    RerankVectors,
+    build_faiss_index,
+    is_exact_flat,
+    is_hnsw,
+    needs_conversion,
+    read_faiss_index,
+    reconstruct_all,
+    remove_positions,
+    search_selected,
+    set_blas_threshold,
+    set_search_params,
+    write_faiss_index,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,98 +65,735 @@ class VectorStoreManager:
         store_type: str = "faiss",
         store_path: str = "./data/vectors",
         embedding_model: str = "text-embedding-3-small",
+        embeddings: Optional[Embeddings] = None,
+        collection_name: Optional[str] = None,
     ):
         self.store_type = store_type
         self.store_path = store_path
+        self.embedding_model = embedding_model
+
+        # ▶ 임베딩 모델: OpenAI(OPENAI_API_KEY 필요) 또는 local:/onnx:/hash 접두사의 로컬 CPU 모델
+        self.embeddings = embeddings or create_embeddings(embedding_model)
+        # 캐시 래퍼 없는 원래 모델 (샤드 라우터 등이 같은 인스턴스를 공유)
+        self.base_embeddings = self.embeddings
+        local = runs_locally(self.embeddings)
+
+        # ▶ 디스크 임베딩 캐시: 같은 텍스트는 다시 API로 보내지 않음
+        if os.getenv("EMBEDDING_CACHE", "true").lower() == "true":
+            cache = EmbeddingCache(
+                os.getenv("EMBEDDING_CACHE_PATH", os.path.join(store_path, "embedding_cache.sqlite")),
+                max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500_000)),
+            )
+            self.embeddings = CachedEmbeddings(self.embeddings, cache, embedding_model)
+
+        # ▶ 질의 임베딩 LRU: 같은 질문/미리보기 검색은 API(또는 디스크) 왕복 없이 바로
+        query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+        if query_cache_size > 0:
+            self.embeddings = QueryEmbeddingLRU(self.embeddings, embedding_model, max_entries=query_cache_size)
+            # 재시작 후에도: 디스크 임베딩 캐시에 저장된 최근 질의로 채움 (EMBEDDING_CACHE=true 일 때)
+            if os.getenv("QUERY_CACHE_PERSIST", "true").lower() == "true":
+                warmed = self.embeddings.warm()
+                if warmed:
+                    logger.info(f"Query embedding cache warmed with {warmed} recent queries")
+
+        # ▶ 토큰 수 기준 배치 + 동시 요청 (OpenAI 요청당 토큰 제한 300k 이내)
+        self.batcher = EmbeddingBatcher(
+            self.embeddings,
+            max_tokens_per_batch=int(os.getenv("EMBEDDING_BATCH_TOKENS", 100_000)),
+            max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 1000)),
+            # 로컬 모델은 배치 안에서 CPU 스레드를 모두 쓰므로 동시 요청은 1개
+            concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", 1 if local else 4)),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", 3)),
+        )
+
+        # ▶ FAISS 인덱스 종류 (flat / ivf_flat / ivf_pq / hnsw), 로드 시에는 저장된 설정 사용
+        self.index_config = FaissIndexConfig.from_env()
+        # 압축(fp16/sq8/pq) 인덱스의 재정렬용 float32 원본 (디스크 .npy, mmap)
+        self.rerank_vectors: Optional[RerankVectors] = None
+        if store_type == "faiss":
+            # search_batch: FAISS 기본값(20)보다 작은 배치도 데이터를 한 번만 훑도록 행렬곱 사용
+            set_blas_threshold(int(os.getenv("FAISS_BLAS_THRESHOLD", 2)))
 
-        # ▶ OpenAI Embeddings (OPENAI_API_KEY는 .env/환경변수에 설정)
-        self.embeddings = OpenAIEmbeddings(model=embedding_model)
+        # ▶ 로드 방식: memory(벡터 전체 읽기) / mmap(벡터를 디스크에 둔 채 필요한 부분만 읽음)
+        #   청크 텍스트는 두 방식 모두 chunks.sqlite 에서 검색 결과 행만 읽음
+        self.load_mode = os.getenv("VECTOR_LOAD_MODE", "memory").lower()
+        if self.load_mode not in VECTOR_LOAD_MODES:
+            raise ValueError(f"Unsupported VECTOR_LOAD_MODE: {self.load_mode} (choose from {VECTOR_LOAD_MODES})")
+        self._mmap_name: Optional[str] = None
+
+        # ▶ 검색 방식: vector / hybrid(BM25 + 벡터, 순위 융합). 약품명·CAS 번호 같은 정확한 용어에 유리
+        self.search_mode = os.getenv("SEARCH_MODE", "vector").lower()
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported SEARCH_MODE: {self.search_mode} (choose from {SEARCH_MODES})")
+        # hybrid 에서 양쪽에서 각각 가져올 후보 수 = k * HYBRID_CANDIDATES
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", 4))
+        # 청크 id 기준 BM25 역색인 (FAISS 와 함께 저장/로드)
+        self.lexical_index: Optional[LexicalIndex] = None
+
+        # ▶ 메타데이터 필터: source_file / page + FILTER_FIELDS 의 태그 필드 (예: edition)
+        self.filter_fields = [f.strip() for f in os.getenv("FILTER_FIELDS", "").split(",") if f.strip()]
+        # 선택된 청크가 이 수 이하이면 (IVF 제외) 인덱스를 훑지 않고 해당 벡터만 직접 비교
+        self.filter_scan_limit = int(os.getenv("FILTER_SCAN_LIMIT", 2048))
+        # FAISS 위치별 필드 색인, 첫 필터 검색 때 청크 스토어에서 만듦
+        self.filter_index: Optional[MetadataFilterIndex] = None
+
+        # ▶ Chroma: 컬렉션 이름 (한 폴더에 여러 컬렉션), upsert 한 번에 쓰는 청크 수
+        self.collection_name = collection_name or os.getenv("CHROMA_COLLECTION", "langchain")
+        self.chroma_upsert_batch = int(os.getenv("CHROMA_UPSERT_BATCH", 5000))
+        # 아직 쓰지 않은 (id, 벡터, 메타데이터, 텍스트): 작은 append 를 모아 큰 upsert 로
+        self._chroma_pending: List[Tuple[str, List[float], Dict, str]] = []
 
         self.vectorstore = None
+        # source file → content hash / vector ids (index 폴더의 manifest.json)
+        self.manifest = IndexManifest.load(self.manifest_path())
         os.makedirs(store_path, exist_ok=True)
 
-    def create_vectorstore(self, documents: List[Document]) -> None:
-        logger.info(f"Creating {self.store_type} vector store with OpenAI embeddings...")
+    def index_dir(self, name: str = "index") -> str:
+        return os.path.join(self.store_path, name)
+
+    def manifest_path(self, name: str = "index") -> str:
+        return os.path.join(self.index_dir(name), MANIFEST_FILE)
+
+    def create_vectorstore(
+        self, documents: List[Document], ids: Optional[List[str]] = None
+    ) -> None:
+        logger.info(f"Creating {self.store_type} vector store with {self.embedding_model} embeddings...")
+        # 새 인덱스이므로 이전 manifest의 파일 목록은 무효
+        self.manifest.reset(**self.manifest.params)
 
         if self.store_type == "faiss":
-            # 배치 처리: OpenAI API 토큰 제한(300k)을 피하기 위해 청크를 나눔
-            batch_size = 100  # 한 번에 100개 문서씩 처리
-            total_docs = len(documents)
-
-            logger.info(f"Total documents: {total_docs}")
-            logger.info(f"Processing in batches of {batch_size}")
-
-            # 첫 배치로 벡터스토어 초기화
-            first_batch = documents[:batch_size]
-            self.vectorstore = FAISS.from_documents(first_batch, self.embeddings)
-            logger.info(f"Initialized with first batch: {len(first_batch)} documents")
-
-            # 나머지 배치 추가
-            for i in range(batch_size, total_docs, batch_size):
-                batch = documents[i:i+batch_size]
-                logger.info(f"Processing batch {i//batch_size + 1}: documents {i} to {min(i+batch_size, total_docs)}")
-                batch_vectorstore = FAISS.from_documents(batch, self.embeddings)
-                self.vectorstore.merge_from(batch_vectorstore)
-                logger.info(f"Added {len(batch)} documents to vector store")
+            if not documents:
+                raise ValueError("No documents to index")
+            # 전체 임베딩을 먼저 계산한 뒤 하나의 인덱스/도큐스토어에 한 번에 추가
+            vectors = self.embed_documents(documents)
+            self.vectorstore = self._build_faiss(documents, vectors, ids, train=True)
 
         elif self.store_type == "chroma":
-            # Chroma도 배치 처리 적용
-            batch_size = 100
-            total_docs = len(documents)
+            if not documents:
+                raise ValueError("No documents to index")
+            # FAISS 와 같은 임베딩 단계(토큰 배치 + 동시 요청 + 캐시)로 계산한 뒤 큰 배치로 upsert
+            vectors = self.embed_documents(documents)
+            self.reset_vectorstore()
+            self.append_embeddings(documents, vectors, ids)
+            self.flush()
+        else:
+            raise ValueError(f"Unsupported store_type: {self.store_type}")
 
-            logger.info(f"Total documents: {total_docs}")
-            logger.info(f"Processing in batches of {batch_size}")
+        logger.info(f"Vector store created with {len(documents)} documents")
+        self.log_cache_stats()
 
-            # 첫 배치로 초기화
-            first_batch = documents[:batch_size]
-            self.vectorstore = Chroma.from_documents(
-                first_batch, self.embeddings, persist_directory=self.store_path
-            )
+    def embed_documents(self, documents: List[Document]) -> np.ndarray:
+        """Embed documents into one float32 matrix (token-packed, concurrent batches)."""
+        logger.info(f"Embedding {len(documents)} documents")
+        return self.batcher.embed([d.page_content for d in documents])
+
+    def _build_faiss(
+        self,
+        documents: List[Document],
+        vectors: np.ndarray,
+        ids: Optional[List[str]] = None,
+        train: bool = False,
+    ) -> FAISS:
+        """Create one FAISS store from precomputed vectors and a single docstore.
+
+        With train=False (streaming appends) IVF types start out flat and are
+        trained on the full corpus by finalize_index() when the store is saved.
+        """
+        index = build_faiss_index(self.index_config, vectors, train=train)
 
-            # 나머지 배치 추가
-            for i in range(batch_size, total_docs, batch_size):
-                batch = documents[i:i+batch_size]
-                logger.info(f"Processing batch {i//batch_size + 1}: documents {i} to {min(i+batch_size, total_docs)}")
-                self.vectorstore.add_documents(batch)
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        self.rerank_vectors = RerankVectors() if self.index_config.rerank else None
+        self._keep_rerank_vectors(index, ids, vectors)
+        self.lexical_index = LexicalIndex()
+        self.lexical_index.add(ids, [d.page_content for d in documents])
+        self.filter_index = MetadataFilterIndex(self.filter_fields)
+        self.filter_index.add(d.metadata for d in documents)
+        docstore = InMemoryDocstore(dict(zip(ids, documents)))
+        index_to_docstore_id = dict(enumerate(ids))
+        return FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+
+    def _keep_rerank_vectors(self, index, ids: List[str], vectors: np.ndarray) -> None:
+        # 아직 flat 이면 인덱스 자체가 정확한 벡터를 갖고 있으므로 변환 시점에 한 번에 보관
+        if self.rerank_vectors is not None and not is_exact_flat(index):
+            self.rerank_vectors.add(ids, vectors)
+
+    def append_embeddings(
+        self, documents: List[Document], vectors: np.ndarray, ids: Optional[List[str]] = None
+    ) -> None:
+        """Append already-embedded documents, creating the store on the first call."""
+        if not documents:
+            return
+        texts = [d.page_content for d in documents]
+        metadatas = [d.metadata for d in documents]
+
+        if self.store_type == "faiss":
+            if self.vectorstore is None:
+                self.vectorstore = self._build_faiss(documents, vectors, ids)
+            else:
+                self._ensure_writable()
+                ids = ids or [str(uuid.uuid4()) for _ in documents]
+                self.vectorstore.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+                self._keep_rerank_vectors(self.vectorstore.index, ids, vectors)
+                if self.lexical_index is not None:
+                    self.lexical_index.add(ids, texts)
+                if self.filter_index is not None:
+                    self.filter_index.add(metadatas)
+        elif self.store_type == "chroma":
+            if self.vectorstore is None:
+                self.vectorstore = self._open_chroma()
+            ids = ids or chunk_vector_ids(documents)
+            self._chroma_pending.extend(
+                zip(ids, np.asarray(vectors, dtype=np.float32).tolist(), map(chroma_metadata, metadatas), texts)
+            )
+            if len(self._chroma_pending) >= self.chroma_upsert_batch:
+                self.flush()
         else:
             raise ValueError(f"Unsupported store_type: {self.store_type}")
 
-        logger.info(f"Vector store created with {len(documents)} documents")
+    def reset_vectorstore(self) -> None:
+        """Start from an empty store (full rebuild).
+
+        FAISS just drops the in-memory index; a persistent Chroma collection
+        of the same name is emptied, so chunks of removed PDFs or vectors of
+        a previous embedding model do not survive the rebuild.
+        """
+        self.vectorstore = None
+        self.rerank_vectors = None
+        self.lexical_index = None
+        self.filter_index = None
+        if self.store_type == "chroma":
+            self._chroma_pending = []
+            self.vectorstore = self._open_chroma()
+            if self.vectorstore._collection.count():
+                logger.info(f"Replacing existing Chroma collection {self.collection_name}")
+                self.vectorstore.delete_collection()
+                self.vectorstore = self._open_chroma()
+
+    def _open_chroma(self) -> Chroma:
+        return Chroma(
+            collection_name=self.collection_name,
+            persist_directory=self.store_path,
+            embedding_function=self.embeddings,
+        )
+
+    def flush(self) -> None:
+        """Write buffered Chroma upserts in bulk (FAISS appends need no flush)."""
+        if not self._chroma_pending:
+            return
+        # 같은 id 가 두 번 들어왔으면 마지막 것만 (한 upsert 안의 중복 id 는 Chroma 가 거부)
+        pending = list({item[0]: item for item in self._chroma_pending}.values())
+        self._chroma_pending = []
+        collection = self.vectorstore._collection
+        # 클라이언트의 최대 배치 크기(SQLite 변수 제한)를 넘지 않게 나눔
+        size = min(self.chroma_upsert_batch, getattr(self.vectorstore._client, "max_batch_size", 0) or len(pending))
+        for start in range(0, len(pending), size):
+            batch = pending[start:start + size]
+            # 빈 메타데이터는 Chroma 가 거부하므로 메타데이터 없이 따로 upsert
+            for group in ([item for item in batch if item[2]], [item for item in batch if not item[2]]):
+                if not group:
+                    continue
+                ids, embeddings, metadatas, texts = map(list, zip(*group))
+                collection.upsert(
+                    ids=ids, embeddings=embeddings, metadatas=metadatas if metadatas[0] else None, documents=texts
+                )
+        logger.info(f"Upserted {len(pending)} chunks into Chroma collection {self.collection_name}")
+
+    def add_documents(
+        self, documents: List[Document], ids: Optional[List[str]] = None
+    ) -> None:
+        """Embed documents and add them to the existing vector store."""
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized")
+        if not documents:
+            return
+
+        self.append_embeddings(documents, self.embed_documents(documents), ids=ids)
+        self.flush()
+        self.log_cache_stats()
+
+    def upsert_documents(
+        self, source_file: str, chunks: List[Document], content_hash: Optional[str] = None
+    ) -> List[str]:
+        """Add or replace all chunks of one source file; returns their vector ids.
+
+        Only the new chunks are embedded (and unchanged texts hit the embedding
+        cache). The new vectors are computed before anything is removed, so a
+        failed embedding call leaves the previous version of the file in place.
+        """
+        if not chunks:
+            raise ValueError(f"No chunks to upsert for {source_file}")
+        source_path = chunks[0].metadata.get("source") or ""
+        if os.path.basename(source_path) != source_file or not os.path.exists(source_path):
+            source_path = source_file
+        if content_hash is None:
+            if os.path.exists(source_path):
+                content_hash = file_sha256(source_path)
+            else:
+                content_hash = hashlib.sha256(
+                    "\n".join(d.page_content for d in chunks).encode("utf-8")
+                ).hexdigest()
+
+        ids = make_vector_ids(source_file, content_hash, len(chunks))
+        vectors = self.embed_documents(chunks)
+
+        if self.vectorstore is None:
+            # 새 스토어를 만드는 것이므로 디스크 manifest의 파일 목록은 이 스토어와 무관
+            self.manifest.reset(**self.manifest.params)
+        else:
+            self._delete_source_vectors(source_file)
+        self.append_embeddings(chunks, vectors, ids=ids)
+        self.manifest.record(source_path, content_hash, ids)
+        logger.info(f"Upserted {source_file}: {len(ids)} vectors")
+        self.log_cache_stats()
+        return ids
+
+    def delete_source(self, source_file: str) -> int:
+        """Remove every vector of one source file; returns the number removed."""
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized")
+        removed = self._delete_source_vectors(source_file)
+        logger.info(f"Deleted source {source_file}: {removed} vectors")
+        return removed
+
+    def _delete_source_vectors(self, source_file: str) -> int:
+        stale_ids = self.manifest.remove(source_file)
+        dependents = self.manifest.dependents(stale_ids)
+        if dependents:
+            # 중복 제거로 이 파일의 벡터를 공유하던 파일은 build_index 재실행 시 다시 처리됨
+            logger.warning(f"{source_file} vectors were shared by deduplicated chunks of: {dependents}")
+        self.delete_vectors(stale_ids)
+        return len(stale_ids)
+
+    def ingest_documents(self, chunks: List[Document]) -> int:
+        """Upsert chunks grouped by their source file; returns the number of chunks indexed."""
+        by_source: Dict[str, List[Document]] = defaultdict(list)
+        for chunk in chunks:
+            source_file = chunk.metadata.get("source_file") or os.path.basename(chunk.metadata.get("source", ""))
+            by_source[source_file].append(chunk)
+        for source_file, source_chunks in by_source.items():
+            self.upsert_documents(source_file, source_chunks)
+        return len(chunks)
+
+    def cache_stats(self) -> Optional[dict]:
+        """Embedding cache hit/miss statistics, or None if the cache is disabled."""
+        embeddings = self.embeddings
+        if isinstance(embeddings, QueryEmbeddingLRU):
+            embeddings = embeddings.underlying
+        if isinstance(embeddings, CachedEmbeddings):
+            return embeddings.stats()
+        return None
+
+    def query_cache_stats(self) -> Optional[dict]:
+        """Query embedding LRU hit/miss statistics, or None if QUERY_CACHE_SIZE=0."""
+        if isinstance(self.embeddings, QueryEmbeddingLRU):
+            return self.embeddings.stats()
+        return None
+
+    def log_cache_stats(self) -> None:
+        stats = self.cache_stats()
+        if stats:
+            logger.info(
+                f"Embedding cache: {stats['hits']} hits / {stats['misses']} misses "
+                f"(hit rate {stats['hit_rate']:.1%}, ~{stats['est_saved_seconds']}s API time saved)"
+            )
+
+    def delete_vectors(self, ids: List[str]) -> None:
+        """Remove vectors (and their docstore entries) by id; unknown ids are ignored."""
+        if not ids:
+            return
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized")
+        if self.store_type == "faiss":
+            self._ensure_writable()
+            existing = set(self.vectorstore.index_to_docstore_id.values())
+            ids = [i for i in ids if i in existing]
+            if not ids:
+                return
+            if self.rerank_vectors is not None:
+                self.rerank_vectors.remove(ids)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(ids)
+            store = self.vectorstore
+            removed = set(ids)
+            positions = sorted(pos for pos, vector_id in store.index_to_docstore_id.items() if vector_id in removed)
+            if self.filter_index is not None:
+                # 남은 벡터는 순서를 유지한 채 앞으로 당겨짐 (remove_ids / HNSW 재구성 모두)
+                self.filter_index.remove_positions(positions)
+            if is_hnsw(store.index):
+                # HNSW 그래프는 remove_ids 를 지원하지 않으므로 남은 벡터로 다시 구성
+                self._rebuild_faiss_without(removed)
+                logger.info(f"Deleted {len(ids)} vectors (HNSW index rebuilt)")
+                return
+            # LangChain 의 delete() 는 IVF 의 id 를 다시 매기지 않아 위치와 어긋나므로 직접 처리
+            remove_positions(store.index, positions)
+            store.docstore.delete(ids)
+            store.index_to_docstore_id = dict(enumerate(
+                vector_id for _, vector_id in sorted(store.index_to_docstore_id.items()) if vector_id not in removed
+            ))
+        else:
+            self.flush()
+            self.vectorstore.delete(ids)
+        logger.info(f"Deleted {len(ids)} vectors")
+
+    def _rebuild_faiss_without(self, removed: set) -> None:
+        store = self.vectorstore
+        keep = [pos for pos, vector_id in sorted(store.index_to_docstore_id.items()) if vector_id not in removed]
+        if self.rerank_vectors is not None and len(self.rerank_vectors):
+            # 압축 코드를 다시 양자화하지 않도록 정확한 원본 벡터로 재구성
+            vectors = self.rerank_vectors.get([store.index_to_docstore_id[pos] for pos in keep])
+        else:
+            vectors = reconstruct_all(store.index)[keep]
+        store.index = build_faiss_index(self.index_config, vectors, train=True)
+        store.docstore.delete(list(removed))
+        store.index_to_docstore_id = {
+            new_pos: store.index_to_docstore_id[old_pos] for new_pos, old_pos in enumerate(keep)
+        }
+
+    def finalize_index(self) -> None:
+        """Convert a streamed flat FAISS index to the configured (trained) index type."""
+        if self.store_type != "faiss" or self.vectorstore is None:
+            return
+        index = self.vectorstore.index
+        if needs_conversion(index, self.index_config):
+            vectors = reconstruct_all(index)
+            self.vectorstore.index = build_faiss_index(self.index_config, vectors, train=True)
+            if self.index_config.rerank:
+                ids = ordered_ids(self.vectorstore.index_to_docstore_id)
+                self.rerank_vectors = RerankVectors()
+                self.rerank_vectors.add(ids, vectors)
+            logger.info(f"FAISS index converted to {self.index_config.factory} ({index.ntotal} vectors)")
+        elif self.index_config.min_train_size() > index.ntotal:
+            logger.info(
+                f"Only {index.ntotal} vectors: keeping a flat index until "
+                f"{self.index_config.min_train_size()} are available for {self.index_config.index_type}"
+            )
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        """Tune recall vs. latency of an IVF (nprobe) / HNSW (efSearch) index at query time."""
+        if nprobe is not None:
+            self.index_config.nprobe = nprobe
+        if ef_search is not None:
+            self.index_config.ef_search = ef_search
+        if self.store_type == "faiss" and self.vectorstore is not None:
+            set_search_params(self.vectorstore.index, self.index_config)
+
+    def update_metadata(self, updates: Dict[str, Dict]) -> None:
+        """Merge metadata fields into existing vectors' documents, keyed by vector id."""
+        if not updates or self.vectorstore is None:
+            return
+        if self.store_type == "faiss":
+            docstore = self.vectorstore.docstore
+            ids = list(updates)
+            for vector_id, doc in zip(ids, fetch_documents(docstore, ids)):
+                if doc is None:
+                    continue
+                doc.metadata.update(updates[vector_id])
+                if isinstance(docstore, ChunkStore):
+                    # 조회 결과는 사본이므로 다시 넣어 두면 저장 시 해당 행만 갱신
+                    docstore.add({vector_id: doc})
+            # 필터 필드가 바뀌었을 수 있으므로 다음 필터 검색 때 다시 만듦
+            self.filter_index = None
+        elif self.store_type == "chroma":
+            # Chroma 메타데이터는 스칼라 값만 허용하므로 리스트/딕셔너리는 JSON 문자열로 저장
+            self.flush()
+            ids = list(updates)
+            current = self.vectorstore.get(ids=ids, include=["metadatas"])
+            merged = {vid: dict(meta or {}) for vid, meta in zip(current["ids"], current["metadatas"])}
+            for vector_id, fields in updates.items():
+                if vector_id in merged:
+                    if "sources" in fields:
+                        # 이전 sources 의 파일 플래그는 새 목록으로 대체
+                        merged[vector_id] = {
+                            k: v for k, v in merged[vector_id].items() if not k.startswith(CHROMA_SOURCE_PREFIX)
+                        }
+                    merged[vector_id].update(chroma_metadata(fields))
+            self.vectorstore._collection.update(ids=list(merged), metadatas=list(merged.values()))
+
+    def _ensure_writable(self) -> None:
+        """Swap a read-only memory-mapped FAISS index for a fully loaded one before changing it."""
+        if self._mmap_name is None:
+            return
+        logger.info("Memory-mapped index is read-only: loading it into memory for writes")
+        # 청크 스토어와 manifest 는 그대로 두고 벡터 인덱스만 다시 읽음
+        self.vectorstore.index = read_faiss_index(self.index_dir(self._mmap_name))
+        set_search_params(self.vectorstore.index, self.index_config)
+        self._mmap_name = None
+
+    def count(self) -> int:
+        """Number of vectors in the store."""
+        if self.vectorstore is None:
+            return 0
+        if self.store_type == "faiss":
+            return self.vectorstore.index.ntotal
+        self.flush()
+        return self.vectorstore._collection.count()
+
+    def peek(self, n: int = 5) -> List[Tuple[str, Document]]:
+        """The first n (vector_id, document) pairs, without materializing the docstore."""
+        return list(itertools.islice(self.iter_documents(), n))
+
+    def iter_documents(self) -> Iterator[Tuple[str, Document]]:
+        """Yield (vector_id, document) for every chunk in the store."""
+        if self.vectorstore is None:
+            return
+        if self.store_type == "faiss":
+            # 위치 순서대로 조금씩 읽음 (ChunkStore 는 배치당 쿼리 1번)
+            positions = iter_positions(self.vectorstore.index_to_docstore_id)
+            while True:
+                batch = list(itertools.islice(positions, 512))
+                if not batch:
+                    break
+                yield from zip(batch, fetch_documents(self.vectorstore.docstore, batch))
+        elif self.store_type == "chroma":
+            self.flush()
+            # 컬렉션 전체를 한 번에 읽지 않고 페이지 단위로
+            for offset in itertools.count(0, 1000):
+                data = self.vectorstore.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+                if not data["ids"]:
+                    break
+                for vector_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"]):
+                    yield vector_id, Document(page_content=text, metadata=from_chroma_metadata(metadata))
 
     def save_vectorstore(self, name: str = "index") -> None:
         if self.vectorstore is None:
             raise ValueError("Vector store not initialized")
         if self.store_type == "faiss":
             save_path = os.path.join(self.store_path, name)
-            self.vectorstore.save_local(save_path)
+            self._ensure_writable()
+            self.finalize_index()
+            os.makedirs(save_path, exist_ok=True)
+            write_faiss_index(self.vectorstore.index, save_path)
+            self._save_chunk_store(save_path)
+            self.index_config.save(save_path)
+            if self.rerank_vectors is not None and not is_exact_flat(self.vectorstore.index):
+                self.rerank_vectors.save(save_path, ordered_ids(self.vectorstore.index_to_docstore_id))
+            else:
+                RerankVectors.remove_files(save_path)
+            if self.lexical_index is not None:
+                self.lexical_index.save(save_path)
             logger.info(f"FAISS index saved to {save_path}")
         elif self.store_type == "chroma":
-            # Chroma는 persist_directory로 자동 저장
-            logger.info("Chroma DB persisted")
+            # Chroma는 persist_directory로 자동 저장 (남은 upsert 만 기록)
+            self.flush()
+            logger.info(f"Chroma collection {self.collection_name} persisted ({self.count()} chunks)")
         else:
             raise ValueError(f"Unsupported store_type: {self.store_type}")
 
-    def load_vectorstore(self, name: str = "index") -> None:
+        self.manifest.path = self.manifest_path(name)
+        self.manifest.save()
+
+    def _save_chunk_store(self, save_path: str) -> None:
+        """Write chunk text / metadata to chunks.sqlite (only the changed rows when it is already there)."""
+        store = self.vectorstore
+        chunk_path = os.path.join(save_path, CHUNK_STORE_FILE)
+        docstore = store.docstore
+        if isinstance(docstore, ChunkStore) and os.path.abspath(docstore.path) == os.path.abspath(chunk_path):
+            docstore.save(store.index_to_docstore_id)
+        else:
+            docstore = ChunkStore(chunk_path)
+            docstore.replace_all(store.index_to_docstore_id, store.docstore)
+            # 이후 조회는 디스크에서 하므로 메모리의 도큐스토어는 놓아줌
+            store.docstore = docstore
+        store.index_to_docstore_id = docstore.position_ids()
+
+        legacy_path = os.path.join(save_path, "index.pkl")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+            logger.info(f"Removed {legacy_path} (replaced by {CHUNK_STORE_FILE})")
+
+    def load_vectorstore(self, name: str = "index", mode: Optional[str] = None) -> None:
+        mode = mode or self.load_mode
+        self._mmap_name = None
         if self.store_type == "faiss":
             load_path = os.path.join(self.store_path, name)
-            self.vectorstore = FAISS.load_local(
-                load_path,
-                self.embeddings,
-                allow_dangerous_deserialization=True,
-            )
-            logger.info(f"FAISS index loaded from {load_path}")
+            chunk_path = os.path.join(load_path, CHUNK_STORE_FILE)
+            if os.path.exists(chunk_path):
+                index = read_faiss_index(load_path, mmap=mode == "mmap")
+                docstore = ChunkStore(chunk_path)
+                index_to_docstore_id = docstore.position_ids()
+                if len(index_to_docstore_id) != index.ntotal:
+                    raise ValueError(
+                        f"{chunk_path} has {len(index_to_docstore_id)} chunks but index.faiss has "
+                        f"{index.ntotal} vectors; rebuild the index"
+                    )
+                store = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+                if mode == "mmap":
+                    # 읽기 전용: 쓰기 작업이 들어오면 _ensure_writable() 이 메모리로 다시 로드
+                    self._mmap_name = name
+            else:
+                # 이전 버전이 저장한 index.pkl: 다음 저장 때 chunks.sqlite 로 바뀜
+                logger.warning(
+                    f"{load_path} has no {CHUNK_STORE_FILE}: unpickling index.pkl "
+                    f"(run `python app/migrate_docstore.py` to convert it once)"
+                )
+                store = FAISS.load_local(
+                    load_path,
+                    self.embeddings,
+                    allow_dangerous_deserialization=True,
+                )
+            self.vectorstore = store
+            # 저장된 인덱스 설정 기준 (nprobe / efSearch 는 환경변수로 덮어쓸 수 있음)
+            saved_config = FaissIndexConfig.load(load_path)
+            if saved_config is not None:
+                self.index_config = saved_config.with_search_overrides()
+            set_search_params(self.vectorstore.index, self.index_config)
+            self.rerank_vectors = None
+            if self.index_config.rerank and not is_exact_flat(self.vectorstore.index):
+                self.rerank_vectors = RerankVectors.load(load_path)
+                if self.rerank_vectors is None:
+                    logger.warning("FAISS_RERANK is set but the index has no saved float32 vectors; not re-ranking")
+            self.filter_index = None
+            self.lexical_index = LexicalIndex.load(load_path)
+            if self.lexical_index is None and self.search_mode == "hybrid":
+                self._rebuild_lexical_index()
+            logger.info(f"FAISS index loaded from {load_path} ({'mmap' if self._mmap_name else 'memory'})")
         elif self.store_type == "chroma":
-            self.vectorstore = Chroma(
-                persist_directory=self.store_path,
-                embedding_function=self.embeddings,
-            )
-            logger.info("Chroma DB loaded")
+            self._chroma_pending = []
+            self.vectorstore = self._open_chroma()
+            logger.info(f"Chroma collection {self.collection_name} loaded ({self.count()} chunks)")
         else:
             raise ValueError(f"Unsupported store_type: {self.store_type}")
 
-    def search(self, query: str, k: int = 5) -> List[Document]:
+        self.manifest = IndexManifest.load(self.manifest_path(name))
+
+    def _rebuild_lexical_index(self) -> None:
+        # 렉시컬 인덱스 없이 저장된 (이전 버전) 인덱스: 청크 스토어에서 한 번 만들고 다음 저장 때 기록
+        logger.info("No lexical index saved with this index: building it from the stored chunks")
+        self.lexical_index = LexicalIndex()
+        documents = self.iter_documents()
+        for batch in iter(lambda: list(itertools.islice(documents, 1024)), []):
+            self.lexical_index.add([vid for vid, _ in batch], [doc.page_content for _, doc in batch])
+        self.lexical_index.compact()
+
+    def search(
+        self, query: str, k: int = 5, filter: Optional[Dict] = None, query_vector: Optional[List[float]] = None
+    ) -> List[Document]:
+        """Top-k chunks for the query, optionally only among chunks matching a metadata filter.
+
+        filter maps a field to a value, a list of values ("any of") or, for
+        page, a range: {"source_file": "KP12.pdf", "page": {"gte": 10, "lte": 20}}.
+        query_vector is the query's embedding if the caller already has it.
+        """
         if self.vectorstore is None:
             raise ValueError("Vector store not initialized")
-        results = self.vectorstore.similarity_search(query, k=k)
+        query_vectors = None if query_vector is None else [query_vector]
+        results = self.search_batch([query], k=k, filter=filter, query_vectors=query_vectors)[0]
         logger.info(f"Found {len(results)} similar documents")
         return results
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter: Optional[Dict] = None,
+        query_vectors: Optional[List[List[float]]] = None,
+    ) -> List[List[Document]]:
+        """Search several queries at once: one embedding request, one FAISS matrix search
+        and one chunk store read for all of them. Returns one result list per query.
+
+        query_vectors (one per query) skips the embedding request."""
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized")
+        if not queries:
+            return []
+        filter = normalize_filter(filter)
+        if query_vectors is None:
+            query_vectors = embed_queries(self.embeddings, queries)
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if self.store_type != "faiss":
+            return self._chroma_search(query_vectors, k, filter)
+
+        selection = self.select(filter) if filter else None
+        hybrid = self.search_mode == "hybrid" and self.lexical_index is not None
+        # hybrid: 양쪽에서 k * HYBRID_CANDIDATES 개씩 가져와 순위 융합
+        n = k * self.hybrid_candidates if hybrid else k
+        id_lists = [[vector_id for vector_id, _ in hits] for hits in self._vector_hits(query_vectors, n, selection)]
+        if hybrid:
+            id_lists = [
+                reciprocal_rank_fusion([ids, [vector_id for vector_id, _ in self._lexical_hits(query, n, selection)]])[:k]
+                for query, ids in zip(queries, id_lists)
+            ]
+
+        unique_ids = list(dict.fromkeys(vector_id for ids in id_lists for vector_id in ids))
+        docs = dict(zip(unique_ids, self.get_documents(unique_ids)))
+        return [[docs[vector_id] for vector_id in ids if docs[vector_id] is not None] for ids in id_lists]
+
+    def _chroma_search(self, query_vectors: np.ndarray, k: int, filter: Optional[Dict]) -> List[List[Document]]:
+        # 질의 임베딩은 FAISS 와 같은 경로(LRU / 캐시)로 한 번에 계산해 두고 쿼리 한 번으로 검색
+        self.flush()
+        result = self.vectorstore._collection.query(
+            query_embeddings=query_vectors.tolist(),
+            n_results=k,
+            where=chroma_where(filter) if filter else None,
+            include=["documents", "metadatas"],
+        )
+        return [
+            [Document(page_content=text, metadata=from_chroma_metadata(meta)) for text, meta in zip(texts, metas)]
+            for texts, metas in zip(result["documents"], result["metadatas"])
+        ]
+
+    def vector_hits(
+        self, query_vectors: np.ndarray, k: int = 5, filter: Optional[Dict] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """(vector id, squared L2 distance) of the k nearest chunks per precomputed
+        query vector, nearest first (FAISS only; used to merge results across indexes)."""
+        filter = normalize_filter(filter)
+        selection = self.select(filter) if filter else None
+        return self._vector_hits(np.asarray(query_vectors, dtype=np.float32), k, selection)
+
+    def lexical_hits(self, query: str, k: int = 5, filter: Optional[Dict] = None) -> List[Tuple[str, float]]:
+        """(vector id, BM25 score) of the k best lexical matches, [] without a lexical index."""
+        filter = normalize_filter(filter)
+        return self._lexical_hits(query, k, self.select(filter) if filter else None)
+
+    def _lexical_hits(self, query: str, k: int, selection: Optional[Selection]) -> List[Tuple[str, float]]:
+        if self.lexical_index is None:
+            return []
+        allowed = self._selection_ids(selection) if selection is not None else None
+        return self.lexical_index.search(query, k, allowed=allowed)
+
+    def get_documents(self, ids: List[str]) -> List[Optional[Document]]:
+        """Documents for vector ids in the same order (None for unknown ids)."""
+        return fetch_documents(self.vectorstore.docstore, ids)
+
+    def select(self, filter: Dict) -> Selection:
+        """FAISS positions of the chunks matching a metadata filter (cached per filter)."""
+        if self.filter_index is None:
+            store = self.vectorstore
+            self.filter_index = MetadataFilterIndex(self.filter_fields)
+            self.filter_index.add(ordered_metadata(store.docstore, store.index_to_docstore_id))
+            logger.info(f"Metadata filter index built for {len(self.filter_index)} chunks ({self.filter_index.fields})")
+        return self.filter_index.select(normalize_filter(filter))
+
+    def _selection_ids(self, selection: Selection) -> set:
+        if selection.ids is None:
+            found = ids_at(self.vectorstore.index_to_docstore_id, selection.positions)
+            selection.ids = set(found.values())
+        return selection.ids
+
+    def _vector_hits(
+        self, query_vectors: np.ndarray, k: int, selection: Optional[Selection] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """(id, distance) of the k nearest chunks per query; compressed indexes fetch
+        k * rerank candidates and keep the k closest to the exact float32 vectors.
+        With a selection only those positions are searched."""
+        store = self.vectorstore
+        factor = self.index_config.rerank if self.rerank_vectors is not None else 1
+        if selection is None:
+            distances, positions = store.index.search(query_vectors, k * factor)
+        else:
+            distances, positions = search_selected(
+                store.index, self.index_config, query_vectors, k * factor,
+                selection.positions, selection.bitmap, scan_limit=self.filter_scan_limit,
+            )
+        found = ids_at(store.index_to_docstore_id, positions[positions != -1])
+
+        results = []
+        for query_vector, row, row_distances in zip(query_vectors, positions, distances):
+            hits = [(found[pos], float(d)) for pos, d in zip(row, row_distances) if pos != -1]
+            if factor > 1 and hits:
+                ids = [vector_id for vector_id, _ in hits]
+                exact = ((self.rerank_vectors.get(ids) - query_vector) ** 2).sum(axis=1)
+                hits = [(ids[i], float(exact[i])) for i in np.argsort(exact)[:k]]
+            results.append(hits)
+        return results
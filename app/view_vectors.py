@@ -1,22 +1,279 @@
-# view_vectors.py
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
+"""
+벡터 인덱스 점검 / 내보내기 도구 (오프라인, API 키·임베딩 모델 불필요)
+
+사용 예:
+    python app/view_vectors.py info                       # 인덱스 종류, 차원, 메모리, 파일별 청크 수
+    python app/view_vectors.py export vectors.npy         # 벡터 → .npy + 메타데이터 → vectors.jsonl
+    python app/view_vectors.py export vectors.parquet --text
+    python app/view_vectors.py sample --random 5          # 임의 청크 미리보기
+    python app/view_vectors.py sample --ids <vector id> ...
+
+인덱스 폴더는 --index-dir 로 지정하며 기본값은 VECTOR_STORE_PATH 의 CURRENT 스냅샷
+(없으면 index 폴더)입니다. index.faiss 는 mmap 으로 열고 청크는 chunks.sqlite 에서
+--batch 행씩 읽으므로, 수 GB 인덱스도 배치 하나 분량의 메모리로 처리합니다.
+"""
+import os
+import sys
+import json
+import argparse
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
 from dotenv import load_dotenv
-load_dotenv()  # ✅ .env 파일 자동 로드
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+
+from chunk_store import CHUNK_STORE_FILE, ChunkStore
+from faiss_index import (
+    FAISS_INDEX_FILE,
+    RERANK_VECTORS_FILE,
+    FaissIndexConfig,
+    is_exact_flat,
+    read_faiss_index,
+)
+from index_snapshots import current_index
+
+
+def default_index_dir() -> str:
+    app_dir = os.path.dirname(os.path.abspath(__file__))
+    vector_path = os.getenv("VECTOR_STORE_PATH") or os.path.join(os.path.dirname(app_dir), "data", "vectors")
+    return os.path.join(vector_path, current_index(vector_path))
+
+
+def _size(num_bytes: float) -> str:
+    units = ["B", "KB", "MB", "GB"]
+    while num_bytes >= 1024 and len(units) > 1:
+        num_bytes /= 1024
+        units.pop(0)
+    return f"{num_bytes:.1f} {units[0]}"
+
+
+def open_index(index_dir: str):
+    """(mmap'ed FAISS index, chunk store, saved config) of an index folder."""
+    if not os.path.exists(os.path.join(index_dir, CHUNK_STORE_FILE)):
+        sys.exit(f"{index_dir} has no {CHUNK_STORE_FILE} (run app/migrate_docstore.py for an index.pkl index)")
+    store = ChunkStore(os.path.join(index_dir, CHUNK_STORE_FILE))
+    return read_faiss_index(index_dir, mmap=True), store, FaissIndexConfig.load(index_dir)
+
+
+def _enable_reconstruct(index) -> None:
+    faiss = dependable_faiss_import()
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # IVF 는 위치 → 리스트 오프셋 표가 있어야 복원 가능 (벡터당 8바이트)
+        ivf.make_direct_map()
+
+
+def iter_vectors(index, index_dir: str, batch: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """(start position, float32 block) over the whole index.
+
+    Compressed indexes with saved float32 rerank vectors export those (exact,
+    memory-mapped); otherwise vectors are reconstructed block by block
+    (decoded, i.e. approximate, for sq8 / PQ codes).
+    """
+    rerank_path = os.path.join(index_dir, RERANK_VECTORS_FILE)
+    matrix = None
+    if not is_exact_flat(index) and os.path.exists(rerank_path):
+        matrix = np.load(rerank_path, mmap_mode="r")
+    if matrix is not None and len(matrix) == index.ntotal:
+        # rerank_vectors.npy 는 인덱스 위치 순서로 저장됨
+        for start in range(0, index.ntotal, batch):
+            yield start, np.asarray(matrix[start:start + batch], dtype=np.float32)
+        return
+    _enable_reconstruct(index)
+    for start in range(0, index.ntotal, batch):
+        yield start, index.reconstruct_n(start, min(batch, index.ntotal - start))
+
+
+def cmd_info(args) -> None:
+    faiss = dependable_faiss_import()
+
+    index, store, config = open_index(args.index_dir)
+    inner = faiss.downcast_index(index)
+    print(f"index folder : {args.index_dir}")
+    print(f"index type   : {config.index_type if config else 'flat'} / codec {config.codec if config else 'none'}"
+          f" ({type(inner).__name__}{', ' + config.factory if config and config.factory else ''})")
+    print(f"vectors      : {index.ntotal:,} x {index.d} ({'L2' if index.metric_type == faiss.METRIC_L2 else 'inner product'})")
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        print(f"ivf          : nlist {ivf.nlist}, nprobe {ivf.nprobe}")
+    if hasattr(inner, "hnsw"):
+        print(f"hnsw         : efSearch {inner.hnsw.efSearch}, efConstruction {inner.hnsw.efConstruction}")
+    code_size = getattr(ivf or inner, "code_size", None) or getattr(getattr(inner, "storage", None), "code_size", None)
+    if code_size:
+        print(f"bytes/vector : {code_size} (float32 would be {index.d * 4})")
+
+    print("files        :")
+    total = 0
+    for name in sorted(os.listdir(args.index_dir)):
+        path = os.path.join(args.index_dir, name)
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+            print(f"  {name:<24} {_size(os.path.getsize(path)):>10}")
+    index_bytes = os.path.getsize(os.path.join(args.index_dir, FAISS_INDEX_FILE))
+    print(f"  {'(total)':<24} {_size(total):>10}")
+    print(f"memory       : ~{_size(index_bytes)} resident with VECTOR_LOAD_MODE=memory, "
+          f"pages on demand with mmap (chunk text always read per hit from {CHUNK_STORE_FILE})")
+
+    counts = store.source_counts()
+    chunks = sum(row[1] for row in counts)
+    print(f"chunks       : {chunks:,} in {len(counts)} source files"
+          + ("" if chunks == index.ntotal else f"  ⚠ index has {index.ntotal:,} vectors"))
+    print()
+    print("| source_file | chunks | pages |")
+    print("|-------------|-------:|------:|")
+    for source_file, count, first, last in counts[:args.top]:
+        pages = "" if first is None else f"{first}-{last}"
+        print(f"| {source_file} | {count:,} | {pages} |")
+    if len(counts) > args.top:
+        print(f"| ... {len(counts) - args.top} more | | |")
+
+
+def cmd_export(args) -> None:
+    index, store, _ = open_index(args.index_dir)
+    stem, ext = os.path.splitext(args.output)
+    if ext not in (".npy", ".parquet"):
+        sys.exit("output must end in .npy or .parquet")
+
+    vectors = iter_vectors(index, args.index_dir, args.batch)
+    rows = store.iter_rows(args.batch, with_text=args.text)
+    if ext == ".npy":
+        # 벡터는 .npy 헤더 뒤에 블록 단위로 이어 쓰고, 같은 순서의 메타데이터는 .jsonl 로
+        try:
+            with open(args.output, "wb") as out, open(f"{stem}.jsonl", "w", encoding="utf-8") as meta:
+                np.lib.format.write_array_header_1_0(
+                    out, {"descr": "<f4", "fortran_order": False, "shape": (index.ntotal, index.d)}
+                )
+                for block, batch in _aligned_batches(index, vectors, rows):
+                    out.write(np.ascontiguousarray(block, dtype="<f4").tobytes())
+                    for pos, vector_id, metadata, text in batch:
+                        record = {"position": pos, "id": vector_id, "metadata": metadata}
+                        if args.text:
+                            record["text"] = text
+                        meta.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except SystemExit:
+            # 헤더의 shape 와 맞지 않는 .npy 를 남기지 않음
+            for path in (args.output, f"{stem}.jsonl"):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        print(f"{index.ntotal:,} vectors → {args.output}, metadata → {stem}.jsonl")
+    else:
+        _export_parquet(args, index, vectors, rows)
+        print(f"{index.ntotal:,} vectors + metadata → {args.output}")
+
+
+def _check_aligned(start: int, block: np.ndarray, batch: List[tuple]) -> None:
+    if batch is None or len(block) != len(batch) or batch[0][0] != start:
+        _exit_misaligned(start)
+
+
+def _exit_misaligned(position: int) -> None:
+    sys.exit(f"{CHUNK_STORE_FILE} positions do not match index.faiss at {position}; rebuild the index")
+
+
+def _aligned_batches(index, vectors, rows):
+    """(vector block, chunk rows) pairs; exits unless both sides cover exactly index.ntotal positions."""
+    rows = iter(rows)
+    written = 0
+    for start, block in vectors:
+        batch = next(rows, None)
+        _check_aligned(start, block, batch)
+        written += len(batch)
+        yield block, batch
+    # 한쪽이 먼저 끝나면 zip 처럼 조용히 멈추지 않고 잘린 내보내기를 오류로 처리
+    if next(rows, None) is not None or written != index.ntotal:
+        _exit_misaligned(written)
+
+
+def _export_parquet(args, index, vectors, rows) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Parquet export needs pyarrow (pip install pyarrow); use a .npy output instead")
+
+    fields = [
+        pa.field("position", pa.int64()),
+        pa.field("id", pa.string()),
+        pa.field("source_file", pa.string()),
+        pa.field("page", pa.int64()),
+        pa.field("metadata", pa.string()),
+        pa.field("vector", pa.list_(pa.float32(), index.d)),
+    ]
+    if args.text:
+        fields.append(pa.field("text", pa.string()))
+    schema = pa.schema(fields)
+    # 배치마다 row group 하나씩 기록
+    with pq.ParquetWriter(args.output, schema) as writer:
+        for block, batch in _aligned_batches(index, vectors, rows):
+            columns = {
+                "position": [row[0] for row in batch],
+                "id": [row[1] for row in batch],
+                "source_file": [row[2].get("source_file") for row in batch],
+                "page": [row[2].get("page") if isinstance(row[2].get("page"), int) else None for row in batch],
+                "metadata": [json.dumps(row[2], ensure_ascii=False) for row in batch],
+                "vector": pa.FixedSizeListArray.from_arrays(pa.array(block.ravel(), pa.float32()), index.d),
+            }
+            if args.text:
+                columns["text"] = [row[3] for row in batch]
+            writer.write_table(pa.table(columns, schema=schema))
+
+
+def cmd_sample(args) -> None:
+    index, store, _ = open_index(args.index_dir)
+    if args.ids:
+        found = store.positions_of(args.ids)
+        for missing in [i for i in args.ids if i not in found]:
+            print(f"unknown id: {missing}")
+        picked = [(found[i], i) for i in args.ids if i in found]
+    else:
+        rng = np.random.default_rng(args.seed)
+        positions = sorted(rng.choice(index.ntotal, size=min(args.random, index.ntotal), replace=False).tolist())
+        ids = store.position_ids().get_many(positions)
+        picked = [(pos, ids[pos]) for pos in positions]
+
+    docs = store.get_many([vector_id for _, vector_id in picked])
+    if args.vector:
+        _enable_reconstruct(index)
+    for (pos, vector_id), doc in zip(picked, docs):
+        vector = index.reconstruct(pos) if args.vector else None
+        print(f"\n[{pos}] {vector_id}")
+        print(f"  metadata: {json.dumps(doc.metadata if doc else {}, ensure_ascii=False)}")
+        if vector is not None:
+            print(f"  vector  : norm {np.linalg.norm(vector):.4f}, {np.array2string(vector[:8], precision=4)} ...")
+        text = doc.page_content if doc else ""
+        print(f"  text    : {text[:args.chars]}{'...' if len(text) > args.chars else ''}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", default=None, help="인덱스 폴더 (기본: CURRENT 스냅샷)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    info = commands.add_parser("info", help="인덱스 종류 / 차원 / 파일 크기 / 소스 파일별 청크 수")
+    info.add_argument("--top", type=int, default=30, help="표시할 소스 파일 수")
+    info.set_defaults(run=cmd_info)
 
-# ✅ 경로는 main.py에서 지정한 vector_store_path 그대로
-VECTOR_PATH = "../data/vectors/index"
+    export = commands.add_parser("export", help="벡터 + 메타데이터를 .npy(+.jsonl) 또는 .parquet 로 내보내기")
+    export.add_argument("output")
+    export.add_argument("--batch", type=int, default=65536, help="한 번에 읽고 쓰는 벡터 수")
+    export.add_argument("--text", action="store_true", help="청크 텍스트도 포함")
+    export.set_defaults(run=cmd_export)
 
-embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+    sample = commands.add_parser("sample", help="청크 미리보기 (id 지정 또는 임의 추출)")
+    sample.add_argument("--ids", nargs="+")
+    sample.add_argument("--random", type=int, default=5)
+    sample.add_argument("--seed", type=int, default=0)
+    sample.add_argument("--chars", type=int, default=300)
+    sample.add_argument("--vector", action="store_true", help="벡터 앞부분과 노름도 출력")
+    sample.set_defaults(run=cmd_sample)
 
-# 인덱스 로드
-db = FAISS.load_local(VECTOR_PATH, embeddings, allow_dangerous_deserialization=True)
+    args = parser.parse_args(argv)
+    args.index_dir = args.index_dir or default_index_dir()
+    args.run(args)
 
-# 벡터 개수
-print(f"총 벡터 수: {len(db.index_to_docstore_id)}")
 
-# 일부 청크 미리보기
-docs = db.similarity_search("test", k=5)
-for i, d in enumerate(docs, start=1):
-    print(f"\n[{i}] 페이지/소스: {d.metadata}")
-    print(f"내용:\n{d.page_content[:300]}...")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+FAISS 근사 인덱스 recall / 지연시간 벤치마크 (flat 기준)
+
+사용 예:
+    # 합성 임베딩 (클러스터 구조) 20만 개, 1536 차원
+    python benchmarks/bench_ann_recall.py --n 200000 --dim 1536
+
+    # 실제 인덱스의 벡터로 측정 (build_index.py 로 만든 index 폴더)
+    python benchmarks/bench_ann_recall.py --index-dir ./data/vectors/index
+
+각 인덱스 종류(ivf_flat / ivf_pq / hnsw)를 app/faiss_index.py 의 build_faiss_index 로
+만든 뒤 nprobe / efSearch 를 바꿔 가며 정확 검색(flat) 결과 대비 recall@k 와
+쿼리 1건당 지연시간(단일 스레드)을 표로 출력합니다.
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from langchain_community.vectorstores.faiss import dependable_faiss_import  # noqa: E402
+
+from faiss_index import FaissIndexConfig, build_faiss_index, set_search_params  # noqa: E402
+
+
+def make_vectors(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around random centers (embeddings of a corpus are clustered, not uniform)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, size=n)] + 0.6 * rng.standard_normal((n, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def load_vectors(index_dir: str) -> np.ndarray:
+    from faiss_index import reconstruct_all
+
+    faiss = dependable_faiss_import()
+    return reconstruct_all(faiss.read_index(str(Path(index_dir) / "index.faiss")))
+
+
+def search_all(index, queries: np.ndarray, k: int):
+    """Search queries one at a time (like live requests); returns (ids, ms per query)."""
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        _, ids[i] = index.search(query[None, :], k)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def index_size_mb(index) -> float:
+    faiss = dependable_faiss_import()
+    return faiss.serialize_index(index).nbytes / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", help="실제 FAISS 인덱스 폴더 (없으면 합성 벡터 사용)")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, default=16)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--types", nargs="+", default=["ivf_flat", "ivf_pq", "hnsw"])
+    args = parser.parse_args()
+
+    faiss = dependable_faiss_import()
+    faiss.omp_set_num_threads(1)
+
+    vectors = load_vectors(args.index_dir) if args.index_dir else make_vectors(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    # 쿼리: 코퍼스 벡터에 잡음을 섞은 것 (질문이 어떤 청크와 비슷한 상황)
+    queries = vectors[rng.choice(len(vectors), size=args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {args.queries} queries, recall@{args.k}")
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    truth, flat_ms = search_all(flat, queries, args.k)
+
+    rows: List[str] = [
+        f"| Flat | - | 0.0 | {index_size_mb(flat):.1f} | 1.000 | {flat_ms:.3f} | 1.0x |"
+    ]
+    for index_type in args.types:
+        config = FaissIndexConfig(index_type=index_type, pq_m=args.pq_m)
+        start = time.perf_counter()
+        index = build_faiss_index(config, vectors, train=True)
+        build_sec = time.perf_counter() - start
+        size_mb = index_size_mb(index)
+
+        if index_type == "hnsw":
+            settings = [("efSearch", v) for v in args.ef_search]
+        else:
+            settings = [("nprobe", v) for v in args.nprobe]
+        for name, value in settings:
+            setattr(config, "ef_search" if name == "efSearch" else "nprobe", value)
+            set_search_params(index, config)
+            found, ms = search_all(index, queries, args.k)
+            rows.append(
+                f"| {config.factory} | {name}={value} | {build_sec:.1f} | {size_mb:.1f} | "
+                f"{recall_at_k(found, truth):.3f} | {ms:.3f} | {flat_ms / ms:.1f}x |"
+            )
+
+    print("| index | search param | build (s) | size (MB) | recall | ms/query | speedup |")
+    print("|-------|--------------|----------:|----------:|-------:|---------:|--------:|")
+    for row in rows:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+벡터 압축 벤치마크: float32 vs float16 / int8(SQ8) / PQ (+ 정확 재정렬)
+
+사용 예:
+    python benchmarks/bench_compression.py --n 100000 --dim 1536
+    python benchmarks/bench_compression.py --index-type ivf_flat --pq-m 32 --rerank 2 4 8
+
+app/faiss_index.py 의 FAISS_CODEC 설정과 같은 인덱스를 만들어서 인덱스 크기(=프로세스
+메모리), 벡터당 바이트, 압축 안 한 인덱스 대비 recall@k, 쿼리당 지연시간을 출력합니다.
+재정렬(rerank) 행은 k * rerank 개 후보를 mmap 된 float32 .npy 에서 읽어 정확한 거리로
+다시 정렬한 결과입니다 (.npy 는 디스크에 있고 후보 행만 메모리에 올라옴).
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from langchain_community.vectorstores.faiss import dependable_faiss_import  # noqa: E402
+
+from faiss_index import FaissIndexConfig, RerankVectors, build_faiss_index  # noqa: E402
+from bench_ann_recall import index_size_mb, load_vectors, make_vectors, recall_at_k, search_all  # noqa: E402
+
+
+def search_reranked(index, rerank: RerankVectors, ids, queries: np.ndarray, k: int, factor: int):
+    """Same flow as VectorStoreManager._search_reranked, on raw positions."""
+    found = np.empty((len(queries), k), dtype=np.int64)
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        _, positions = index.search(query[None, :], k * factor)
+        candidates = positions[0][positions[0] != -1]
+        exact = rerank.get([ids[p] for p in candidates])
+        found[i] = candidates[np.argsort(((exact - query) ** 2).sum(axis=1))[:k]]
+    return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", help="실제 FAISS 인덱스 폴더 (없으면 합성 벡터 사용)")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf_flat", "hnsw"])
+    parser.add_argument("--codecs", nargs="+", default=["none", "fp16", "sq8", "pq"])
+    parser.add_argument("--pq-m", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=32)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[4, 10])
+    args = parser.parse_args()
+
+    faiss = dependable_faiss_import()
+    faiss.omp_set_num_threads(1)
+
+    vectors = load_vectors(args.index_dir) if args.index_dir else make_vectors(args.n, args.dim)
+    n, dim = vectors.shape
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, size=args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+    print(f"{n} vectors, dim {dim}, {args.queries} queries, recall@{args.k} vs exact float32 search")
+
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    truth, _ = search_all(exact, queries, args.k)
+    base_mb = n * dim * 4 / (1024 * 1024)
+
+    print("| codec | index | size (MB) | bytes/vector | saved | recall | ms/query |")
+    print("|-------|-------|----------:|-------------:|------:|-------:|---------:|")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for codec in args.codecs:
+            config = FaissIndexConfig(index_type=args.index_type, codec=codec, pq_m=args.pq_m, nprobe=args.nprobe)
+            index = build_faiss_index(config, vectors, train=True)
+            size_mb = index_size_mb(index)
+            found, ms = search_all(index, queries, args.k)
+            print(
+                f"| {codec} | {config.factory} | {size_mb:.1f} | {size_mb * 1024 * 1024 / n:.0f} | "
+                f"{max(0.0, 1 - size_mb / base_mb):.0%} | {recall_at_k(found, truth):.3f} | {ms:.3f} |"
+            )
+            if codec == "none" or not args.rerank:
+                continue
+
+            # 재정렬용 float32 원본: 디스크에 저장 후 mmap 으로 다시 열기 (인덱스 메모리에 포함 안 됨)
+            ids = [str(i) for i in range(n)]
+            rerank = RerankVectors()
+            rerank.add(ids, vectors)
+            rerank.save(tmp_dir, ids)
+            for factor in args.rerank:
+                found, ms = search_reranked(index, rerank, ids, queries, args.k, factor)
+                print(
+                    f"| {codec} + rerank x{factor} | {config.factory} | {size_mb:.1f} | "
+                    f"{size_mb * 1024 * 1024 / n:.0f} | {1 - size_mb / base_mb:.0%} | "
+                    f"{recall_at_k(found, truth):.3f} | {ms:.3f} |"
+                )
+    print(f"\n재정렬용 float32 .npy (디스크, mmap): {base_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+임베딩 백엔드 벤치마크: 초당 청크 수와 검색 재현율 (API 임베더 기준)
+
+사용 예:
+    python benchmarks/bench_embeddings.py --index-dir ./data/vectors/index \
+        --models text-embedding-3-small local:intfloat/multilingual-e5-small onnx:intfloat/multilingual-e5-small hash
+
+청크는 실제 인덱스(chunks.sqlite)에서 --n 개를 읽습니다. 모델마다
+  - chunks/s   : 청크 임베딩 처리량 (EmbeddingBatcher 경유, 캐시 없음)
+  - self@k     : 청크 안의 한 문장을 질의로 썼을 때 원래 청크가 top-k 에 드는 비율
+  - overlap@k  : 첫 번째 모델(기준, 보통 API 임베더)의 top-k 와 겹치는 비율
+을 출력합니다. 로드할 수 없는 모델(패키지/API 키 없음)은 건너뜁니다.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from chunk_store import CHUNK_STORE_FILE, ChunkStore, ordered_ids  # noqa: E402
+from embedding_batcher import EmbeddingBatcher  # noqa: E402
+from embedding_cache import embed_queries  # noqa: E402
+from embeddings import create_embeddings, runs_locally  # noqa: E402
+
+_SENTENCE = re.compile(r"[^.。!?\n]{20,200}")
+
+
+def load_chunks(index_dir: str, n: int) -> List[str]:
+    store = ChunkStore(os.path.join(index_dir, CHUNK_STORE_FILE))
+    ids = ordered_ids(store.position_ids())
+    picked = [ids[i] for i in np.linspace(0, len(ids) - 1, num=min(n, len(ids)), dtype=int)]
+    return [doc.page_content for doc in store.get_many(picked) if doc is not None]
+
+
+def make_queries(chunks: List[str], count: int, seed: int = 0) -> Dict[int, str]:
+    """chunk index -> one sentence-like span of that chunk."""
+    rng = np.random.default_rng(seed)
+    queries = {}
+    for i in rng.permutation(len(chunks)):
+        spans = _SENTENCE.findall(chunks[i])
+        if spans:
+            queries[int(i)] = spans[rng.integers(len(spans))].strip()
+        if len(queries) == count:
+            break
+    return queries
+
+
+def top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> np.ndarray:
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", default="./data/vectors/index")
+    parser.add_argument("--models", nargs="+", default=["text-embedding-3-small", "hash"])
+    parser.add_argument("--n", type=int, default=2000, help="임베딩할 청크 수")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.index_dir, args.n)
+    queries = make_queries(chunks, args.queries)
+    targets = np.array(list(queries))
+    print(f"{len(chunks)} chunks, {len(queries)} queries, k={args.k}, {os.cpu_count()} CPUs")
+    print("| model | chunks/s | self@k | overlap@k |")
+    print("|-------|---------:|-------:|----------:|")
+
+    reference = None
+    for name in args.models:
+        try:
+            embeddings = create_embeddings(name)
+            batcher = EmbeddingBatcher(embeddings, concurrency=1 if runs_locally(embeddings) else 4)
+            start = time.perf_counter()
+            doc_vectors = batcher.embed(chunks)
+            rate = len(chunks) / (time.perf_counter() - start)
+            query_vectors = np.asarray(embed_queries(embeddings, list(queries.values())), dtype=np.float32)
+        except Exception as e:
+            print(f"| {name} | skipped: {type(e).__name__}: {str(e)[:60]} | | |")
+            continue
+        doc_vectors /= np.maximum(np.linalg.norm(doc_vectors, axis=1, keepdims=True), 1e-12)
+        query_vectors /= np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+        found = top_k(doc_vectors, query_vectors, args.k)
+        self_recall = float(np.mean([t in row for t, row in zip(targets, found)]))
+        if reference is None:
+            reference = found
+            overlap = "-"
+        else:
+            overlap = f"{np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, reference)]):.2f}"
+        print(f"| {name} | {rate:.0f} | {self_recall:.2f} | {overlap} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+FAISS 인덱스 빌드 벤치마크: 배치별 from_documents + merge_from vs 사전 임베딩 일괄 빌드
+
+사용 예:
+    python benchmarks/bench_faiss_build.py --sizes 10000 100000 1000000 --dim 1536
+
+각 (방식, 청크 수) 조합은 별도 프로세스에서 실행되므로 peak RSS가 서로 섞이지 않습니다.
+임베딩은 네트워크 없이 난수 벡터를 돌려주는 가짜 임베더를 사용하므로,
+측정값은 API 시간이 아닌 인덱스/도큐스토어 구성 비용만 보여줍니다.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+os.environ.setdefault("EMBEDDING_CACHE", "false")
+
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import Embeddings  # noqa: E402
+from langchain_community.vectorstores import FAISS  # noqa: E402
+
+from vector_store import VectorStoreManager  # noqa: E402
+
+
+class RandomEmbeddings(Embeddings):
+    """Network-free embedder returning random unit vectors of a fixed size."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.rng = np.random.default_rng(0)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.rng.standard_normal((len(texts), self.dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return list(vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_documents(n: int) -> List[Document]:
+    return [
+        Document(
+            page_content=f"벤치마크 청크 {i} " + "대한약전 시험법 " * 20,
+            metadata={"source_file": f"bench_{i // 1000}.pdf", "page": i % 500, "chunk_id": i},
+        )
+        for i in range(n)
+    ]
+
+
+def build_legacy(documents: List[Document], embeddings: Embeddings) -> int:
+    """The previous loop: one FAISS store per 100 documents, merged into the first."""
+    batch_size = 100
+    store = FAISS.from_documents(documents[:batch_size], embeddings)
+    for i in range(batch_size, len(documents), batch_size):
+        store.merge_from(FAISS.from_documents(documents[i:i+batch_size], embeddings))
+    return store.index.ntotal
+
+
+def build_bulk(documents: List[Document], embeddings: Embeddings) -> int:
+    manager = VectorStoreManager(store_path="/tmp/bench_faiss_build", embeddings=embeddings)
+    manager.create_vectorstore(documents)
+    return manager.vectorstore.index.ntotal
+
+
+def peak_rss_mb() -> float:
+    # Linux는 KB, macOS는 byte 단위
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(mode: str, size: int, dim: int) -> None:
+    import logging
+    logging.disable(logging.INFO)
+
+    documents = make_documents(size)
+    embeddings = RandomEmbeddings(dim)
+    base_rss = peak_rss_mb()
+
+    start = time.perf_counter()
+    ntotal = (build_legacy if mode == "legacy" else build_bulk)(documents, embeddings)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "mode": mode,
+        "size": size,
+        "ntotal": ntotal,
+        "seconds": round(elapsed, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "build_rss_mb": round(peak_rss_mb() - base_rss, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--modes", nargs="+", default=["legacy", "bulk"], choices=["legacy", "bulk"])
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], int(args.worker[1]), args.dim)
+        return
+
+    print("| chunks | mode | seconds | peak RSS (MB) | build RSS (MB) |")
+    print("|-------:|------|--------:|--------------:|---------------:|")
+    for size in args.sizes:
+        for mode in args.modes:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--dim", str(args.dim), "--worker", mode, str(size)],
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode != 0:
+                print(f"| {size} | {mode} | failed: {proc.stderr.strip().splitlines()[-1]} | | |")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"| {size} | {mode} | {r['seconds']} | {r['peak_rss_mb']} | {r['build_rss_mb']} |")
+
+
+if __name__ == "__main__":
+    main()
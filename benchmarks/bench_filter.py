@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+메타데이터 필터 검색 벤치마크: 필터 없음 vs source_file / page 필터의 쿼리당 지연시간
+
+사용 예:
+    python benchmarks/bench_filter.py --n 100000 --dim 768
+    python benchmarks/bench_filter.py --n 100000 --index-type hnsw
+
+합성 인덱스(1000 청크당 PDF 1개, 페이지 0~499)를 만든 뒤 선택 비율이 다른 필터로
+같은 질의 벡터를 검색합니다. 필터는 FAISS 검색 안에서 IDSelector 로 적용되므로
+(작은 선택은 해당 벡터만 직접 비교) 결과를 더 가져와서 버리지 않습니다.
+첫 필터 검색 때 한 번 만드는 필드 색인 시간도 함께 출력합니다.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+os.environ.setdefault("EMBEDDING_CACHE", "false")
+
+from bench_faiss_build import RandomEmbeddings  # noqa: E402
+from bench_load import build  # noqa: E402
+from vector_store import VectorStoreManager  # noqa: E402
+
+FILTERS = [
+    ("none", None),
+    ("1 PDF (1%)", {"source_file": "bench_3.pdf"}),
+    ("10 PDFs (10%)", {"source_file": [f"bench_{i}.pdf" for i in range(10)]}),
+    ("page 0-249 (50%)", {"page": {"gte": 0, "lte": 249}}),
+    ("1 PDF, page 10-19", {"source_file": "bench_3.pdf", "page": {"gte": 10, "lte": 19}}),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--index-type", default="flat", help="FAISS_INDEX_TYPE (flat / ivf_flat / ivf_pq / hnsw)")
+    args = parser.parse_args()
+    os.environ["FAISS_INDEX_TYPE"] = args.index_type
+
+    with tempfile.TemporaryDirectory() as store_path:
+        build(store_path, args.n, args.dim)
+        manager = VectorStoreManager(store_path=store_path, embeddings=RandomEmbeddings(args.dim))
+        manager.load_vectorstore()
+        index = manager.vectorstore.index
+        queries = np.random.default_rng(1).random((args.queries, args.dim), dtype=np.float32)
+
+        start = time.perf_counter()
+        manager.select({"page": 0})
+        print(f"{args.n} chunks, {manager.index_config.factory}: filter index built in {time.perf_counter() - start:.2f}s")
+
+        print("| filter | selected | ms/query | results in filter |")
+        print("|--------|---------:|---------:|------------------:|")
+        for name, filter in FILTERS:
+            selection = manager.select(filter) if filter else None
+            start = time.perf_counter()
+            for query in queries:
+                if selection is None:
+                    _, positions = index.search(query[None, :], args.k)
+                else:
+                    _, positions = search(manager, query, args.k, selection)
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+            selected = len(selection) if selection is not None else index.ntotal
+            inside = "-" if selection is None else str(bool(np.isin(positions[positions != -1], selection.positions).all()))
+            print(f"| {name} | {selected} | {ms:.2f} | {inside} |")
+
+
+def search(manager: VectorStoreManager, query: np.ndarray, k: int, selection):
+    from faiss_index import search_selected
+
+    return search_selected(
+        manager.vectorstore.index, manager.index_config, query[None, :], k,
+        selection.positions, selection.bitmap, scan_limit=manager.filter_scan_limit,
+    )
+
+
+if __name__ == "__main__":
+    main()
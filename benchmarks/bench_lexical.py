@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+BM25 렉시컬 인덱스 벤치마크: 빌드 시간, postings 크기, 쿼리당 지연시간
+
+사용 예:
+    python benchmarks/bench_lexical.py --n 100000
+    python benchmarks/bench_lexical.py --index-dir ./data/vectors/index
+
+--index-dir 를 주면 실제 인덱스(chunks.sqlite)의 청크 텍스트를, 없으면 약전 용어와
+임의 한글 단어를 Zipf 분포로 섞은 합성 청크(약 120 단어)를 사용합니다.
+hybrid 검색에서 벡터 검색에 더해지는 비용은 여기 나오는 ms/query 입니다.
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from lexical_index import LEXICAL_INDEX_FILE, LexicalIndex  # noqa: E402
+
+WORDS = [
+    "용출시험법", "잔류용매", "함량시험", "확인시험", "순도시험", "정량법", "건조감량", "강열잔분",
+    "니모디핀", "주사액", "정제", "캡슐", "표준품", "검액", "표준액", "이동상", "칼럼", "유속",
+    "nimodipine", "acetaminophen", "hplc", "mg", "ml", "시험한다", "따른다", "적합하다",
+]
+QUERIES = ["용출시험법", "잔류용매 기준", "니모디핀 주사액 함량시험", "acetaminophen", "50-00-0", "표준액 이동상 유속"]
+
+
+def make_chunks(n: int, seed: int = 0, vocab_size: int = 20_000) -> List[Tuple[str, str]]:
+    """Chunks of ~120 words drawn Zipf-style (few very common words, a long tail of rare ones)."""
+    rng = np.random.default_rng(seed)
+    syllables = [chr(c) for c in rng.integers(0xAC00, 0xD7A4, size=vocab_size * 4)]
+    vocab = WORDS + ["".join(syllables[i * 4:i * 4 + rng.integers(2, 5)]) for i in range(vocab_size)]
+    weights = 1.0 / np.arange(1, len(vocab) + 1)
+    weights /= weights.sum()
+    chunks = []
+    for i in range(n):
+        words = [vocab[j] for j in rng.choice(len(vocab), size=120, p=weights)]
+        words.append(f"{rng.integers(50, 99999)}-{rng.integers(10, 99)}-{rng.integers(0, 9)}")
+        chunks.append((f"id-{i}", " ".join(words)))
+    return chunks
+
+
+def load_chunks(index_dir: str) -> List[Tuple[str, str]]:
+    from chunk_store import CHUNK_STORE_FILE, ChunkStore, ordered_ids
+
+    store = ChunkStore(str(Path(index_dir) / CHUNK_STORE_FILE))
+    ids = ordered_ids(store.position_ids())
+    return [(vid, doc.page_content) for vid, doc in zip(ids, store.get_many(ids))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", help="실제 인덱스 폴더 (없으면 합성 청크 사용)")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.index_dir) if args.index_dir else make_chunks(args.n)
+
+    index = LexicalIndex()
+    start = time.perf_counter()
+    index.add([vid for vid, _ in chunks], [text for _, text in chunks])
+    index.compact()
+    build_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index.save(tmp_dir)
+        size_mb = (Path(tmp_dir) / LEXICAL_INDEX_FILE).stat().st_size / (1024 * 1024)
+        start = time.perf_counter()
+        LexicalIndex.load(tmp_dir)
+        load_s = time.perf_counter() - start
+    print(f"{len(chunks)} chunks: build {build_s:.1f}s, {size_mb:.1f} MB on disk, load {load_s:.2f}s")
+
+    print("| query | hits | ms/query |")
+    print("|-------|-----:|---------:|")
+    for query in QUERIES:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            hits = index.search(query, k=args.k)
+        print(f"| {query} | {len(hits)} | {(time.perf_counter() - start) * 1000 / args.repeat:.2f} |")
+
+
+if __name__ == "__main__":
+    main()
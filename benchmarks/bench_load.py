@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+인덱스 로드 벤치마크: VECTOR_LOAD_MODE=memory vs mmap
+
+사용 예:
+    python benchmarks/bench_load.py --n 200000 --dim 1536 --workers 4
+
+합성 인덱스를 한 번 저장한 뒤, 모드마다 워커 프로세스 N개를 동시에 띄워
+로드 시간, 검색 후 RSS, PSS(여러 프로세스가 공유하는 페이지를 나눠서 센 메모리,
+Linux 만)를 출력합니다. mmap 모드에서는 PSS 합계가 프로세스 수에 비례해 늘지 않습니다.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+from pathlib import Path
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+os.environ.setdefault("EMBEDDING_CACHE", "false")
+
+import numpy as np  # noqa: E402
+
+from bench_faiss_build import RandomEmbeddings  # noqa: E402
+from vector_store import VectorStoreManager  # noqa: E402
+
+
+def build(store_path: str, n: int, dim: int) -> None:
+    from langchain_core.documents import Document
+
+    manager = VectorStoreManager(store_path=store_path, embeddings=RandomEmbeddings(dim))
+    rng = np.random.default_rng(0)
+    batch = 10_000
+    for start in range(0, n, batch):
+        count = min(batch, n - start)
+        docs = [
+            Document(
+                page_content=f"벤치마크 청크 {i} " + "대한약전 시험법 " * 60,
+                metadata={"source_file": f"bench_{i // 1000}.pdf", "page": i % 500, "chunk_id": i},
+            )
+            for i in range(start, start + count)
+        ]
+        manager.append_embeddings(docs, rng.random((count, dim), dtype=np.float32), ids=[f"id-{i}" for i in range(start, start + count)])
+    manager.save_vectorstore()
+
+
+def memory_mb() -> dict:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = {"peak_rss_mb": round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                if key in ("Rss", "Pss"):
+                    result[f"{key.lower()}_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return result
+
+
+def run_worker(store_path: str, mode: str, dim: int, searches: int, hold: float) -> None:
+    import logging
+    logging.disable(logging.INFO)
+
+    os.environ["VECTOR_LOAD_MODE"] = mode
+    manager = VectorStoreManager(store_path=store_path, embeddings=RandomEmbeddings(dim))
+    start = time.perf_counter()
+    manager.load_vectorstore()
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(searches):
+        manager.search(f"query {i}", k=5)
+    search_ms = (time.perf_counter() - start) * 1000 / max(searches, 1)
+
+    time.sleep(hold)  # 다른 워커들이 모두 살아 있는 상태에서 PSS 측정
+    print(json.dumps({"load_s": round(load_s, 3), "search_ms": round(search_ms, 2), **memory_mb()}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--modes", nargs="+", default=["memory", "mmap"])
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--store-path", help=argparse.SUPPRESS)
+    parser.add_argument("--hold", type=float, default=3.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.store_path, args.worker, args.dim, args.searches, args.hold)
+        return
+
+    with tempfile.TemporaryDirectory() as store_path:
+        start = time.perf_counter()
+        build(store_path, args.n, args.dim)
+        index_mb = sum(f.stat().st_size for f in Path(store_path, "index").iterdir()) / (1024 * 1024)
+        print(f"{args.n} chunks, dim {args.dim}: built in {time.perf_counter() - start:.1f}s, {index_mb:.0f} MB on disk")
+
+        print("| mode | workers | load (s) | search (ms) | RSS / proc (MB) | PSS / proc (MB) | PSS total (MB) |")
+        print("|------|--------:|---------:|------------:|----------------:|----------------:|---------------:|")
+        for mode in args.modes:
+            procs = [
+                subprocess.Popen(
+                    [sys.executable, __file__, "--worker", mode, "--store-path", store_path,
+                     "--dim", str(args.dim), "--searches", str(args.searches), "--hold", str(args.hold)],
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                )
+                for _ in range(args.workers)
+            ]
+            results = []
+            for proc in procs:
+                out, err = proc.communicate()
+                if proc.returncode != 0:
+                    print(f"| {mode} | failed: {err.strip().splitlines()[-1]} | | | | | |")
+                    break
+                results.append(json.loads(out.strip().splitlines()[-1]))
+            if len(results) != len(procs):
+                continue
+            mean = lambda key: sum(r.get(key, 0.0) for r in results) / len(results)  # noqa: E731
+            print(
+                f"| {mode} | {args.workers} | {mean('load_s'):.3f} | {mean('search_ms'):.2f} | "
+                f"{mean('rss_mb'):.0f} | {mean('pss_mb'):.0f} | {sum(r.get('pss_mb', 0.0) for r in results):.0f} |"
+            )
+
+
+if __name__ == "__main__":
+    main()
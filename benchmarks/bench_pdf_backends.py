@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+PDF 텍스트 추출 백엔드 벤치마크 (pypdf / pdfplumber / pypdf2)
+
+사용 예:
+    # 표가 많은 합성 PDF 코퍼스를 생성해서 측정
+    python benchmarks/bench_pdf_backends.py --files 5 --pages 200
+
+    # 실제 컬렉션 폴더로 측정
+    python benchmarks/bench_pdf_backends.py --pdf-dir ./data/pdfs
+
+백엔드마다 별도 프로세스에서 PDFProcessor.iter_pages 를 끝까지 돌려서
+pages/sec, peak RSS, 추출된 문자 수를 비교합니다.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import List
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pdf_processor import PDF_BACKENDS, PDFProcessor  # noqa: E402
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]], table_rows: int = 12) -> None:
+    """Write a minimal PDF: each page has paragraph lines plus a ruled 3-column table."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages (kids 목록은 마지막에 채움)
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page_no, lines in enumerate(pages):
+        ops = ["BT /F1 10 Tf 12 TL 50 800 Td"]
+        for line in lines:
+            ops.append(f"({_escape(line)}) '")
+        ops.append("ET")
+        # 표: 셀 테두리 + 셀 텍스트
+        top = 780 - 12 * len(lines)
+        for r in range(table_rows):
+            y = top - 18 * r
+            for c, x in enumerate((50, 220, 390)):
+                ops.append(f"{x} {y - 18} 170 18 re S")
+                ops.append(f"BT /F1 9 Tf {x + 4} {y - 13} Td (item {page_no}-{r}-{c} rev {r % 3}) Tj ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def make_corpus(out_dir: str, files: int, pages: int) -> List[str]:
+    paths = []
+    for i in range(files):
+        body = [
+            [f"Monograph {i}-{p} line {n}: assay, dissolution test, residual solvents {n * 7}" for n in range(25)]
+            for p in range(pages)
+        ]
+        path = os.path.join(out_dir, f"synthetic_{i:03d}.pdf")
+        write_pdf(path, body)
+        paths.append(path)
+    return paths
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_worker(backend: str, paths: List[str]) -> None:
+    import logging
+    logging.disable(logging.INFO)
+
+    processor = PDFProcessor(backend=backend)
+    pages = chars = 0
+    start = time.perf_counter()
+    for path in paths:
+        for page in processor.iter_pages(path):
+            pages += 1
+            chars += len(page.page_content)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "backend": backend,
+        "pages": pages,
+        "chars": chars,
+        "seconds": round(elapsed, 2),
+        "pages_per_sec": round(pages / elapsed, 1) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf-dir", help="측정할 실제 PDF 폴더 (없으면 합성 코퍼스 생성)")
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--backends", nargs="+", default=list(PDF_BACKENDS), choices=PDF_BACKENDS)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.paths)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.pdf_dir:
+            paths = sorted(
+                os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.lower().endswith(".pdf")
+            )
+        else:
+            paths = make_corpus(tmp_dir, args.files, args.pages)
+        print(f"{len(paths)} PDF files")
+
+        print("| backend | pages | pages/sec | peak RSS (MB) | chars |")
+        print("|---------|------:|----------:|--------------:|------:|")
+        for backend in args.backends:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--worker", backend, *paths],
+                capture_output=True,
+                text=True,
+            )
+            if proc.returncode != 0:
+                print(f"| {backend} | failed: {proc.stderr.strip().splitlines()[-1]} | | | |")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"| {backend} | {r['pages']} | {r['pages_per_sec']} | {r['peak_rss_mb']} | {r['chars']} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+배치 검색 벤치마크: search() 반복 vs search_batch() 의 초당 질의 수
+
+사용 예:
+    python benchmarks/bench_search_batch.py --n 100000 --dim 1536 --embed-latency 0.15
+
+합성 인덱스를 한 번 만든 뒤 배치 크기(기본 1, 8, 64, 512)마다 같은 질의들을
+search() 로 하나씩 / search_batch() 로 한 번에 검색합니다. 임베딩 API 왕복은
+요청마다 --embed-latency 초를 기다리는 가짜 임베더로 흉내 냅니다 (0 이면 FAISS /
+청크 조회 비용만 측정). 질의 임베딩 캐시는 끔 (매번 새 질의로 취급).
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+os.environ.setdefault("EMBEDDING_CACHE", "false")
+os.environ["QUERY_CACHE_SIZE"] = "0"
+
+from bench_faiss_build import RandomEmbeddings  # noqa: E402
+from bench_load import build  # noqa: E402
+from vector_store import VectorStoreManager  # noqa: E402
+
+
+class SlowEmbeddings(RandomEmbeddings):
+    """RandomEmbeddings that waits `latency` seconds per request, like a remote embedding API."""
+
+    def __init__(self, dim: int, latency: float):
+        super().__init__(dim)
+        self.latency = latency
+        self.requests = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64, 512])
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="임베딩 요청 1건당 지연 (초)")
+    parser.add_argument("--max-single", type=int, default=64, help="search() 반복은 이 개수까지만 측정")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as store_path:
+        build(store_path, args.n, args.dim)
+        embeddings = SlowEmbeddings(args.dim, args.embed_latency)
+        manager = VectorStoreManager(store_path=store_path, embeddings=embeddings)
+        manager.load_vectorstore()
+        print(f"{args.n} chunks, dim {args.dim}, k={args.k}, {args.embed_latency * 1000:.0f} ms per embedding request")
+
+        print("| batch | search() q/s | search_batch() q/s | speedup | embedding requests (single / batch) |")
+        print("|------:|-------------:|-------------------:|--------:|------------------------------------:|")
+        for size in args.batch_sizes:
+            queries = [f"질의 {size}-{i}" for i in range(size)]
+
+            single_n = min(size, args.max_single)
+            embeddings.requests = 0
+            start = time.perf_counter()
+            for query in queries[:single_n]:
+                manager.search(query, k=args.k)
+            single_qps = single_n / (time.perf_counter() - start)
+            single_requests = embeddings.requests * size // single_n
+
+            embeddings.requests = 0
+            start = time.perf_counter()
+            results = manager.search_batch(queries, k=args.k)
+            batch_qps = size / (time.perf_counter() - start)
+            assert len(results) == size and all(len(r) == args.k for r in results)
+
+            print(
+                f"| {size} | {single_qps:.1f} | {batch_qps:.1f} | {batch_qps / single_qps:.1f}x | "
+                f"{single_requests} / {embeddings.requests} |"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+샤드 라우터 벤치마크: 단일 인덱스 vs 샤드 전체 병렬 검색 vs 샤드 1개 검색
+
+사용 예:
+    python benchmarks/bench_shards.py --n 100000 --shards 4 --dim 768
+
+같은 벡터를 한 인덱스와 --shards 개의 샤드(shards/s0 ...)로 나눠 저장한 뒤
+쿼리당 지연시간과 샤드 하나 재빌드(나머지 샤드는 그대로) 시간을 출력합니다.
+병렬 검색의 이득은 코어 수에 따라 다릅니다 (FAISS 는 검색 중 GIL 을 놓음).
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+os.environ.setdefault("EMBEDDING_CACHE", "false")
+os.environ["QUERY_CACHE_SIZE"] = "0"
+
+from bench_faiss_build import RandomEmbeddings  # noqa: E402
+from bench_load import build  # noqa: E402
+from shard_router import SHARD_DIR, ShardRouter  # noqa: E402
+from vector_store import VectorStoreManager  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as store_path:
+        build(store_path, args.n, args.dim)
+        single = VectorStoreManager(store_path=store_path, embeddings=RandomEmbeddings(args.dim))
+        single.load_vectorstore()
+
+        per_shard = args.n // args.shards
+        build_seconds = []
+        for i in range(args.shards):
+            with tempfile.TemporaryDirectory() as tmp:
+                start = time.perf_counter()
+                build(tmp, per_shard, args.dim)
+                build_seconds.append(time.perf_counter() - start)
+                os.makedirs(os.path.join(store_path, SHARD_DIR), exist_ok=True)
+                os.rename(os.path.join(tmp, "index"), os.path.join(store_path, SHARD_DIR, f"s{i}"))
+        router = ShardRouter(store_path, embeddings=RandomEmbeddings(args.dim))
+        router.load()
+
+        queries = [f"질의 {i}" for i in range(args.queries)]
+        cases = [
+            ("single index", lambda q: single.search(q, k=args.k)),
+            (f"router, {args.shards} shards", lambda q: router.search(q, k=args.k)),
+            ("router, 1 shard", lambda q: router.search(q, k=args.k, shards=["s0"])),
+        ]
+        print(f"{args.n} chunks, dim {args.dim}, {args.shards} shards of {per_shard}, {os.cpu_count()} CPUs")
+        print("| search | ms/query |")
+        print("|--------|---------:|")
+        for name, search in cases:
+            start = time.perf_counter()
+            for query in queries:
+                search(query)
+            print(f"| {name} | {(time.perf_counter() - start) * 1000 / len(queries):.2f} |")
+        print(f"rebuilding one shard: {sum(build_seconds) / len(build_seconds):.1f}s (other shards stay loaded)")
+        router.close()
+
+
+if __name__ == "__main__":
+    main()
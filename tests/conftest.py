@@ -0,0 +1,62 @@
+"""
+Shared test setup: app/ on the module path, a chunk factory and a text PDF fixture
+"""
+import sys
+import os
+
+import pytest
+
+# app 디렉토리를 모듈 경로에 추가
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from langchain_core.documents import Document
+
+
+def make_chunks(source_file, texts):
+    return [
+        Document(
+            page_content=text,
+            metadata={"source": f"/missing/{source_file}", "source_file": source_file, "page": i, "chunk_id": i},
+        )
+        for i, text in enumerate(texts)
+    ]
+
+
+@pytest.fixture
+def chunks():
+    """chunks(source_file, texts) → one Document per text, page / chunk_id = position."""
+    return make_chunks
+
+
+def make_pdf(path, pages):
+    """Minimal text PDF (one Helvetica text block per page, ASCII) for ingestion tests."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        stream = f"BT /F1 12 Tf 72 720 Td ({escaped}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+
+@pytest.fixture
+def write_pdf():
+    """write_pdf(path, pages) → a text PDF with one page per string."""
+    return make_pdf
@@ -0,0 +1,83 @@
+"""
+Tests for the exact / semantic answer cache
+"""
+import pytest
+
+from answer_cache import AnswerCache
+
+VECTORS = {
+    "니모디핀 주사액 함량시험": [1.0, 0.0, 0.0],
+    "니모디핀 주사액의 함량시험은?": [0.99, 0.05, 0.0],
+    "잔류용매 기준": [0.0, 1.0, 0.0],
+}
+SOURCES = [{"content": "...", "metadata": {"page": 3, "source_file": "a.pdf"}}]
+
+
+def test_exact_semantic_and_version_invalidation(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), similarity=0.95)
+    embed = VECTORS.__getitem__
+    cache.put("llm|k=5", "v1", "니모디핀 주사액 함량시험", "답변", SOURCES, vector=embed("니모디핀 주사액 함량시험"))
+
+    hit = cache.get("llm|k=5", "v1", " 니모디핀  주사액 함량시험", embed=embed)
+    assert (hit["cache"], hit["answer"], hit["sources"]) == ("exact", "답변", SOURCES)
+    hit = cache.get("llm|k=5", "v1", "니모디핀 주사액의 함량시험은?", embed=embed)
+    assert hit["cache"] == "semantic" and hit["cached_question"] == "니모디핀 주사액 함량시험"
+    assert cache.get("llm|k=5", "v1", "잔류용매 기준", embed=embed) is None
+    # 다른 설정(scope)이나 다른 인덱스 버전에는 적용되지 않음
+    assert cache.get("llm|k=10", "v1", "니모디핀 주사액 함량시험", embed=embed) is None
+    assert cache.get("llm|k=5", "v2", "니모디핀 주사액 함량시험", embed=embed) is None
+
+    cache.put("llm|k=5", "v2", "잔류용매 기준", "답변2", [], vector=embed("잔류용매 기준"))
+    assert len(cache) == 1
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["semantic_hits"] == 1
+
+
+def test_lru_eviction_and_ttl(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"), max_entries=10, similarity=1.0)
+    for i in range(11):
+        cache.put("s", "v", f"question {i}", f"answer {i}", [])
+    assert len(cache) == 9
+    assert cache.get("s", "v", "question 0") is None
+    assert cache.get("s", "v", "question 10")["answer"] == "answer 10"
+
+    expired = AnswerCache(str(tmp_path / "answers.sqlite"), ttl_seconds=-1, similarity=1.0)
+    assert expired.get("s", "v", "question 10") is None
+
+
+class CountingEmbeddings:
+    def __init__(self, underlying):
+        self.underlying = underlying
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.underlying.embed_query(text)
+
+
+class RecordingQAChain:
+    def answer(self, question, contexts):
+        return f"answer from {len(contexts)} chunks"
+
+
+def test_query_embeds_the_question_once_for_cache_and_search(tmp_path, monkeypatch, chunks):
+    pytest.importorskip("faiss")
+    monkeypatch.setenv("VECTOR_STORE_PATH", str(tmp_path))
+    monkeypatch.setenv("EMBEDDING_MODEL", "hash:64")
+    monkeypatch.setenv("EMBEDDING_CACHE", "false")
+    monkeypatch.setenv("QUERY_CACHE_SIZE", "0")
+    monkeypatch.setenv("INDEX_WATCH_SECONDS", "0")
+    monkeypatch.setenv("TOP_K", "2")
+    from main import RAGSystem
+
+    rag = RAGSystem()
+    rag.vector_store.upsert_documents("a.pdf", chunks("a.pdf", ["니모디핀 주사액 함량시험", "잔류용매 기준"]))
+    rag.qa_chain = RecordingQAChain()
+    embeddings = CountingEmbeddings(rag.vector_store.embeddings)
+    rag.vector_store.embeddings = embeddings
+
+    # 캐시 미스: 답변 캐시 조회와 검색에 임베딩 요청 1번
+    assert rag.query("니모디핀 주사액 함량시험")["answer"] == "answer from 2 chunks"
+    assert embeddings.calls == 1
+    # 정확히 같은 질문은 임베딩 없이 캐시에서
+    assert rag.query("니모디핀 주사액 함량시험")["cache"] == "exact"
+    assert embeddings.calls == 1
@@ -0,0 +1,143 @@
+"""
+Tests for build_index: incremental rebuilds (changed / deleted / renamed PDFs, settings changes, dedup dependents)
+"""
+import os
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from chunk_store import CHUNK_STORE_FILE, ChunkStore
+from faiss_index import read_faiss_index
+from index_manifest import MANIFEST_FILE, IndexManifest
+from index_snapshots import current_index
+from vector_store import VectorStoreManager
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    """(store path, pdf folder, ids passed to delete_vectors) with hash embeddings."""
+    store = str(tmp_path / "vectors")
+    monkeypatch.setenv("VECTOR_STORE_PATH", store)
+    monkeypatch.setenv("EMBEDDING_MODEL", "hash:64")
+    monkeypatch.setenv("EMBEDDING_CACHE", "false")
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+
+    removed = []
+    delete_vectors = VectorStoreManager.delete_vectors
+
+    def record_delete(self, ids):
+        removed.extend(ids)
+        return delete_vectors(self, ids)
+
+    monkeypatch.setattr(VectorStoreManager, "delete_vectors", record_delete)
+    return store, pdf_dir, removed
+
+
+def build(pdf_dir, **kwargs):
+    from build_index import build_index
+    build_index(pdf_dir=str(pdf_dir), **kwargs)
+
+
+def index_state(store):
+    """(manifest, {vector id: Document}) of the published index."""
+    index_dir = os.path.join(store, current_index(store))
+    chunks = ChunkStore(os.path.join(index_dir, CHUNK_STORE_FILE))
+    ids = list(chunks.position_ids().values())
+    return IndexManifest.load(os.path.join(index_dir, MANIFEST_FILE)), dict(zip(ids, chunks.get_many(ids)))
+
+
+def test_changed_deleted_and_renamed_pdfs(corpus, write_pdf):
+    store, pdf_dir, removed = corpus
+    write_pdf(str(pdf_dir / "a.pdf"), ["a one", "a two"])
+    write_pdf(str(pdf_dir / "b.pdf"), ["b one"])
+    write_pdf(str(pdf_dir / "c.pdf"), ["c one"])
+    build(pdf_dir)
+    before, _ = index_state(store)
+    assert removed == []
+
+    write_pdf(str(pdf_dir / "a.pdf"), ["a one", "a two revised"])
+    os.remove(pdf_dir / "b.pdf")
+    os.rename(pdf_dir / "c.pdf", pdf_dir / "d.pdf")
+    build(pdf_dir)
+    after, docs = index_state(store)
+
+    assert sorted(after.files) == ["a.pdf", "d.pdf"]
+    assert sorted(removed) == sorted(
+        before.vector_ids("a.pdf") + before.vector_ids("b.pdf") + before.vector_ids("c.pdf")
+    )
+    assert set(docs) == set(after.vector_ids("a.pdf") + after.vector_ids("d.pdf"))
+    assert not set(docs) & set(removed)
+    assert sorted(doc.page_content for doc in docs.values()) == ["a one", "a two revised", "c one"]
+    assert docs[after.vector_ids("d.pdf")[0]].metadata["source_file"] == "d.pdf"
+
+
+def test_settings_change_forces_full_rebuild(corpus, write_pdf, monkeypatch):
+    store, pdf_dir, removed = corpus
+    write_pdf(str(pdf_dir / "a.pdf"), ["a one", "a two"])
+    build(pdf_dir)
+    assert read_faiss_index(os.path.join(store, current_index(store))).d == 64
+
+    monkeypatch.setenv("EMBEDDING_MODEL", "hash:32")
+    build(pdf_dir)
+    manifest, docs = index_state(store)
+    # 증분 삭제 없이 새 설정으로 전부 다시 임베딩
+    assert removed == []
+    assert manifest.params["embedding_model"] == "hash:32"
+    assert read_faiss_index(os.path.join(store, current_index(store))).d == 32
+    assert sorted(doc.page_content for doc in docs.values()) == ["a one", "a two"]
+
+
+def test_dedup_dependents_are_reprocessed(corpus, write_pdf):
+    store, pdf_dir, removed = corpus
+    write_pdf(str(pdf_dir / "a.pdf"), ["shared monograph text", "a only"])
+    write_pdf(str(pdf_dir / "b.pdf"), ["shared monograph text", "b only"])
+    write_pdf(str(pdf_dir / "c.pdf"), ["c only", "shared monograph text"])
+    build(pdf_dir)
+    before, docs = index_state(store)
+    shared_id = before.vector_ids("a.pdf")[0]
+    assert before.files["b.pdf"]["shared_ids"] == [shared_id] and len(docs) == 4
+    assert [s["source_file"] for s in docs[shared_id].metadata["sources"]] == ["a.pdf", "b.pdf", "c.pdf"]
+
+    # a.pdf 에서 공유 청크가 빠지면 그 벡터에 합쳐져 있던 b.pdf / c.pdf 도 다시 처리
+    write_pdf(str(pdf_dir / "a.pdf"), ["a only", "a extra"])
+    build(pdf_dir)
+    after, docs = index_state(store)
+    assert sorted(removed) == sorted(
+        before.vector_ids("a.pdf") + before.vector_ids("b.pdf") + before.vector_ids("c.pdf")
+    )
+    assert sorted(doc.page_content for doc in docs.values()) == [
+        "a extra", "a only", "b only", "c only", "shared monograph text"
+    ]
+    # 파일 순서대로 처리하므로 이제 b.pdf 가 공유 청크를 소유
+    shared_id = after.vector_ids("b.pdf")[0]
+    assert after.files["c.pdf"]["shared_ids"] == [shared_id]
+    assert [s["source_file"] for s in docs[shared_id].metadata["sources"]] == ["b.pdf", "c.pdf"]
+
+    # 중복을 합쳐 둔 파일이 삭제되면 유지된 벡터의 sources 에서도 빠짐
+    removed.clear()
+    c_ids = after.vector_ids("c.pdf")
+    os.remove(pdf_dir / "c.pdf")
+    build(pdf_dir)
+    after, docs = index_state(store)
+    assert removed == c_ids and shared_id in docs
+    assert [s["source_file"] for s in docs[shared_id].metadata["sources"]] == ["b.pdf"]
+
+
+def test_process_pool_build_matches_sequential_build(corpus, write_pdf, monkeypatch, tmp_path):
+    store, pdf_dir, _ = corpus
+    for name in ("a", "b", "c"):
+        write_pdf(str(pdf_dir / f"{name}.pdf"), [f"{name} page {i}" for i in range(3)])
+    build(pdf_dir, workers=1)
+    sequential = index_state(store)
+
+    monkeypatch.setenv("VECTOR_STORE_PATH", str(tmp_path / "parallel"))
+    build(pdf_dir, workers=2)
+    parallel = index_state(str(tmp_path / "parallel"))
+
+    # 결과는 파일 순서대로 모이므로 벡터 id / 청크 / 인덱스 위치가 순차 빌드와 같음
+    assert parallel[0].files.keys() == sequential[0].files.keys()
+    assert all(parallel[0].vector_ids(f) == sequential[0].vector_ids(f) for f in sequential[0].files)
+    assert list(parallel[1]) == list(sequential[1])
+    assert [d.page_content for d in parallel[1].values()] == [d.page_content for d in sequential[1].values()]
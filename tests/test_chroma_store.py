@@ -0,0 +1,79 @@
+"""
+Tests for the Chroma path of VectorStoreManager (bulk upserts, stable ids, named collections)
+"""
+import pytest
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+
+from index_manifest import chunk_vector_ids
+from metadata_filter import chroma_metadata, chroma_where, from_chroma_metadata
+
+
+def test_chroma_metadata_round_trip_and_stable_ids(chunks):
+    sources = [{"source_file": "a.pdf", "page": 3}]
+    encoded = chroma_metadata({"source_file": "a.pdf", "sources": sources, "edition": None, "page": 3})
+    assert encoded == {
+        "source_file": "a.pdf", "sources": '[{"source_file": "a.pdf", "page": 3}]', "page": 3, "source_file:a.pdf": True
+    }
+    assert from_chroma_metadata(encoded) == {"source_file": "a.pdf", "sources": sources, "page": 3}
+
+    ids = chunk_vector_ids(chunks("a.pdf", ["x", "y"]) + [Document(page_content="x", metadata={"source_file": "a.pdf"})] * 2)
+    assert ids[:2] == chunk_vector_ids(chunks("a.pdf", ["x", "y"]))
+    assert len(set(ids)) == 4 and ids[3] == f"{ids[2]}-1"
+
+
+def test_source_file_filter_also_matches_dedup_sources():
+    # 중복 제거로 유지된 청크는 다른 파일을 sources 의 플래그로만 가짐
+    encoded = chroma_metadata({"source_file": "a.pdf", "sources": [{"source_file": "a.pdf"}, {"source_file": "b.pdf"}]})
+    assert encoded["source_file:b.pdf"] is True
+
+    assert chroma_where({"source_file": "b.pdf"}) == {
+        "$or": [{"source_file": {"$in": ["b.pdf"]}}, {"source_file:b.pdf": True}]
+    }
+    assert chroma_where({"source_file": ["a.pdf", "b.pdf"], "page": {"gte": 2}}) == {"$and": [
+        {"$or": [{"source_file": {"$in": ["a.pdf", "b.pdf"]}}, {"source_file:a.pdf": True}, {"source_file:b.pdf": True}]},
+        {"page": {"$gte": 2}},
+    ]}
+
+
+def test_bulk_upsert_into_named_collections(tmp_path, monkeypatch, chunks):
+    pytest.importorskip("chromadb")
+    monkeypatch.setenv("CHROMA_UPSERT_BATCH", "3")
+    from vector_store import VectorStoreManager
+
+    def make(collection):
+        return VectorStoreManager(
+            store_type="chroma",
+            store_path=str(tmp_path),
+            embeddings=DeterministicFakeEmbedding(size=16),
+            collection_name=collection,
+        )
+
+    kp = make("kp")
+    kp.create_vectorstore(chunks("kp.pdf", [f"대한약전 {i}" for i in range(5)]))
+    # 같은 청크를 다시 넣으면 같은 id 로 덮어씀
+    kp.add_documents(chunks("kp.pdf", ["대한약전 0", "대한약전 1"]))
+    assert kp.count() == 5
+
+    usp = make("usp")
+    usp.upsert_documents("usp.pdf", chunks("usp.pdf", ["USP monograph"]))
+    usp.save_vectorstore()
+    assert usp.count() == 1
+
+    reloaded = make("kp")
+    reloaded.load_vectorstore()
+    assert reloaded.count() == 5
+    assert reloaded.search("대한약전 3", k=1)[0].page_content == "대한약전 3"
+    assert [d.metadata["page"] for d in reloaded.search("x", k=5, filter={"page": 2})] == [2]
+
+    # 전체 재빌드: 같은 이름의 컬렉션에 남아 있던 벡터는 지움
+    rebuilt = make("kp")
+    rebuilt.reset_vectorstore()
+    new = chunks("kp.pdf", ["대한약전 개정판"])
+    rebuilt.append_embeddings(new, rebuilt.embed_documents(new))
+    rebuilt.save_vectorstore()
+    assert rebuilt.count() == 1
+    usp = make("usp")
+    usp.load_vectorstore()
+    assert usp.count() == 1
@@ -0,0 +1,45 @@
+"""
+Tests for ChunkDeduplicator (exact / MinHash merging, seeding from an existing index)
+"""
+from langchain_core.documents import Document
+
+from chunk_dedup import ChunkDeduplicator
+
+TEXT = "이 약을 건조한 것은 정량할 때 아스피린 (C9H8O4) 99.5 % 이상을 함유한다. 성상 이 약은 백색의 결정이다."
+
+
+def test_exact_mode_merges_identical_text_across_files(chunks):
+    dedup = ChunkDeduplicator(mode="exact")
+    a, b = chunks("a.pdf", [TEXT, "a only"]), chunks("b.pdf", ["b only", "  " + TEXT.upper() + "\n"])
+
+    assert [dedup.check(doc, f"a-{i}") for i, doc in enumerate(a)] == [None, None]
+    assert [dedup.check(doc, f"b-{i}") for i, doc in enumerate(b)] == [None, "a-0"]
+    assert dedup.merged_sources == {
+        "a-0": [{"source_file": "a.pdf", "page": 0}, {"source_file": "b.pdf", "page": 1}]
+    }
+    assert dedup.stats()["exact_duplicates"] == 1 and dedup.stats()["kept"] == 3
+
+
+def test_minhash_mode_merges_near_duplicates_only(chunks):
+    dedup = ChunkDeduplicator(mode="minhash", threshold=0.8)
+    assert dedup.check(chunks("a.pdf", [TEXT])[0], "a-0") is None
+    assert dedup.check(chunks("b.pdf", [TEXT.replace("99.5", "99.0")])[0], "b-0") == "a-0"
+    assert dedup.check(chunks("c.pdf", ["완전히 다른 내용의 청크입니다. 용출시험 제2법 패들법으로 시험한다."])[0], "c-0") is None
+    assert dedup.stats()["near_duplicates"] == 1
+    assert [s["source_file"] for s in dedup.merged_sources["a-0"]] == ["a.pdf", "b.pdf"]
+
+
+def test_seed_drops_removed_sources_and_keeps_no_text(chunks):
+    kept = Document(page_content=TEXT, metadata={
+        "source_file": "a.pdf", "page": 0,
+        "sources": [{"source_file": "a.pdf", "page": 0}, {"source_file": "b.pdf", "page": 4}, {"source_file": "c.pdf", "page": 1}],
+    })
+    dedup = ChunkDeduplicator(mode="minhash")
+    # b.pdf 는 삭제, c.pdf 는 재처리
+    dedup.seed([("a-0", kept), ("a-1", chunks("a.pdf", ["other"])[0])], removed_sources={"b.pdf", "c.pdf"})
+    assert dedup.merged_sources == {"a-0": [{"source_file": "a.pdf", "page": 0}]}
+    assert not any(isinstance(value, Document) for entry in dedup._exact.values() for value in entry)
+
+    # 재처리된 c.pdf 의 사본은 한 번만 다시 기록됨
+    assert dedup.check(chunks("c.pdf", ["c new", TEXT])[1], "c-1") == "a-0"
+    assert dedup.merged_sources["a-0"] == [{"source_file": "a.pdf", "page": 0}, {"source_file": "c.pdf", "page": 1}]
@@ -0,0 +1,184 @@
+"""
+Tests for the token-aware embedding batcher, including a local stub embedding server
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+
+
+def text_vector(text: str):
+    """Deterministic 3-d vector; the first component is the number at the end of the text."""
+    return [float(text.rsplit(" ", 1)[-1]), float(len(text)), 1.0]
+
+
+class FakeEmbeddings:
+    def __init__(self, fail_first=0):
+        self.calls = []
+        self.fail_first = fail_first
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.fail_first > 0:
+            self.fail_first -= 1
+            raise RuntimeError("temporary failure")
+        return [text_vector(t) for t in texts]
+
+
+def test_pack_batches_respects_token_and_size_limits():
+    batcher = EmbeddingBatcher(
+        FakeEmbeddings(), max_tokens_per_batch=10, max_batch_size=3, token_counter=len
+    )
+    texts = ["aaaa", "bbbb", "cc", "d", "eeeeeeeeeeeeeee", "f"]
+    batches = batcher.pack_batches(texts)
+
+    assert batches == [(0, 3), (3, 4), (4, 5), (5, 6)]
+    for start, end in batches:
+        assert end - start <= 3
+        # 한도를 넘는 긴 텍스트는 단독 배치로만 허용
+        assert end - start == 1 or sum(len(t) for t in texts[start:end]) <= 10
+
+
+def test_embed_preserves_order_and_retries_only_failed_batch():
+    fake = FakeEmbeddings(fail_first=1)
+    batcher = EmbeddingBatcher(
+        fake, max_tokens_per_batch=50, concurrency=1, retry_backoff=0, token_counter=len
+    )
+    texts = [f"chunk {i}" for i in range(40)]
+    vectors = batcher.embed(texts)
+
+    assert vectors.shape == (40, 3)
+    assert vectors[:, 0].tolist() == list(range(40))
+    # 실패한 첫 배치만 한 번 더 요청됨
+    batches = batcher.pack_batches(texts)
+    assert len(fake.calls) == len(batches) + 1
+    assert fake.calls[0] == fake.calls[1]
+
+
+class SlowEmbeddings:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        return [text_vector(t) for t in texts]
+
+
+def test_concurrent_embed_calls_share_the_request_limit():
+    slow = SlowEmbeddings()
+    batcher = EmbeddingBatcher(slow, max_batch_size=1, concurrency=2, token_counter=len)
+    # 스트리밍 인덱싱처럼 여러 스레드가 같은 배처로 동시에 임베딩
+    threads = [
+        threading.Thread(target=batcher.embed, args=([f"batch {n} chunk {i}" for i in range(6)],))
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert slow.max_in_flight == 2
+
+
+class StubEmbeddingServer:
+    """Minimal OpenAI-compatible /embeddings endpoint with latency and failure injection."""
+    def __init__(self, latency=0.05, fail_once=()):
+        self.latency = latency
+        self.fail_once = set(fail_once)
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    fail = inputs[0] in stub.fail_once
+                    stub.fail_once.discard(inputs[0])
+                try:
+                    time.sleep(stub.latency)
+                    if fail:
+                        self.send_response(500)
+                        self.send_header("Content-Type", "application/json")
+                        self.end_headers()
+                        self.wfile.write(b'{"error": {"message": "injected failure"}}')
+                        return
+                    payload = {
+                        "object": "list",
+                        "model": body.get("model", "stub"),
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": text_vector(t)}
+                            for i, t in enumerate(inputs)
+                        ],
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                    }
+                    data = json.dumps(payload).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_batcher_against_stub_server():
+    langchain_openai = pytest.importorskip("langchain_openai")
+
+    texts = [f"대한약전 청크 {i}" for i in range(400)]
+    with StubEmbeddingServer(latency=0.05, fail_once={texts[100]}) as stub:
+        embeddings = langchain_openai.OpenAIEmbeddings(
+            model="stub-embedding",
+            api_key="test",
+            base_url=stub.url,
+            check_embedding_ctx_length=False,
+            max_retries=0,
+        )
+        batcher = EmbeddingBatcher(
+            embeddings,
+            max_tokens_per_batch=1000,
+            max_batch_size=50,
+            concurrency=4,
+            retry_backoff=0,
+            token_counter=len,
+        )
+
+        vectors = batcher.embed(texts)
+
+    assert vectors[:, 0].tolist() == list(range(400))
+    assert stub.max_in_flight > 1
+    # 8개 배치 + 실패 후 재시도 1회
+    assert stub.requests == len(batcher.pack_batches(texts)) + 1
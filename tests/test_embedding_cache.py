@@ -0,0 +1,66 @@
+"""
+Tests for the disk embedding cache (hit / miss accounting, model-keyed entries, LRU eviction)
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    texts: list = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def cached(tmp_path, model, **kwargs):
+    underlying = CountingEmbeddings(size=8, texts=[])
+    return CachedEmbeddings(underlying, EmbeddingCache(str(tmp_path / "cache.sqlite"), **kwargs), model), underlying
+
+
+def test_only_misses_reach_the_model_and_entries_are_keyed_by_model(tmp_path):
+    embeddings, model = cached(tmp_path, "model-a")
+    first = embeddings.embed_documents(["니모디핀 주사액", "잔류용매 기준"])
+    # 공백만 다른 텍스트도 같은 키
+    again = embeddings.embed_documents(["니모디핀  주사액\n", "새 청크"])
+    assert model.texts == ["니모디핀 주사액", "잔류용매 기준", "새 청크"]
+    np.testing.assert_allclose(again[0], first[0], rtol=1e-6)
+    stats = embeddings.stats()
+    assert (stats["hits"], stats["misses"], stats["api_calls"]) == (1, 3, 2)
+
+    # 디스크에 남아 재시작 후에도 재사용
+    reopened, model = cached(tmp_path, "model-a")
+    reopened.embed_documents(["잔류용매 기준"])
+    assert model.texts == []
+
+    # 다른 모델은 같은 텍스트라도 다시 임베딩 (모델 변경 시 이전 벡터를 쓰지 않음)
+    other, model = cached(tmp_path, "model-b")
+    other.embed_documents(["잔류용매 기준"])
+    assert model.texts == ["잔류용매 기준"]
+    assert len(other.cache) == 4
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    embeddings, model = cached(tmp_path, "model-a", max_entries=10)
+    embeddings.embed_documents([f"chunk {i}" for i in range(10)])
+    embeddings.embed_documents(["chunk 0"])
+    embeddings.embed_documents(["chunk 10"])
+    # 한도를 넘으면 90% 로 줄이며, 방금 사용한 항목은 남음
+    assert len(embeddings.cache) == 9
+    model.texts.clear()
+    embeddings.embed_documents(["chunk 0", "chunk 10"])
+    assert model.texts == []
+
+
+def test_counters_add_up_under_concurrent_calls(tmp_path):
+    embeddings, _ = cached(tmp_path, "model-a")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda n: embeddings.embed_documents([f"batch {n} chunk {i}" for i in range(5)]), range(200)))
+    embeddings.embed_documents(["batch 0 chunk 0"])
+    stats = embeddings.stats()
+    assert (stats["api_calls"], stats["misses"], stats["hits"]) == (200, 1000, 1)
+    assert stats["saved_chars"] == len("batch 0 chunk 0")
@@ -0,0 +1,43 @@
+"""
+Tests for embedding backend selection and the offline HashingEmbeddings
+"""
+import numpy as np
+import pytest
+
+from embeddings import HashingEmbeddings, create_embeddings, default_prefixes, parse_embedding_model, runs_locally
+
+
+def test_parse_embedding_model():
+    assert parse_embedding_model("text-embedding-3-small") == ("openai", "text-embedding-3-small")
+    assert parse_embedding_model("local:intfloat/multilingual-e5-small") == ("local", "intfloat/multilingual-e5-small")
+    assert parse_embedding_model("onnx:./models/bge") == ("onnx", "./models/bge")
+    assert parse_embedding_model("hash") == ("hash", "")
+    assert default_prefixes("intfloat/multilingual-e5-small") == ("query: ", "passage: ")
+    assert default_prefixes("BAAI/bge-m3") == ("", "")
+
+
+def test_hashing_embeddings_are_deterministic_and_lexical():
+    embeddings = create_embeddings("hash:256")
+    assert isinstance(embeddings, HashingEmbeddings) and runs_locally(embeddings)
+    docs = np.array(embeddings.embed_documents(["니모디핀 주사액 함량시험", "아세트아미노펜 정제 용출시험", ""]))
+    assert docs.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(docs[:2], axis=1), 1.0) and not docs[2].any()
+    query = np.array(HashingEmbeddings(dim=256).embed_query("니모디핀 함량"))
+    scores = docs[:2] @ query
+    assert scores[0] > scores[1]
+    assert np.allclose(embeddings.embed_queries(["니모디핀 함량"])[0], query)
+
+
+def test_vector_store_uses_hash_backend(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    from langchain_core.documents import Document
+    from vector_store import VectorStoreManager
+
+    monkeypatch.setenv("EMBEDDING_CACHE", "false")
+    manager = VectorStoreManager(store_path=str(tmp_path), embedding_model="hash:128")
+    assert manager.batcher.concurrency == 1
+    texts = ["잔류용매 시험법", "니모디핀 주사액", "붕해시험법 기준"]
+    manager.create_vectorstore(
+        [Document(page_content=t, metadata={"source_file": "a.pdf", "page": i}) for i, t in enumerate(texts)]
+    )
+    assert manager.search("니모디핀", k=1)[0].page_content == "니모디핀 주사액"
@@ -0,0 +1,119 @@
+"""
+Tests for versioned index snapshots (CURRENT pointer, GC) and the RAGSystem hot swap
+"""
+import os
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from index_snapshots import CURRENT_FILE, current_index, list_snapshots, new_snapshot, publish_snapshot
+
+
+def test_publish_points_current_and_keeps_recent_snapshots(tmp_path):
+    store = str(tmp_path)
+    assert current_index(store) == "index"
+
+    published = []
+    for i in range(4):
+        name = new_snapshot(store, copy_from=published[-1] if published else None)
+        (tmp_path / name / "data.txt").write_text(str(i))
+        publish_snapshot(store, name, keep=2)
+        published.append(name)
+    (tmp_path / published[-1] / "chunks.sqlite").write_text("db")
+    building = new_snapshot(store, copy_from=published[-1])
+    # 통째로 교체되는 파일은 하드링크, 제자리에서 수정되는 청크 스토어는 복사
+    assert os.stat(tmp_path / building / "data.txt").st_ino == os.stat(tmp_path / published[-1] / "data.txt").st_ino
+    assert os.stat(tmp_path / building / "chunks.sqlite").st_ino != os.stat(tmp_path / published[-1] / "chunks.sqlite").st_ino
+
+    assert (tmp_path / CURRENT_FILE).read_text().strip() == current_index(store) == published[-1]
+    # 오래된 스냅샷은 정리, 아직 게시되지 않은 (빌드 중인) 스냅샷은 유지
+    assert list_snapshots(store) == published[-2:] + [building]
+    assert (tmp_path / building / "data.txt").read_text() == "3"
+
+
+def test_running_system_swaps_in_new_snapshot(tmp_path, monkeypatch, chunks):
+    monkeypatch.setenv("VECTOR_STORE_PATH", str(tmp_path))
+    monkeypatch.setenv("EMBEDDING_MODEL", "hash:64")
+    monkeypatch.setenv("EMBEDDING_CACHE", "false")
+    monkeypatch.setenv("ANSWER_CACHE", "false")
+    monkeypatch.setenv("INDEX_WATCH_SECONDS", "0")
+    from main import RAGSystem
+
+    writer = RAGSystem()
+    writer.vector_store.ingest_documents(chunks("a.pdf", ["aspirin tablets", "caffeine injection"]))
+    writer.save_index()
+
+    reader = RAGSystem()
+    reader.load_existing_index()
+    first = reader.vector_store
+    assert reader.index_name == current_index(str(tmp_path))
+    assert reader.refresh_index() is False
+
+    writer.vector_store.ingest_documents(chunks("b.pdf", ["ibuprofen suspension"]))
+    writer.save_index()
+    version = reader.index_version()
+
+    assert reader.refresh_index() is True
+    assert reader.vector_store is not first and reader.vector_store.count() == 3
+    assert reader.vector_store.search("ibuprofen suspension", k=1)[0].page_content == "ibuprofen suspension"
+    assert reader.index_version() != version
+    # 교체 전에 시작한 질의는 이전 스냅샷에서 끝까지 처리
+    assert first.search("ibuprofen suspension", k=3)[0].metadata["source_file"] == "a.pdf"
+
+    # 저장하지 않은 변경이 있으면 교체하지 않음
+    writer.vector_store.ingest_documents(chunks("c.pdf", ["morphine sulfate"]))
+    writer.save_index()
+    reader._dirty = True
+    assert reader.refresh_index() is False
+
+
+def test_build_creates_a_snapshot_only_when_pdfs_change(tmp_path, monkeypatch, write_pdf):
+    store = str(tmp_path / "vectors")
+    monkeypatch.setenv("VECTOR_STORE_PATH", store)
+    monkeypatch.setenv("EMBEDDING_MODEL", "hash:64")
+    monkeypatch.setenv("EMBEDDING_CACHE", "false")
+    from build_index import build_index
+    from chunk_store import ChunkStore
+    from faiss_index import read_faiss_index
+
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    write_pdf(str(pdf_dir / "a.pdf"), ["aspirin tablets"])
+    write_pdf(str(pdf_dir / "b.pdf"), ["caffeine injection"])
+    build_index(pdf_dir=str(pdf_dir))
+    first = current_index(store)
+
+    # 변경이 없으면 스냅샷 폴더를 만들지(복사하지) 않음
+    import build_index as build_module
+    created = []
+
+    def spy(*args, **kwargs):
+        created.append(args)
+        return new_snapshot(*args, **kwargs)
+
+    monkeypatch.setattr(build_module, "new_snapshot", spy)
+    build_index(pdf_dir=str(pdf_dir))
+    assert created == [] and list_snapshots(store) == [first]
+
+    write_pdf(str(pdf_dir / "b.pdf"), ["caffeine citrate oral solution"])
+    build_index(pdf_dir=str(pdf_dir))
+    second = current_index(store)
+    assert list_snapshots(store) == [first, second]
+
+    # 새 빌드가 이전 스냅샷의 파일을 건드리지 않음
+    old_chunks = ChunkStore(os.path.join(store, first, "chunks.sqlite"))
+    texts = sorted(doc.page_content for doc in old_chunks.get_many(list(old_chunks.position_ids().values())))
+    assert texts == ["aspirin tablets", "caffeine injection"]
+    assert read_faiss_index(os.path.join(store, first)).ntotal == 2
+
+    # 게시 전에 실패한 빌드는 스냅샷 폴더를 남기지 않음
+    def fail(*args, **kwargs):
+        raise RuntimeError("embedding service down")
+
+    monkeypatch.setattr(build_module, "stream_into_index", fail)
+    write_pdf(str(pdf_dir / "c.pdf"), ["morphine sulfate"])
+    with pytest.raises(RuntimeError):
+        build_index(pdf_dir=str(pdf_dir))
+    assert len(created) == 2 and list_snapshots(store) == [first, second]
+    assert current_index(store) == second
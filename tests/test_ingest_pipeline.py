@@ -0,0 +1,53 @@
+"""
+Tests for the streaming ingestion pipeline (bounded in-flight batches, input order)
+"""
+import time
+import threading
+
+from langchain_core.documents import Document
+
+from ingest_pipeline import stream_into_index
+
+
+class SlowStore:
+    """Records how far the chunk iterator ran ahead of the appends."""
+
+    def __init__(self):
+        self.ids = []
+        self.pulled = 0
+        self.max_ahead = 0
+        self.max_embedding = 0
+        self._embedding = 0
+        self._lock = threading.Lock()
+
+    def items(self, n):
+        for i in range(n):
+            self.pulled += 1
+            self.max_ahead = max(self.max_ahead, self.pulled - len(self.ids))
+            yield Document(page_content=f"chunk {i}"), f"id-{i}"
+
+    def embed_documents(self, documents):
+        with self._lock:
+            self._embedding += 1
+            self.max_embedding = max(self.max_embedding, self._embedding)
+        # 앞 배치가 더 늦게 끝나도 추가 순서는 입력 순서
+        time.sleep(0.02 if int(documents[0].page_content.split()[1]) % 20 == 0 else 0.001)
+        with self._lock:
+            self._embedding -= 1
+        return [[0.0] for _ in documents]
+
+    def append_embeddings(self, documents, vectors, ids):
+        assert len(vectors) == len(documents)
+        self.ids.extend(ids)
+
+    def log_cache_stats(self):
+        pass
+
+
+def test_stream_keeps_order_and_bounds_buffered_chunks():
+    store = SlowStore()
+    assert stream_into_index(store, store.items(103), batch_size=10, max_in_flight=3) == 103
+    assert store.ids == [f"id-{i}" for i in range(103)]
+    # 임베딩 중인 배치 3개 + 채우는 중인 배치 1개를 넘게 읽어 두지 않음
+    assert store.max_ahead <= (3 + 1) * 10
+    assert 1 < store.max_embedding <= 3
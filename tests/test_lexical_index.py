@@ -0,0 +1,38 @@
+"""
+Tests for the BM25 lexical index (tokenizer, incremental add/remove, save/load)
+"""
+from lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+TEXTS = {
+    "a": "니모디핀 주사액 용출시험법을 따른다. CAS 66085-59-4",
+    "b": "잔류용매 시험에 따른다.",
+    "c": "Nimodipine injection: 함량시험",
+}
+
+
+def test_tokenize_bigrams_and_terms():
+    assert tokenize("용출시험법") == ["용출", "출시", "시험", "험법"]
+    assert tokenize("CAS 66085-59-4, Nimodipine 0.5 mg") == ["cas", "66085-59-4", "nimodipine", "0.5", "mg"]
+
+
+def test_search_add_remove_and_reload(tmp_path):
+    index = LexicalIndex()
+    index.add(list(TEXTS), list(TEXTS.values()))
+    assert index.search("66085-59-4", k=3)[0][0] == "a"
+    assert index.search("잔류용매", k=3)[0][0] == "b"
+
+    index.save(str(tmp_path))
+    index.remove(["a"])
+    index.add(["d"], ["용출시험법 개정"])
+    # "a" 는 빠지고, 공통 bigram(시험)만 가진 청크보다 "d" 가 위
+    hits = [vid for vid, _ in index.search("용출시험법", k=5)]
+    assert hits[0] == "d" and "a" not in hits
+
+    reloaded = LexicalIndex.load(str(tmp_path))
+    assert len(reloaded) == 3
+    assert {vid for vid, _ in reloaded.search("nimodipine 시험", k=5)} == {"a", "b", "c"}
+    assert reloaded.search("nimodipine", k=5)[0][0] == "c"
+
+
+def test_reciprocal_rank_fusion_prefers_agreement():
+    assert reciprocal_rank_fusion([["x", "y", "z"], ["y"]])[0] == "y"
@@ -0,0 +1,94 @@
+"""
+Tests for the monograph name index (heading extraction, name matching, direct hits in RAGSystem.query)
+"""
+import pytest
+
+from langchain_core.documents import Document
+
+from monograph_index import MonographIndex, extract_monographs
+
+PAGES = [
+    "아스피린\nAspirin\nAcidum Acetylsalicylicum\nC9H8O4 : 180.16\n2-Acetoxybenzoic acid [50-78-2]\n"
+    "이 약을 건조한 것은 정량할 때 아스피린 99.5 % 이상을 함유한다.",
+    "성상 이 약은 백색의 결정 또는 결정성 가루이다.\n"
+    "아세트아미노펜\nAcetaminophen\nParacetamolum\nC8H9NO2 : 151.16",
+    "확인시험 이 약의 에탄올 용액은 청자색을 나타낸다.\n융점 169 ~ 172 ℃",
+]
+
+
+def monograph_chunks(source_file="KP12.pdf"):
+    return [
+        Document(page_content=text, metadata={"source_file": source_file, "page": 10 + i, "chunk_id": i})
+        for i, text in enumerate(PAGES)
+    ]
+
+
+def test_extracts_monographs_and_matches_names_in_questions(tmp_path):
+    monographs = extract_monographs("KP12.pdf", [(chunk, f"id-{i}") for i, chunk in enumerate(monograph_chunks())])
+    assert [(m["name_ko"], m["name_en"], m["name_latin"]) for m in monographs] == [
+        ("아스피린", "Aspirin", "Acidum Acetylsalicylicum"),
+        ("아세트아미노펜", "Acetaminophen", "Paracetamolum"),
+    ]
+    assert monographs[0]["chunk_ids"] == ["id-0", "id-1"] and monographs[0]["page_end"] == 11
+    assert monographs[1]["chunk_ids"] == ["id-1", "id-2"] and monographs[1]["page_start"] == 11
+
+    index = MonographIndex(str(tmp_path / "monographs.json"), synonyms={"ASA": "아스피린"})
+    index.replace_source("KP12.pdf", monographs)
+    index.save()
+    index = MonographIndex.load(str(tmp_path / "monographs.json"), synonyms={"ASA": "아스피린"})
+
+    assert [m["name_en"] for m in index.lookup("acidum acetylsalicylicum")] == ["Aspirin"]
+    assert index.match(" 아스피린 ")[1] is True
+    assert index.match("ASA")[0][0]["name_ko"] == "아스피린"
+    found, name_only = index.match("아세트아미노펜의 융점은?")
+    assert [m["name_en"] for m in found] == ["Acetaminophen"] and name_only is False
+    # 라틴 문자 이름은 단어 경계에서만 일치
+    assert index.match("aspirinate tablets")[0] == []
+    assert [m["name_ko"] for m in index.match("Aspirin and Paracetamolum")[0]] == ["아스피린", "아세트아미노펜"]
+
+    index.remove_source("KP12.pdf")
+    assert len(index) == 0 and index.match("아스피린") == ([], False)
+
+
+class RecordingQAChain:
+    def __init__(self):
+        self.contexts = None
+
+    def answer(self, question, contexts):
+        self.contexts = contexts
+        return "answer"
+
+
+def test_query_answers_monograph_names_without_vector_search(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    monkeypatch.setenv("VECTOR_STORE_PATH", str(tmp_path))
+    monkeypatch.setenv("EMBEDDING_MODEL", "hash:64")
+    monkeypatch.setenv("EMBEDDING_CACHE", "false")
+    monkeypatch.setenv("ANSWER_CACHE", "false")
+    monkeypatch.setenv("INDEX_WATCH_SECONDS", "0")
+    monkeypatch.setenv("TOP_K", "2")
+    from main import RAGSystem
+
+    writer = RAGSystem()
+    ids = writer.vector_store.upsert_documents("KP12.pdf", monograph_chunks())
+    assert writer.index_monographs("KP12.pdf", monograph_chunks(), ids) == 2
+    writer.save_index()
+
+    rag = RAGSystem()
+    rag.load_existing_index()
+    rag.qa_chain = RecordingQAChain()
+    search = rag.vector_store.search
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("vector search for a monograph name")
+
+    rag.vector_store.search = no_search
+    result = rag.query("Acetaminophen")
+    assert [s["metadata"]["page"] for s in result["sources"]] == [11, 12]
+
+    # 이름 외의 내용이 있으면 벡터 검색 결과 앞에 품목 청크를 둠
+    rag.vector_store.search = search
+    monkeypatch.setenv("MONOGRAPH_TOP_CHUNKS", "1")
+    rag.query("아세트아미노펜 융점")
+    assert rag.qa_chain.contexts[0].page_content == PAGES[2]
+    assert rag.query("아세트아미노펜 융점", filter={"source_file": "other.pdf"})["sources"] == []
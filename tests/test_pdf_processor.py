@@ -0,0 +1,23 @@
+"""
+Tests for the PDF text extraction backends (same pages, metadata and text from each)
+"""
+import pytest
+
+from pdf_processor import PDF_BACKENDS, PDFProcessor
+
+BACKEND_MODULES = {"pypdf": "pypdf", "pdfplumber": "pdfplumber", "pypdf2": "PyPDF2"}
+
+
+@pytest.mark.parametrize("backend", PDF_BACKENDS)
+def test_backends_yield_the_same_pages_and_metadata(backend, tmp_path, write_pdf):
+    pytest.importorskip(BACKEND_MODULES[backend])
+    pdf_path = str(tmp_path / "kp.pdf")
+    write_pdf(pdf_path, ["Aspirin C9H8O4", "Melting point 136 C", "Identification"])
+
+    pages = list(PDFProcessor(backend=backend).iter_pages(pdf_path))
+    assert len(pages) == 3
+    assert [page.metadata for page in pages] == [
+        {"source": pdf_path, "page": i, "total_pages": 3} for i in range(3)
+    ]
+    assert all(page.page_content.strip() for page in pages)
+    assert "Aspirin" in pages[0].page_content
@@ -0,0 +1,57 @@
+"""
+Tests for the revision table (변경대비표) row parsing and lookup
+"""
+from revision_tables import (
+    RevisionTableIndex,
+    _header_columns,
+    _item_header,
+    _sections,
+    is_revision_table_pdf,
+)
+
+
+def make_row(item, item_en, sections, before, after, page=0):
+    return {
+        "part": "의약품각조 제1부", "item": item, "item_en": item_en, "sections": sections,
+        "before": before, "after": after, "note": "",
+        "source_file": "변경대비표.pdf", "source": "/pdfs/변경대비표.pdf", "page": page,
+    }
+
+
+def test_header_and_item_detection():
+    assert _header_columns(["현 행", "개 정 안"]) == {"before": 0, "after": 1}
+    assert _header_columns(["개정 전", "개정 후", "비 고"]) == {"before": 0, "after": 1, "note": 2}
+    assert _header_columns(["품목", "내용"]) is None
+
+    assert _item_header("니모디핀\nNimodipine\n(생략)") == ("니모디핀", "Nimodipine")
+    assert _item_header("16. 알킬설폰산에스테르류 분석법\n...", "<신 설>") == ("알킬설폰산에스테르류 분석법", "")
+    # 계산식 범례 / 본문 줄은 품목명이 아님
+    assert _item_header("C : 검액 중 유연물질의 농도\nA : peak area") is None
+    assert _item_header("50 mg을 정확하게 달아\nmobile phase") is None
+
+    assert _sections("확인시험 1) ...\n8) 유연물질 ...\n정 량 법 이 약") == ["확인시험", "유연물질", "정량법"]
+
+
+def test_lookup_ranks_item_before_text_matches(tmp_path):
+    index = RevisionTableIndex(str(tmp_path / "revision_tables.json"))
+    index.replace_source("변경대비표.pdf", [
+        make_row("펜톡시필린", "Pentoxifylline", ["용출시험"], "니모디핀과 같이 ...", "..."),
+        make_row("니모디핀", "Nimodipine", ["확인시험"], "니모디핀\nNimodipine", "(현행과 같음)", page=1),
+        make_row("니모디핀 주사액", "Nimodipine Injection", ["정량법"], "...", "...", page=2),
+    ])
+    index.save()
+
+    loaded = RevisionTableIndex.load(index.path)
+    assert [r["item"] for r in loaded.lookup("니모 디핀")] == ["니모디핀", "니모디핀 주사액", "펜톡시필린"]
+    assert [r["item"] for r in loaded.lookup("nimodipine injection")] == ["니모디핀 주사액", "니모디핀"]
+    assert [r["item"] for r in loaded.lookup("용출시험법")] == ["펜톡시필린"]
+    assert loaded.lookup("") == []
+
+    loaded.remove_source("변경대비표.pdf")
+    assert loaded.lookup("니모디핀") == []
+
+
+def test_is_revision_table_pdf():
+    assert is_revision_table_pdf("/pdfs/약전+변경대비표.pdf", "변경대비표")
+    assert not is_revision_table_pdf("/pdfs/약전.pdf", "변경대비표")
+    assert is_revision_table_pdf("/pdfs/약전.pdf", "")
@@ -0,0 +1,134 @@
+"""
+Tests for ShardRouter (per-collection FAISS shards, fake embeddings)
+"""
+import os
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from shard_router import ShardRouter, merge_lexical_hits, shard_index_name
+
+
+def make_router(path):
+    return ShardRouter(str(path), embeddings=DeterministicFakeEmbedding(size=16), max_workers=2)
+
+
+def test_search_merges_shards_by_distance(tmp_path, chunks):
+    router = make_router(tmp_path)
+    router.build_shard("kp", chunks("kp.pdf", [f"대한약전 {i}" for i in range(20)]))
+    router.build_shard("usp", chunks("usp.pdf", [f"USP monograph {i}" for i in range(20)]))
+    assert router.available() == router.loaded() == ["kp", "usp"]
+
+    # 각 샤드의 top-k 를 거리순으로 합침: 정확히 같은 텍스트가 어느 샤드에 있든 1등
+    assert router.search("USP monograph 7", k=3)[0].page_content == "USP monograph 7"
+    assert router.search("대한약전 3", k=3)[0].page_content == "대한약전 3"
+    assert {d.metadata["source_file"] for d in router.search("USP monograph 7", k=5, shards=["kp"])} == {"kp.pdf"}
+    assert sorted(d.page_content for d in router.search("x", k=5, filter={"page": 4})) == ["USP monograph 4", "대한약전 4"]
+    with pytest.raises(ValueError):
+        router.search("x", shards=["missing"])
+    with pytest.raises(ValueError):
+        shard_index_name("../index")
+
+
+def test_lexical_hits_are_merged_by_rank_per_shard():
+    # 작은 샤드의 BM25 점수가 훨씬 커도 각 샤드의 1등이 먼저
+    per_shard = [("kp", [("kp-1", 2.1), ("kp-2", 1.5)]), ("usp", [("usp-1", 50.0), ("usp-2", 40.0), ("usp-3", 30.0)])]
+    assert merge_lexical_hits(per_shard, 3) == [("kp", "kp-1"), ("usp", "usp-1"), ("kp", "kp-2")]
+
+
+def test_rebuilt_shard_is_swapped_in_without_touching_others(tmp_path, chunks):
+    router = make_router(tmp_path)
+    router.build_shard("kp", chunks("kp.pdf", ["old text"]))
+    router.build_shard("usp", chunks("usp.pdf", ["usp text"]))
+    before = router.version()
+    usp = router._shards["usp"]
+
+    # 다른 프로세스(라우터)가 kp 샤드를 갱신
+    other = make_router(tmp_path)
+    other.build_shard("kp", chunks("kp.pdf", ["new text"]) + chunks("kp2.pdf", ["more text"]))
+    assert not any(name.startswith(".") for name in os.listdir(tmp_path / "shards"))
+
+    # 교체 전까지는 이전 버전으로 검색
+    assert [d.page_content for d in router.search("new text", k=5, shards=["kp"])] == ["old text"]
+    assert router.refresh() == ["kp"]
+    assert router._shards["usp"] is usp
+    assert sorted(d.page_content for d in router.search("new text", k=5, shards=["kp"])) == ["more text", "new text"]
+    assert router.version() != before
+
+    # publish_shard() 의 두 rename 사이에는 샤드를 내리지 않음
+    os.rename(tmp_path / "shards" / "kp", tmp_path / "shards" / ".kp.old")
+    assert router.refresh() == [] and router.loaded() == ["kp", "usp"]
+    os.rename(tmp_path / "shards" / ".kp.old", tmp_path / "shards" / "kp")
+
+    # 다른 프로세스가 새로 만든 샤드도 로드
+    other.build_shard("ep", chunks("ep.pdf", ["ep text"]))
+    assert router.refresh() == ["ep"]
+    assert router.search("ep text", k=1)[0].metadata["source_file"] == "ep.pdf"
+
+
+KP_PAGES = [
+    "아스피린\nAspirin\nAcidum Acetylsalicylicum\nC9H8O4 : 180.16\n이 약을 건조한 것은 정량할 때 아스피린 99.5 % 이상을 함유한다.",
+    "융점 136 ~ 140 ℃",
+]
+EP_PAGES = ["아세트아미노펜\nAcetaminophen\nParacetamolum\nC8H9NO2 : 151.16", "확인시험 청자색"]
+REVISION_ROW = {
+    "part": "각조", "item": "아스피린", "item_en": "Aspirin", "sections": ["융점"],
+    "before": "융점 135 ~ 140 ℃", "after": "융점 136 ~ 140 ℃", "note": "",
+    "source_file": "revision.pdf", "source": "revision.pdf", "page": 0,
+}
+
+
+class RecordingQAChain:
+    def answer(self, question, contexts):
+        return "answer"
+
+
+def test_sharded_rag_system_uses_each_shards_revision_tables_and_monographs(tmp_path, monkeypatch, write_pdf):
+    monkeypatch.setenv("VECTOR_STORE_PATH", str(tmp_path / "vectors"))
+    monkeypatch.setenv("EMBEDDING_MODEL", "hash:64")
+    monkeypatch.setenv("EMBEDDING_CACHE", "false")
+    monkeypatch.setenv("ANSWER_CACHE", "false")
+    monkeypatch.setenv("INDEX_WATCH_SECONDS", "0")
+    monkeypatch.setenv("VECTOR_SHARDS", "all")
+    monkeypatch.setenv("REVISION_TABLE_PATTERN", "revision")
+    import build_index as build_module
+    from langchain_core.documents import Document
+    from main import RAGSystem
+    from pdf_processor import PDFProcessor
+
+    # 한글 본문 PDF 대신 페이지 텍스트를 주입 (표 추출도 고정 행으로)
+    pages = {"kp.pdf": KP_PAGES, "ep.pdf": EP_PAGES, "revision.pdf": ["revision table"]}
+    monkeypatch.setattr(PDFProcessor, "iter_pages", lambda self, pdf_path: iter([
+        Document(page_content=text, metadata={"source": pdf_path, "page": i})
+        for i, text in enumerate(pages[os.path.basename(pdf_path)])
+    ]))
+    monkeypatch.setattr(build_module, "extract_revision_rows", lambda pdf_path: [REVISION_ROW])
+
+    def build(shard, *files):
+        pdf_dir = tmp_path / shard
+        pdf_dir.mkdir()
+        for name in files:
+            write_pdf(str(pdf_dir / name), [name])
+        build_module.build_index(pdf_dir=str(pdf_dir), shard=shard)
+
+    build("kp", "kp.pdf")
+    build("rev", "revision.pdf")
+    rag = RAGSystem()
+    rag.load_existing_index()
+    rag.qa_chain = RecordingQAChain()
+
+    assert rag.compare_revision("아스피린")["rows"] == [REVISION_ROW]
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("vector search for a monograph name")
+
+    rag.shard_router.search = no_search
+    assert [s["metadata"]["page"] for s in rag.query("Aspirin")["sources"]] == [0, 1]
+
+    # 나중에 발행된 샤드의 품목도 refresh 후 바로 찾음
+    build("ep", "ep.pdf")
+    assert rag.refresh_index()
+    assert [s["content"] for s in rag.query("Paracetamolum")["sources"]] == EP_PAGES
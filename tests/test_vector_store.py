@@ -0,0 +1,280 @@
+"""
+Tests for per-source upsert / delete in VectorStoreManager (FAISS, fake embeddings)
+"""
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from chunk_store import ChunkStore
+from faiss_index import RerankVectors
+from vector_store import VectorStoreManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+
+
+def sources(manager):
+    return sorted(doc.metadata["source_file"] for _, doc in manager.iter_documents())
+
+
+def test_upsert_replaces_only_that_source(manager, chunks):
+    manager.upsert_documents("a.pdf", chunks("a.pdf", ["a one", "a two"]))
+    manager.upsert_documents("b.pdf", chunks("b.pdf", ["b one"]))
+    assert sources(manager) == ["a.pdf", "a.pdf", "b.pdf"]
+
+    ids = manager.upsert_documents("a.pdf", chunks("a.pdf", ["a corrected"]))
+    assert sources(manager) == ["a.pdf", "b.pdf"]
+    assert manager.manifest.vector_ids("a.pdf") == ids
+    assert manager.search("a corrected", k=1)[0].page_content == "a corrected"
+
+    manager.save_vectorstore()
+    reloaded = VectorStoreManager(store_path=manager.store_path, embeddings=DeterministicFakeEmbedding(size=16))
+    reloaded.load_vectorstore()
+    assert reloaded.delete_source("a.pdf") == 1
+    assert reloaded.delete_source("unknown.pdf") == 0
+    assert sources(reloaded) == ["b.pdf"]
+
+
+def test_ingest_documents_groups_by_source(manager, chunks):
+    assert manager.ingest_documents(chunks("a.pdf", ["x", "y"]) + chunks("b.pdf", ["z"])) == 3
+    assert sorted(manager.manifest.files) == ["a.pdf", "b.pdf"]
+    assert len(manager.manifest.vector_ids("a.pdf")) == 2
+
+
+def test_precomputed_vectors_build_the_same_index_as_from_documents(manager, chunks):
+    from langchain_community.vectorstores import FAISS
+
+    docs = chunks("a.pdf", [f"chunk {i}" for i in range(250)])
+    ids = [f"id-{i}" for i in range(len(docs))]
+    # 이전 방식: 100개 배치마다 from_documents 후 merge_from
+    legacy = FAISS.from_documents(docs[:100], manager.embeddings, ids=ids[:100])
+    for start in range(100, len(docs), 100):
+        legacy.merge_from(FAISS.from_documents(docs[start:start + 100], manager.embeddings, ids=ids[start:start + 100]))
+
+    manager.create_vectorstore(docs, ids=ids)
+    streamed = VectorStoreManager(store_path=manager.store_path, embeddings=manager.embeddings)
+    for start in range(0, len(docs), 100):
+        part = docs[start:start + 100]
+        streamed.append_embeddings(part, streamed.embed_documents(part), ids=ids[start:start + 100])
+
+    for store in (manager.vectorstore, streamed.vectorstore):
+        assert store.index.metric_type == legacy.index.metric_type
+        assert store.index_to_docstore_id == legacy.index_to_docstore_id
+        np.testing.assert_array_equal(store.index.reconstruct_n(0, len(docs)), legacy.index.reconstruct_n(0, len(docs)))
+        assert [(d.page_content, d.metadata) for d in map(store.docstore.search, ids)] == [
+            (d.page_content, d.metadata) for d in map(legacy.docstore.search, ids)
+        ]
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "hnsw"])
+def test_faiss_index_type_streaming_save_and_delete(tmp_path, monkeypatch, index_type, chunks):
+    monkeypatch.setenv("FAISS_INDEX_TYPE", index_type)
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    rng = np.random.default_rng(0)
+    docs = chunks("a.pdf", [f"chunk {i}" for i in range(400)])
+    ids = [f"id-{i}" for i in range(len(docs))]
+    for start in range(0, len(docs), 100):
+        manager.append_embeddings(
+            docs[start:start + 100], rng.random((100, 16), dtype=np.float32), ids=ids[start:start + 100]
+        )
+    manager.save_vectorstore()
+
+    monkeypatch.setenv("FAISS_INDEX_TYPE", "flat")
+    reloaded = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    reloaded.load_vectorstore()
+    # 저장된 인덱스 설정이 환경변수보다 우선
+    assert reloaded.index_config.index_type == index_type
+    assert reloaded.index_config.factory.startswith("IVF" if index_type == "ivf_flat" else "HNSW")
+
+    reloaded.delete_vectors(["id-0", "id-399"])
+    assert reloaded.vectorstore.index.ntotal == 398
+    assert sorted(reloaded.vectorstore.index_to_docstore_id) == list(range(398))
+    assert len(reloaded.search("chunk 5", k=3)) == 3
+
+
+def test_compressed_index_reranks_with_exact_vectors(tmp_path, monkeypatch, chunks):
+    monkeypatch.setenv("FAISS_CODEC", "sq8")
+    monkeypatch.setenv("FAISS_RERANK", "4")
+    embeddings = DeterministicFakeEmbedding(size=16)
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=embeddings)
+    docs = chunks("a.pdf", [f"chunk {i}" for i in range(300)])
+    manager.append_embeddings(docs, manager.embed_documents(docs), ids=[f"id-{i}" for i in range(300)])
+    manager.save_vectorstore()
+    assert (tmp_path / "index" / "rerank_vectors.npy").exists()
+
+    reloaded = VectorStoreManager(store_path=str(tmp_path), embeddings=embeddings)
+    reloaded.load_vectorstore()
+    assert reloaded.index_config.factory == "SQ8"
+    assert len(reloaded.rerank_vectors) == 300
+    # 정확한 float32 벡터로 재정렬하므로 자기 자신이 1등
+    assert reloaded.search("chunk 42", k=1)[0].page_content == "chunk 42"
+
+    new = chunks("b.pdf", ["added later"])
+    reloaded.append_embeddings(new, reloaded.embed_documents(new), ids=["id-new"])
+    reloaded.delete_vectors(["id-0"])
+    assert reloaded.search("added later", k=1)[0].page_content == "added later"
+    reloaded.save_vectorstore()
+    assert len(RerankVectors.load(str(tmp_path / "index"))) == 300
+
+    # 벡터가 하나도 남지 않은 경우
+    empty = RerankVectors()
+    assert empty.dim == 0
+    empty.save(str(tmp_path / "index"), [])
+    assert RerankVectors.load(str(tmp_path / "index")) is None
+
+
+def test_mmap_load_is_lazy_and_becomes_writable(manager, monkeypatch, chunks):
+    manager.upsert_documents("a.pdf", chunks("a.pdf", ["alpha", "beta"]))
+    manager.upsert_documents("b.pdf", chunks("b.pdf", ["gamma"]))
+    manager.save_vectorstore()
+
+    monkeypatch.setenv("VECTOR_LOAD_MODE", "mmap")
+    reloaded = VectorStoreManager(store_path=manager.store_path, embeddings=DeterministicFakeEmbedding(size=16))
+    reloaded.load_vectorstore()
+    assert isinstance(reloaded.vectorstore.docstore, ChunkStore)
+    assert reloaded.count() == 3
+    assert [doc.page_content for _, doc in reloaded.peek(2)] == ["alpha", "beta"]
+    assert reloaded.search("gamma", k=1)[0].metadata["source_file"] == "b.pdf"
+
+    # 쓰기 작업은 메모리 로드로 전환된 뒤 적용되고, manifest 변경도 유지됨
+    reloaded.delete_source("a.pdf")
+    assert reloaded.vectorstore.index.ntotal == 1
+    assert sources(reloaded) == ["b.pdf"]
+    assert list(reloaded.manifest.files) == ["b.pdf"]
+
+
+def test_chunk_store_updates_in_place_and_filters(manager, chunks):
+    manager.upsert_documents("a.pdf", chunks("a.pdf", ["alpha", "beta"]))
+    manager.upsert_documents("b.pdf", chunks("b.pdf", ["gamma"]))
+    manager.save_vectorstore()
+    index_dir = manager.index_dir()
+    assert not os.path.exists(os.path.join(index_dir, "index.pkl"))
+
+    reloaded = VectorStoreManager(store_path=manager.store_path, embeddings=DeterministicFakeEmbedding(size=16))
+    reloaded.load_vectorstore()
+    store = reloaded.vectorstore.docstore
+    b_id = reloaded.manifest.vector_ids("b.pdf")[0]
+    assert store.ids_where({"source_file": "b.pdf"}) == {b_id}
+    assert len(store.ids_where({"source_file": ["a.pdf", "b.pdf"], "page": 0})) == 2
+
+    reloaded.upsert_documents("a.pdf", chunks("a.pdf", ["alpha v2"]))
+    reloaded.update_metadata({b_id: {"tag": "x"}})
+    assert store.ids_where({"tag": "x"}) == {b_id}
+    assert store.ids_where({"tag') = 1 OR (1": "x"}) == set()
+    reloaded.save_vectorstore()
+
+    again = VectorStoreManager(store_path=manager.store_path, embeddings=DeterministicFakeEmbedding(size=16))
+    again.load_vectorstore()
+    assert [doc.page_content for _, doc in again.iter_documents()] == ["gamma", "alpha v2"]
+    assert again.vectorstore.docstore.search(b_id).metadata["tag"] == "x"
+    assert again.search("alpha v2", k=1)[0].page_content == "alpha v2"
+
+
+def test_migrate_docstore_from_pickle(tmp_path, chunks):
+    from langchain_community.vectorstores import FAISS
+    from migrate_docstore import migrate_docstore
+
+    embeddings = DeterministicFakeEmbedding(size=16)
+    FAISS.from_documents(chunks("a.pdf", ["one", "two"]), embeddings).save_local(str(tmp_path / "index"))
+    assert migrate_docstore(str(tmp_path / "index"), remove_pkl=True) == 2
+    assert not (tmp_path / "index" / "index.pkl").exists()
+
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=embeddings)
+    manager.load_vectorstore()
+    assert [doc.page_content for _, doc in manager.iter_documents()] == ["one", "two"]
+
+
+def test_hybrid_search_finds_exact_terms(tmp_path, monkeypatch, chunks):
+    monkeypatch.setenv("SEARCH_MODE", "hybrid")
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    texts = [f"일반 시험법 설명 {i}" for i in range(50)] + ["니모디핀 CAS 66085-59-4 잔류용매 시험"]
+    manager.upsert_documents("a.pdf", chunks("a.pdf", texts))
+    # 가짜 임베딩으로는 벡터 검색만으로 찾을 수 없는 청크
+    assert texts[-1] in [doc.page_content for doc in manager.search("66085-59-4", k=3)]
+
+    manager.save_vectorstore()
+    assert (tmp_path / "index" / "lexical_index.npz").exists()
+    reloaded = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    reloaded.load_vectorstore()
+    reloaded.delete_source("a.pdf")
+    reloaded.upsert_documents("b.pdf", chunks("b.pdf", ["잔류용매 기준 변경", "기타"]))
+    assert reloaded.lexical_index.search("66085-59-4") == []
+    assert "잔류용매 기준 변경" in [doc.page_content for doc in reloaded.search("잔류용매", k=2)]
+
+
+def test_query_embedding_lru_persists_through_embedding_cache(tmp_path, monkeypatch, chunks):
+    monkeypatch.setenv("EMBEDDING_CACHE", "true")
+    monkeypatch.setenv("QUERY_CACHE_SIZE", "2")
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    manager.upsert_documents("a.pdf", chunks("a.pdf", ["alpha", "beta"]))
+    for query in ["니모디핀", "니모디핀 ", "beta", "gamma", "니모디핀"]:
+        manager.search(query, k=1)
+    # 공백 차이는 같은 키, 크기 2 를 넘으면 가장 오래된 항목부터 제거
+    stats = manager.query_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 2)
+
+    restarted = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    assert restarted.query_cache_stats()["entries"] == 2
+    restarted.embeddings.embed_query("니모디핀")
+    assert restarted.query_cache_stats()["hits"] == 1
+
+
+def test_search_batch_matches_single_searches(manager, chunks):
+    manager.upsert_documents("a.pdf", chunks("a.pdf", [f"chunk {i}" for i in range(30)]))
+    manager.save_vectorstore()
+    queries = ["chunk 3", "chunk 17", "chunk 3", "unrelated"]
+    batched = manager.search_batch(queries, k=4)
+    assert [[d.page_content for d in docs] for docs in batched] == [
+        [d.page_content for d in manager.search(query, k=4)] for query in queries
+    ]
+    assert batched[0][0].page_content == "chunk 3"
+    assert manager.search_batch([], k=4) == []
+
+
+@pytest.mark.parametrize("index_type,scan_limit", [("flat", "0"), ("flat", "2048"), ("ivf_flat", "0"), ("hnsw", "0")])
+def test_filtered_search_uses_only_matching_chunks(tmp_path, monkeypatch, index_type, scan_limit, chunks):
+    monkeypatch.setenv("FAISS_INDEX_TYPE", index_type)
+    monkeypatch.setenv("FILTER_SCAN_LIMIT", scan_limit)
+    monkeypatch.setenv("FILTER_FIELDS", "edition")
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    for name, edition in [("a.pdf", "KP11"), ("b.pdf", "KP12"), ("c.pdf", "KP12")]:
+        docs = chunks(name, [f"{name} chunk {i}" for i in range(150)])
+        for doc in docs:
+            doc.metadata["edition"] = edition
+        manager.upsert_documents(name, docs)
+    manager.save_vectorstore()
+
+    reloaded = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    reloaded.load_vectorstore()
+    # b.pdf 의 청크를 질의해도 필터 밖이면 나오지 않음
+    docs = reloaded.search("b.pdf chunk 7", k=5, filter={"source_file": "a.pdf", "page": {"gte": 10, "lt": 20}})
+    assert len(docs) == 5
+    assert all(d.metadata["source_file"] == "a.pdf" and 10 <= d.metadata["page"] < 20 for d in docs)
+    assert reloaded.search("b.pdf chunk 7", k=1, filter={"edition": "KP12"})[0].page_content == "b.pdf chunk 7"
+    assert reloaded.search("x", k=3, filter={"source_file": ["missing.pdf"]}) == []
+    with pytest.raises(ValueError):
+        reloaded.search("x", k=3, filter={"unknown": 1})
+
+    # 삭제 후에도 위치가 FAISS 와 맞게 유지됨
+    reloaded.delete_source("a.pdf")
+    reloaded.upsert_documents("d.pdf", chunks("d.pdf", ["d.pdf only"]))
+    assert [d.page_content for d in reloaded.search("d.pdf only", k=3, filter={"source_file": ["d.pdf", "a.pdf"]})] == ["d.pdf only"]
+    docs = reloaded.search("c.pdf chunk 3", k=4, filter={"source_file": "c.pdf", "page": [3, 4]})
+    assert sorted(d.page_content for d in docs) == ["c.pdf chunk 3", "c.pdf chunk 4"]
+
+
+def test_hybrid_search_respects_filter(tmp_path, monkeypatch, chunks):
+    monkeypatch.setenv("SEARCH_MODE", "hybrid")
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=16))
+    manager.upsert_documents("a.pdf", chunks("a.pdf", ["니모디핀 주사액 함량시험", "일반 설명"]))
+    manager.upsert_documents("b.pdf", chunks("b.pdf", ["니모디핀 정제 용출시험", "기타 설명"]))
+    docs = manager.search("니모디핀", k=2, filter={"source_file": "b.pdf"})
+    assert {d.metadata["source_file"] for d in docs} == {"b.pdf"}
+    assert docs[0].page_content == "니모디핀 정제 용출시험"
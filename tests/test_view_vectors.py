@@ -0,0 +1,66 @@
+"""
+Tests for the offline index inspection / export CLI (view_vectors.py)
+"""
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+
+import view_vectors
+from chunk_store import CHUNK_STORE_FILE
+from faiss_index import reconstruct_all, read_faiss_index
+from vector_store import VectorStoreManager
+
+
+@pytest.fixture(params=["flat", "ivf_flat", "hnsw"])
+def index_dir(request, tmp_path, monkeypatch):
+    monkeypatch.setenv("FAISS_INDEX_TYPE", request.param)
+    monkeypatch.setenv("FAISS_NLIST", "4")
+    manager = VectorStoreManager(store_path=str(tmp_path), embeddings=DeterministicFakeEmbedding(size=8))
+    for source_file, n in (("a.pdf", 150), ("b.pdf", 50)):
+        manager.ingest_documents([
+            Document(page_content=f"{source_file} chunk {i}", metadata={"source_file": source_file, "page": i // 10})
+            for i in range(n)
+        ])
+    manager.save_vectorstore()
+    return manager.index_dir()
+
+
+def test_export_streams_vectors_and_metadata_in_position_order(index_dir, tmp_path, capsys):
+    out = str(tmp_path / "export.npy")
+    view_vectors.main(["--index-dir", index_dir, "export", out, "--batch", "64", "--text"])
+
+    vectors = np.load(out)
+    np.testing.assert_allclose(vectors, reconstruct_all(read_faiss_index(index_dir)), rtol=1e-6)
+    with open(str(tmp_path / "export.jsonl"), encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["position"] for r in records] == list(range(200))
+    assert records[151]["metadata"]["source_file"] == "b.pdf" and records[151]["text"] == "b.pdf chunk 1"
+
+    view_vectors.main(["--index-dir", index_dir, "info"])
+    info = capsys.readouterr().out
+    assert "200 x 8" in info and "| a.pdf | 150 | 0-14 |" in info and "| b.pdf | 50 | 0-4 |" in info
+
+    view_vectors.main(["--index-dir", index_dir, "sample", "--ids", records[3]["id"], "missing-id", "--vector"])
+    sample = capsys.readouterr().out
+    assert "a.pdf chunk 3" in sample and "unknown id: missing-id" in sample
+
+
+def test_export_fails_when_the_chunk_store_has_fewer_rows(index_dir, tmp_path):
+    # 배치 경계에서 잘리면 zip 이 조용히 멈추던 경우
+    conn = sqlite3.connect(os.path.join(index_dir, CHUNK_STORE_FILE))
+    with conn:
+        conn.execute("DELETE FROM positions WHERE position >= 128")
+    conn.close()
+
+    out = str(tmp_path / "export.npy")
+    with pytest.raises(SystemExit, match="rebuild the index"):
+        view_vectors.main(["--index-dir", index_dir, "export", out, "--batch", "64"])
+    assert not os.path.exists(out) and not os.path.exists(str(tmp_path / "export.jsonl"))